@@ -7,3 +7,59 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_BOT_TOKEN')
 DATABASE_URL = os.getenv('DATABASE_URL')
 OWNER_ID = int(os.getenv('OWNER_ID', '0'))
 PAYMENT_PROVIDER_TOKEN = os.getenv('PAYMENT_PROVIDER_TOKEN')
+
+# Database connection pool
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '20'))
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))  # секунды; 0 — без ограничения
+DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '60'))  # секунды; 0 — выключено
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # сколько ждать свободное соединение, секунды
+DB_STREAM_BATCH_SIZE = int(os.getenv('DB_STREAM_BATCH_SIZE', '1000'))  # строк за один FETCH в db_stream
+
+# Publication dispatcher (jobs/dispatcher.py)
+DISPATCHER_CONCURRENCY = int(os.getenv('DISPATCHER_CONCURRENCY', '8'))  # одновременных пачек (задача + время)
+DISPATCHER_BATCH_SIZE = int(os.getenv('DISPATCHER_BATCH_SIZE', '50'))  # пачек за один claim
+PUBLICATION_FANOUT_CONCURRENCY = int(os.getenv('PUBLICATION_FANOUT_CONCURRENCY', '10'))  # каналов одной пачки параллельно
+DISPATCHER_MAX_SLEEP = float(os.getenv('DISPATCHER_MAX_SLEEP', '60'))  # максимум сна между опросами, секунды
+PUBLICATION_MISFIRE_GRACE = int(os.getenv('PUBLICATION_MISFIRE_GRACE', '300'))  # опоздание, после которого пост пропускается
+PUBLICATION_STALE_CLAIM = int(os.getenv('PUBLICATION_STALE_CLAIM', '600'))  # «зависший» claim упавшего воркера
+
+# Rolling horizon (jobs/materializer.py): в publication_jobs материализуются только
+# ближайшие SCHEDULE_HORIZON_HOURS часов расписания, остальное остаётся в task_schedule_sets
+SCHEDULE_HORIZON_HOURS = int(os.getenv('SCHEDULE_HORIZON_HOURS', '48'))
+MATERIALIZER_INTERVAL = int(os.getenv('MATERIALIZER_INTERVAL', '900'))  # период продления горизонта, секунды
+
+# Очередь unpin / auto-delete в scheduled_tasks (jobs/post_actions.py)
+POST_ACTION_POLL_INTERVAL = int(os.getenv('POST_ACTION_POLL_INTERVAL', '10'))  # секунды
+POST_ACTION_BATCH_SIZE = int(os.getenv('POST_ACTION_BATCH_SIZE', '50'))
+POST_ACTION_MAX_ATTEMPTS = int(os.getenv('POST_ACTION_MAX_ATTEMPTS', '3'))
+
+# Исходящий трафик в Bot API (utils/rate_limiter.py)
+RATE_LIMIT_GLOBAL_PER_SEC = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SEC', '25'))  # лимит Telegram ~30/с на бота
+RATE_LIMIT_GROUP_PER_MIN = float(os.getenv('RATE_LIMIT_GROUP_PER_MIN', '20'))  # в один канал/группу
+RATE_LIMIT_PRIVATE_PER_SEC = float(os.getenv('RATE_LIMIT_PRIVATE_PER_SEC', '1'))  # в один личный чат
+RATE_LIMIT_PRIVATE_BURST = float(os.getenv('RATE_LIMIT_PRIVATE_BURST', '5'))  # сообщений подряд в личный чат без ожидания
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))  # повторов после RetryAfter
+
+# Экран 'Мои задачи': задач на странице (keyset-пагинация)
+MY_TASKS_PAGE_SIZE = int(os.getenv('MY_TASKS_PAGE_SIZE', '20'))
+
+# user_data в памяти (database/persistence.py, jobs/user_state.py)
+USER_STATE_IDLE_TTL = int(os.getenv('USER_STATE_IDLE_TTL', '1800'))  # простой до выгрузки, секунды
+USER_STATE_MAX_RESIDENT = int(os.getenv('USER_STATE_MAX_RESIDENT', '5000'))  # пользователей в памяти (LRU)
+USER_STATE_SWEEP_INTERVAL = int(os.getenv('USER_STATE_SWEEP_INTERVAL', '60'))  # период вытеснения, секунды
+
+# Сборка альбомов (services/media_group_service.py)
+MEDIA_GROUP_QUIET_MIN = float(os.getenv('MEDIA_GROUP_QUIET_MIN', '0.5'))  # минимальная тишина после последней части, секунды
+MEDIA_GROUP_QUIET_MAX = float(os.getenv('MEDIA_GROUP_QUIET_MAX', '3'))  # максимальная тишина, секунды
+MEDIA_GROUP_MAX_WAIT = float(os.getenv('MEDIA_GROUP_MAX_WAIT', '15'))  # альбом завершается не позже, секунды от первой части
+MEDIA_GROUP_MAX_OPEN = int(os.getenv('MEDIA_GROUP_MAX_OPEN', '1000'))  # недособранных альбомов в памяти
+
+# Фоновая рассылка (jobs/mailing.py)
+MAILING_CONCURRENCY = int(os.getenv('MAILING_CONCURRENCY', '10'))  # одновременных отправок (общий лимитер всё равно действует)
+MAILING_BATCH_SIZE = int(os.getenv('MAILING_BATCH_SIZE', '100'))  # получателей между сохранениями курсора
+MAILING_PROGRESS_INTERVAL = float(os.getenv('MAILING_PROGRESS_INTERVAL', '5'))  # не чаще одного редактирования прогресса, секунды
+
+# Кэш настроек пользователя (database/queries/settings.py)
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))  # секунды; 0 — кэш выключен
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '10000'))  # пользователей в памяти
@@ -1,10 +1,20 @@
-from typing import Optional, Any
+import asyncio
+import contextvars
+import functools
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, List, Dict, Iterator, AsyncIterator
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import PoolError
 
-from config.settings import DATABASE_URL
+from config.settings import (
+    DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_MAX_LIFETIME, DB_POOL_HEALTH_CHECK_INTERVAL,
+    DB_POOL_TIMEOUT, DB_STREAM_BATCH_SIZE
+)
+from database.pool import ConnectionPool
 from utils.logging import logger
 
 try:
@@ -12,101 +22,340 @@ try:
         logger.critical("DATABASE_URL не установлен! Бот не может работать без БД.")
         db_pool = None
     else:
-        db_pool = SimpleConnectionPool(1, 20, DATABASE_URL)
+        db_pool = ConnectionPool(
+            DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL,
+            max_lifetime=DB_POOL_MAX_LIFETIME,
+            health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+            timeout=DB_POOL_TIMEOUT
+        )
         logger.info("Пул соединений с БД успешно создан")
 except Exception as e:
     logger.error(f"Не удалось создать пул соединений с БД: {e}")
     db_pool = None
 
+# Dedicated executor for the async API. It is sized to the pool so that
+# concurrent queries wait for a free worker instead of exhausting the pool.
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+
+# Statements on a connection that is already checked out (inside an async transaction(),
+# the following FETCHes of db_stream_async, COMMIT/ROLLBACK) run on a separate executor.
+# On _db_executor they would queue behind getconn() waiters: with the whole pool held by
+# open transactions every worker blocks in getconn() for DB_POOL_TIMEOUT and the
+# transactions can never reach their COMMIT. At most DB_POOL_MAX connections are held.
+_db_conn_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db-conn")
+
+# Соединение текущей транзакции (см. transaction()). contextvars, а не threading.local:
+# значение видно и в asyncio-задаче, и в потоке DB executor'а (контекст копируется).
+_tx_conn: contextvars.ContextVar = contextvars.ContextVar('db_transaction_conn', default=None)
+
+# Счётчик запросов текущего update'а — объект с полем queries
+# (RequestScope из database.queries.identity_map); None вне update'а.
+query_counter: contextvars.ContextVar = contextvars.ContextVar('db_query_counter', default=None)
+
+
+def in_transaction() -> bool:
+    """True, если вызов идёт внутри transaction()."""
+    return _tx_conn.get() is not None
+
+
+def _fetch_result(cur, sql: str, fetchone: bool, fetchall: bool) -> Optional[Any]:
+    """Достаёт результат запроса из курсора в виде dict / list[dict]."""
+    if cur.description is None:
+        return None
+    if fetchone:
+        row = cur.fetchone()
+        return dict(row) if row else None
+    if fetchall:
+        return [dict(row) for row in cur.fetchall()]
+    # Для INSERT ... RETURNING id
+    if "RETURNING" in sql.upper():
+        row = cur.fetchone()
+        return dict(row) if row else None
+    return None
+
+
+def _query_in_transaction(conn, sql: str, params: tuple, fetchone: bool, fetchall: bool) -> Optional[Any]:
+    """
+    Выполняет запрос на соединении внешней транзакции. COMMIT откладывается до
+    выхода из transaction(); ошибки пробрасываются, чтобы транзакция откатилась целиком.
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(sql, params or ())
+            return _fetch_result(cur, sql, fetchone, fetchall)
+    except (Exception, psycopg2.Error) as e:
+        logger.error(f"DB error in transaction (SQL: {sql[:100]}...): {e}")
+        raise
+
 
 def db_query(sql: str, params: tuple = None, fetchone=False, fetchall=False, commit=False) -> Optional[Any]:
     """Универсальный хелпер для запросов к БД с улучшенной обработкой ошибок"""
+    tx_conn = _tx_conn.get()
+    if tx_conn is not None:
+        return _query_in_transaction(tx_conn, sql, params, fetchone, fetchall)
+
     if not db_pool:
         logger.error("DB pool not available in db_query")
         return None
 
-    conn = None
     max_retries = 3
-    retry_count = 0
 
-    while retry_count < max_retries:
+    for attempt in range(1, max_retries + 1):
+        conn = None
         try:
             conn = db_pool.getconn()
 
-            # Test if connection is alive
-            with conn.cursor() as test_cur:
-                test_cur.execute("SELECT 1")
-
-            # Connection is good, proceed with actual query
+            # Liveness соединений проверяет сам пул (health-check в фоне),
+            # здесь сразу выполняем запрос
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(sql, params or ())
+                result = _fetch_result(cur, sql, fetchone, fetchall)
 
-                if commit:
-                    conn.commit()
-                    if fetchone:
-                        return dict(cur.fetchone()) if cur.rowcount else None
-                    if "RETURNING" in sql.upper() and cur.rowcount:
-                        row = cur.fetchone()
-                        return dict(row) if row else None
-                    return None
-
-                if fetchone:
-                    row = cur.fetchone()
-                    return dict(row) if row else None
-                if fetchall:
-                    return [dict(row) for row in cur.fetchall()]
-
-                # Для INSERT ... RETURNING id
-                if "RETURNING" in sql.upper() and cur.rowcount:
-                    row = cur.fetchone()
-                    return dict(row) if row else None
-
-            # Success - return connection to pool
-            if conn and db_pool:
-                db_pool.putconn(conn)
-            return None
+            if commit:
+                conn.commit()
+            return result
 
         except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
             # Connection error - close bad connection and retry
-            logger.warning(f"DB connection error (attempt {retry_count + 1}/{max_retries}): {e}")
+            logger.warning(f"DB connection error (attempt {attempt}/{max_retries}): {e}")
 
             if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
                 # Remove bad connection from pool
                 try:
                     db_pool.putconn(conn, close=True)
-                except:
+                except Exception:
                     pass
                 conn = None
 
-            retry_count += 1
+            # Соседние idle-соединения, скорее всего, тоже мертвы (рестарт/failover БД):
+            # их проверит health-check поток пула, здесь не ждём
+            db_pool.request_health_check()
 
-            if retry_count >= max_retries:
+            if attempt >= max_retries:
                 logger.error(f"DB query failed after {max_retries} attempts (SQL: {sql[:100]}...): {e}")
                 return None
 
             # Wait a bit before retrying
-            import time
-            time.sleep(0.5 * retry_count)
+            time.sleep(0.5 * attempt)
 
         except (Exception, psycopg2.Error) as e:
             logger.error(f"DB error in db_query (SQL: {sql[:100]}...): {e}")
             if conn:
                 try:
                     conn.rollback()
-                except:
+                except Exception:
                     pass
             return None
 
         finally:
             # Always return connection to pool if we still have it
-            if conn and db_pool:
+            if conn:
                 try:
                     db_pool.putconn(conn)
-                except:
+                except Exception:
                     pass
 
-    return None
\ No newline at end of file
+    return None
+
+
+# Имена server-side курсоров уникальны в пределах соединения
+_stream_ids = itertools.count(1)
+
+
+def db_stream(sql: str, params: tuple = None, batch_size: int = DB_STREAM_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """
+    Читает результат запроса порциями через именованный (server-side) курсор:
+    в памяти не больше batch_size строк, сколько бы их ни вернул запрос.
+
+        for rows in db_stream("SELECT ...", params):
+            ...
+
+    В отличие от db_query ошибки пробрасываются — часть результата нельзя
+    принять за весь. Соединение пула (и открытая на нём читающая транзакция)
+    занято, пока генератор не исчерпан или не закрыт, поэтому долгую работу
+    между порциями (отправка в Telegram и т.п.) лучше делать keyset-страницами.
+    Внутри transaction() курсор открывается на соединении транзакции.
+    """
+    tx_conn = _tx_conn.get()
+    if tx_conn is not None:
+        yield from _stream_rows(tx_conn, sql, params, batch_size)
+        return
+
+    if not db_pool:
+        raise PoolError("DB pool not available")
+
+    conn = db_pool.getconn()
+    success = False
+    close = False
+    try:
+        yield from _stream_rows(conn, sql, params, batch_size)
+        success = True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        close = True
+        raise
+    finally:
+        # Закрытие генератора до конца (break у вызывающего) — тоже штатный случай
+        try:
+            if success:
+                conn.commit()
+            else:
+                conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            close = True
+        db_pool.putconn(conn, close=close)
+
+
+def _stream_rows(conn, sql: str, params: tuple, batch_size: int) -> Iterator[List[Dict]]:
+    try:
+        with conn.cursor(name=f"db_stream_{next(_stream_ids)}", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute(sql, params or ())
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [dict(row) for row in rows]
+    except (Exception, psycopg2.Error) as e:
+        logger.error(f"DB error in db_stream (SQL: {sql[:100]}...): {e}")
+        raise
+
+
+async def _run_in_executor(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """Runs a blocking DB call on the given executor, preserving the caller's contextvars."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
+
+
+async def _run_in_db_executor(func, *args, **kwargs):
+    """
+    Runs a blocking DB call on the DB executor. Inside transaction() the call uses the
+    transaction's connection, so it goes to _db_conn_executor instead.
+    """
+    executor = _db_conn_executor if _tx_conn.get() is not None else _db_executor
+    return await _run_in_executor(executor, func, *args, **kwargs)
+
+
+class transaction:
+    """
+    Unit of work: несколько запросов на одном соединении с одним COMMIT.
+
+        with transaction():
+            db_query(...)
+
+        async with transaction():
+            await db_query_async(...)
+            await save_task_schedule(...)
+
+    db_query / db_query_async (и все функции database.queries.*) внутри блока
+    присоединяются к транзакции: commit=True не коммитит сразу, COMMIT выполняется
+    при выходе из блока, при исключении — ROLLBACK. Вложенный transaction()
+    присоединяется к внешнему.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._token = None
+
+    def _begin(self):
+        if not db_pool:
+            raise PoolError("DB pool not available")
+        return db_pool.getconn()
+
+    def _finish(self, conn, success: bool):
+        close = False
+        try:
+            if success:
+                conn.commit()
+            else:
+                conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            close = True
+            if success:
+                raise
+        finally:
+            db_pool.putconn(conn, close=close)
+
+    def __enter__(self):
+        if _tx_conn.get() is not None:
+            return self
+        self._conn = self._begin()
+        self._token = _tx_conn.set(self._conn)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn is None:
+            return False
+        conn, self._conn = self._conn, None
+        _tx_conn.reset(self._token)
+        self._finish(conn, exc_type is None)
+        return False
+
+    async def __aenter__(self):
+        if _tx_conn.get() is not None:
+            return self
+        self._conn = await _run_in_db_executor(self._begin)
+        self._token = _tx_conn.set(self._conn)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._conn is None:
+            return False
+        conn, self._conn = self._conn, None
+        _tx_conn.reset(self._token)
+        await _run_in_executor(_db_conn_executor, self._finish, conn, exc_type is None)
+        return False
+
+
+async def db_query_async(sql: str, params: tuple = None, fetchone=False, fetchall=False,
+                         commit=False) -> Optional[Any]:
+    """
+    Async version of db_query.
+    The statement runs on the DB executor, so a slow round trip never blocks the event loop.
+    """
+    counter = query_counter.get()
+    if counter is not None:
+        counter.queries += 1
+    return await _run_in_db_executor(db_query, sql, params, fetchone=fetchone, fetchall=fetchall, commit=commit)
+
+
+async def db_stream_async(sql: str, params: tuple = None,
+                          batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+    """
+    Async version of db_stream: each FETCH runs on the DB executor.
+
+        async for rows in db_stream_async("SELECT ...", params):
+            ...
+    """
+    counter = query_counter.get()
+    if counter is not None:
+        counter.queries += 1
+    stream = db_stream(sql, params, batch_size)
+    # Первый FETCH берёт соединение из пула, следующие идут по уже занятому
+    executor = _db_conn_executor if in_transaction() else _db_executor
+    try:
+        while True:
+            rows = await _run_in_executor(executor, next, stream, None)
+            executor = _db_conn_executor
+            if rows is None:
+                return
+            yield rows
+    finally:
+        # Освобождает соединение, если вызывающий вышел из цикла раньше
+        await _run_in_executor(_db_conn_executor, stream.close)
+
+
+async def db_fetchone_async(sql: str, params: tuple = None) -> Optional[Dict]:
+    """Returns the first row as a dict (or None)."""
+    return await db_query_async(sql, params, fetchone=True)
+
+
+async def db_fetchall_async(sql: str, params: tuple = None) -> List[Dict]:
+    """Returns all rows as a list of dicts (empty list on error)."""
+    return await db_query_async(sql, params, fetchall=True) or []
+
+
+async def db_execute_async(sql: str, params: tuple = None) -> Optional[Dict]:
+    """Executes a write statement and commits. Returns the RETURNING row, if any."""
+    return await db_query_async(sql, params, commit=True)
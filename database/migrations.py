@@ -1 +1,369 @@
-# migrations.py
\ No newline at end of file
+"""
+Versioned schema migrations.
+
+Каждая миграция применяется ровно один раз; применённые версии хранятся в
+таблице schema_version. Если схема уже актуальна, старт бота не выполняет
+никакого DDL (только чтение текущей версии).
+
+Миграция — dict:
+    version     — возрастающий номер;
+    name        — короткое описание;
+    statements  — SQL, выполняется в одной транзакции (вместе с записью версии,
+                  если нет concurrent_indexes);
+    concurrent_indexes — [(index_name, "ON table (...)"[, unique]), ...], создаются
+                  после statements через CREATE [UNIQUE] INDEX CONCURRENTLY вне
+                  транзакции (без блокировки записи).
+"""
+
+from typing import List
+
+from database.connection import db_pool
+from database.schema import BASELINE_SCHEMA
+from utils.logging import logger
+
+# Ключ pg_advisory_lock: если несколько инстансов стартуют одновременно,
+# миграции выполняет только один из них
+MIGRATIONS_LOCK_KEY = 7_214_301
+
+MIGRATIONS: List[dict] = [
+    {
+        'version': 1,
+        'name': 'baseline schema',
+        'statements': BASELINE_SCHEMA,
+    },
+    {
+        'version': 2,
+        'name': 'publication_jobs.posted_message_ids',
+        'statements': [
+            # Все message_id поста (альбом = несколько сообщений) для авто-удаления
+            "ALTER TABLE publication_jobs ADD COLUMN IF NOT EXISTS posted_message_ids JSONB",
+        ],
+    },
+    {
+        'version': 3,
+        'name': 'indexes for hot query paths',
+        'concurrent_indexes': [
+            ('idx_jobs_task_status', "ON publication_jobs (task_id, status)"),
+            ('idx_jobs_user_status_time', "ON publication_jobs (user_id, status, scheduled_time_utc)"),
+            ('idx_task_channels_channel', "ON task_channels (channel_id)"),
+            ('idx_channels_user_active', "ON channels (user_id, is_active)"),
+            ('idx_tasks_user_created', "ON tasks (user_id, created_at)"),
+            ('idx_users_username_lower', "ON users (lower(username))"),
+        ],
+    },
+    {
+        'version': 4,
+        'name': 'unique scheduled publication slot',
+        'statements': [
+            # Перед уникальным индексом гасим уже существующие дубликаты слотов
+            """
+            UPDATE publication_jobs p SET status = 'cancelled'
+            WHERE p.status = 'scheduled'
+              AND EXISTS (
+                  SELECT 1 FROM publication_jobs q
+                  WHERE q.status = 'scheduled'
+                    AND q.task_id = p.task_id
+                    AND q.channel_id = p.channel_id
+                    AND q.scheduled_time_utc = p.scheduled_time_utc
+                    AND q.id < p.id
+              )
+            """,
+        ],
+        'concurrent_indexes': [
+            # Цель ON CONFLICT в insert_publication_jobs
+            ('uq_jobs_scheduled_slot',
+             "ON publication_jobs (task_id, channel_id, scheduled_time_utc) WHERE status = 'scheduled'",
+             True),
+        ],
+    },
+    {
+        'version': 5,
+        'name': 'DB-driven publication dispatcher',
+        'statements': [
+            # Когда диспетчер забрал строку (status='publishing'); зависшие захваты -> 'missed'
+            "ALTER TABLE publication_jobs ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+        ],
+        'concurrent_indexes': [
+            # claim_due_publication_batches / get_seconds_until_next_publication
+            ('idx_jobs_due', "ON publication_jobs (scheduled_time_utc) WHERE status = 'scheduled'"),
+            ('idx_jobs_publishing', "ON publication_jobs (claimed_at) WHERE status = 'publishing'"),
+        ],
+    },
+    {
+        'version': 6,
+        'name': 'publication slot lookup for horizon materializer',
+        'concurrent_indexes': [
+            # NOT EXISTS в insert_publication_jobs: слот в любом статусе
+            ('idx_jobs_slot', "ON publication_jobs (task_id, channel_id, scheduled_time_utc)"),
+        ],
+    },
+    {
+        'version': 7,
+        'name': 'durable post-action queue in scheduled_tasks',
+        'statements': [
+            # Жизненный цикл: pending -> running -> done / failed
+            "ALTER TABLE scheduled_tasks ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+            "ALTER TABLE scheduled_tasks ADD COLUMN IF NOT EXISTS executed_at TIMESTAMP",
+            "ALTER TABLE scheduled_tasks ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0",
+            "ALTER TABLE scheduled_tasks ADD COLUMN IF NOT EXISTS last_error TEXT",
+            # Перенос ещё не выполненных действий, которые раньше жили только в JobQueue.
+            # Удалённые посты уже имеют status='deleted'; unpin старше суток не переносим.
+            """
+            INSERT INTO scheduled_tasks (job_id, task_type, execute_at_utc)
+            SELECT p.id, 'delete', p.published_at + make_interval(secs => p.auto_delete_hours * 3600)
+            FROM publication_jobs p
+            WHERE p.status = 'published' AND p.auto_delete_hours > 0
+              AND p.published_at IS NOT NULL AND p.posted_message_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM scheduled_tasks s WHERE s.job_id = p.id AND s.task_type = 'delete')
+            """,
+            """
+            INSERT INTO scheduled_tasks (job_id, task_type, execute_at_utc)
+            SELECT p.id, 'unpin', p.published_at + make_interval(secs => p.pin_duration * 3600)
+            FROM publication_jobs p
+            WHERE p.status = 'published' AND p.pin_duration > 0
+              AND p.published_at IS NOT NULL AND p.posted_message_id IS NOT NULL
+              AND p.published_at + make_interval(secs => p.pin_duration * 3600) > NOW() - INTERVAL '24 hours'
+              AND NOT EXISTS (SELECT 1 FROM scheduled_tasks s WHERE s.job_id = p.id AND s.task_type = 'unpin')
+            """,
+        ],
+        'concurrent_indexes': [
+            # Цель ON CONFLICT в enqueue_post_actions
+            ('uq_scheduled_tasks_job_type', "ON scheduled_tasks (job_id, task_type)", True),
+            # claim_due_post_actions
+            ('idx_scheduled_tasks_due', "ON scheduled_tasks (execute_at_utc) WHERE status = 'pending'"),
+        ],
+    },
+    {
+        'version': 8,
+        'name': 'tasks.message_payload snapshot',
+        'statements': [
+            # Текст/подпись (HTML) и file_id одиночного сообщения на момент сохранения:
+            # подпись free-тарифа добавляется сразу в отправляемый payload
+            "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS message_payload JSONB",
+        ],
+    },
+    {
+        'version': 9,
+        'name': 'compact task schedules',
+        'statements': [
+            # Одна строка на задачу вместо строки на каждую пару (дата | день недели, время)
+            """
+            CREATE TABLE IF NOT EXISTS task_schedule_sets (
+                task_id INTEGER PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+                dates DATE[] NOT NULL DEFAULT '{}',
+                weekday_mask SMALLINT NOT NULL DEFAULT 0,
+                times TIME[] NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # Перенос из task_schedules (код её больше не читает; удаляется в v12)
+            """
+            INSERT INTO task_schedule_sets (task_id, dates, weekday_mask, times)
+            SELECT ts.task_id,
+                   COALESCE(array_agg(DISTINCT ts.schedule_date ORDER BY ts.schedule_date)
+                            FILTER (WHERE ts.schedule_date IS NOT NULL), '{}'),
+                   COALESCE(bit_or(1 << ts.schedule_weekday)
+                            FILTER (WHERE ts.schedule_weekday BETWEEN 0 AND 6), 0),
+                   COALESCE(array_agg(DISTINCT ts.schedule_time ORDER BY ts.schedule_time)
+                            FILTER (WHERE ts.schedule_time IS NOT NULL), '{}')
+            FROM task_schedules ts
+            JOIN tasks t ON t.id = ts.task_id
+            GROUP BY ts.task_id
+            ON CONFLICT (task_id) DO NOTHING
+            """,
+        ],
+    },
+    {
+        'version': 10,
+        'name': 'Postgres-backed bot persistence',
+        'statements': [
+            # Состояние PTB (database/persistence.py): строка на пользователя / чат /
+            # ключ разговора, данные — pickle-blob; пишутся только изменившиеся строки
+            """
+            CREATE TABLE IF NOT EXISTS persistence_user_data (
+                user_id BIGINT PRIMARY KEY,
+                data BYTEA NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS persistence_chat_data (
+                chat_id BIGINT PRIMARY KEY,
+                data BYTEA NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # bot_data и callback_data — по строке на имя
+            """
+            CREATE TABLE IF NOT EXISTS persistence_bot_data (
+                name VARCHAR(32) PRIMARY KEY,
+                data BYTEA NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # key — ключ ConversationHandler (кортеж id) в виде JSON-массива
+            """
+            CREATE TABLE IF NOT EXISTS persistence_conversations (
+                name VARCHAR(64) NOT NULL,
+                key TEXT NOT NULL,
+                state BYTEA NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (name, key)
+            )
+            """,
+        ],
+    },
+    {
+        'version': 11,
+        'name': 'mailing_campaigns',
+        'statements': [
+            # Фоновая рассылка (jobs/mailing.py): получатели идут по возрастанию user_id,
+            # cursor_user_id — последний обработанный; после рестарта рассылка продолжается с него
+            """
+            CREATE TABLE IF NOT EXISTS mailing_campaigns (
+                id SERIAL PRIMARY KEY,
+                owner_id BIGINT NOT NULL,
+                from_chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                excluded_user_ids BIGINT[] NOT NULL DEFAULT '{}',
+                lang VARCHAR(8),
+                status VARCHAR(16) NOT NULL DEFAULT 'running',
+                cursor_user_id BIGINT NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                blocked INTEGER NOT NULL DEFAULT 0,
+                progress_chat_id BIGINT,
+                progress_message_id BIGINT,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_mailing_campaigns_running ON mailing_campaigns (id) WHERE status = 'running'",
+        ],
+    },
+    {
+        'version': 12,
+        'name': 'drop legacy task_schedules',
+        'statements': [
+            # После v9 расписание живёт в task_schedule_sets; вместе с таблицей уходит
+            # и индекс idx_task_schedules_task (его строила v3 на уже существующих базах)
+            "DROP TABLE IF EXISTS task_schedules",
+        ],
+    },
+]
+
+LATEST_VERSION = MIGRATIONS[-1]['version']
+
+
+def _current_version(cur) -> int:
+    cur.execute("SELECT to_regclass('public.schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def _create_index_concurrently(cur, name: str, definition: str, unique: bool = False):
+    """
+    CREATE INDEX CONCURRENTLY при сбое оставляет INVALID-индекс, который
+    IF NOT EXISTS потом молча пропустит. Поэтому такой остаток сначала удаляем.
+    """
+    cur.execute("""
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cur.fetchone()
+    if row and not row[0]:
+        logger.warning(f"Индекс {name} невалиден (прерванная сборка), пересоздаём")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    unique_sql = "UNIQUE " if unique else ""
+    cur.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+
+def _insert_version(cur, migration: dict):
+    cur.execute(
+        "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+        (migration['version'], migration['name'])
+    )
+
+
+def _apply(conn, migration: dict):
+    logger.info(f"Применяем миграцию v{migration['version']}: {migration['name']}")
+    concurrent_indexes = migration.get('concurrent_indexes') or []
+
+    try:
+        with conn.cursor() as cur:
+            for statement in migration.get('statements', []):
+                cur.execute(statement)
+            if not concurrent_indexes:
+                _insert_version(cur, migration)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if not concurrent_indexes:
+        return
+
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for index in concurrent_indexes:
+                _create_index_concurrently(cur, *index)
+            _insert_version(cur, migration)
+    finally:
+        conn.autocommit = False
+
+
+def run_migrations():
+    """Применяет все неприменённые миграции по порядку."""
+    if not db_pool:
+        logger.error("Database pool not available in run_migrations")
+        return
+
+    conn = db_pool.getconn()
+    locked = False
+    try:
+        # Быстрый путь: схема актуальна — никакого DDL и блокировок
+        with conn.cursor() as cur:
+            current = _current_version(cur)
+        conn.rollback()
+        if current >= LATEST_VERSION:
+            logger.info(f"Схема БД актуальна (v{current}), миграции не требуются")
+            return
+
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+            locked = True
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255),
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Пока ждали блокировку, миграции мог применить другой инстанс
+            current = _current_version(cur)
+        conn.autocommit = False
+
+        for migration in MIGRATIONS:
+            if migration['version'] > current:
+                _apply(conn, migration)
+
+        logger.info(f"База данных успешно мигрирована до v{LATEST_VERSION}")
+    finally:
+        if locked:
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_KEY,))
+                conn.autocommit = False
+            except Exception as e:
+                logger.warning(f"Не удалось снять advisory lock миграций: {e}")
+        db_pool.putconn(conn)
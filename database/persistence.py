@@ -0,0 +1,326 @@
+import asyncio
+import io
+import json
+import pickle
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config.settings import USER_STATE_IDLE_TTL
+from database.connection import db_query_async, db_stream_async, transaction
+from utils.logging import logger
+
+_BOT_PLACEHOLDER = 'bot'
+
+# Ключи user_data, нужные только пока пользователь на экране; у простаивающих
+# пользователей удаляются (вытеснение в jobs/user_state.py и загрузка старой строки)
+TRANSIENT_USER_KEYS = ('calendar_year', 'calendar_month', 'temp_message_ids', 'last_bot_message_id')
+# Старый буфер альбомов (объекты Message) — теперь альбомы собираются в
+# services/media_group_service.py; из загруженных строк удаляется всегда
+LEGACY_USER_KEYS = ('media_group_buffer',)
+
+# Таблицы (см. миграцию v10): kind -> (таблица, ключевые колонки, SQL-типы ключей)
+_TABLES = {
+    'user_data': ('persistence_user_data', ('user_id',), ('bigint',)),
+    'chat_data': ('persistence_chat_data', ('chat_id',), ('bigint',)),
+    'bot_data': ('persistence_bot_data', ('name',), ('varchar',)),
+    'conversations': ('persistence_conversations', ('name', 'key'), ('varchar', 'text')),
+}
+# Колонка с данными: у разговоров — state, у остальных — data
+_DATA_COLUMN = {'conversations': 'state'}
+
+
+class _BotPickler(pickle.Pickler):
+    """Как в PicklePersistence: экземпляр Bot не сериализуется, вместо него — placeholder"""
+
+    def __init__(self, bot, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bot = bot
+
+    def persistent_id(self, obj):
+        if self._bot is not None and obj is self._bot:
+            return _BOT_PLACEHOLDER
+        return None
+
+
+class _BotUnpickler(pickle.Unpickler):
+    def __init__(self, bot, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bot = bot
+
+    def persistent_load(self, pid):
+        if pid == _BOT_PLACEHOLDER:
+            return self._bot
+        raise pickle.UnpicklingError(f"Unknown persistent id: {pid}")
+
+
+class PostgresPersistence(BasePersistence):
+    """
+    Persistence PTB в Postgres вместо одного state.pkl.
+
+    Строка на пользователя / чат / ключ разговора, данные — pickle-blob (BYTEA).
+    update_* пишут строку, только если blob изменился (сравнение по хешу
+    последней записанной версии): PTB вызывает update_user_data для каждого
+    пользователя, затронутого update'ом, даже если его user_data не поменялся.
+    Все изменения одного цикла persistence (Application.update_persistence)
+    собираются и пишутся одной транзакцией — по одному bulk-запросу на таблицу.
+
+    user_data загружается лениво: при старте Application получает пустой dict,
+    строка пользователя читается в refresh_user_data (PTB вызывает его перед
+    каждым callback'ом) при первом обращении. Загруженные пользователи учитываются
+    в LRU (_resident); простаивающих вытесняет jobs/user_state.py. update_user_data
+    для незагруженного пользователя не пишется — иначе пустой dict, созданный
+    defaultdict'ом Application, затёр бы строку в БД.
+    Разговоры (ключ -> номер состояния) малы и загружаются целиком при старте.
+    """
+
+    def __init__(self, store_data: Optional[PersistenceInput] = None, update_interval: float = 60):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        # Хеш последней записанной версии: (kind, key) -> digest
+        self._digests: Dict[Tuple[str, Any], bytes] = {}
+        # Ожидают записи: (kind, key) -> blob (None — удалить строку)
+        self._pending: Dict[Tuple[str, Any], Optional[bytes]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        # Загруженные пользователи: user_id -> время последнего обращения (monotonic), порядок — LRU
+        self._resident: 'OrderedDict[int, float]' = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    # --- сериализация ---
+
+    def _dumps(self, obj: Any) -> bytes:
+        buffer = io.BytesIO()
+        _BotPickler(getattr(self, 'bot', None), buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+        return buffer.getvalue()
+
+    def _loads(self, blob) -> Any:
+        return _BotUnpickler(getattr(self, 'bot', None), io.BytesIO(bytes(blob))).load()
+
+    @staticmethod
+    def _digest(blob: bytes) -> bytes:
+        return blake2b(blob, digest_size=16).digest()
+
+    @staticmethod
+    def _conversation_key(key: tuple) -> str:
+        return json.dumps(list(key), separators=(',', ':'))
+
+    # --- загрузка (один раз, при Application.initialize) ---
+
+    async def _load_rows(self, kind: str, where: str = '', params: tuple = ()) -> Dict[Any, Any]:
+        table, key_columns, _ = _TABLES[kind]
+        data_column = _DATA_COLUMN.get(kind, 'data')
+        result = {}
+        # Порциями (server-side cursor): в памяти одновременно только распакованные объекты
+        # и одна порция blob'ов, а не весь результат запроса списком
+        try:
+            async for rows in db_stream_async(
+                f"SELECT {', '.join(key_columns)}, {data_column} AS blob FROM {table} {where}", params
+            ):
+                for row in rows:
+                    key = tuple(row[column] for column in key_columns)
+                    key = key[0] if len(key) == 1 else key
+                    try:
+                        result[key] = self._loads(row['blob'])
+                    except Exception as e:
+                        # Битая строка теряет только своё состояние, а не весь файл
+                        logger.error(f"Persistence: не удалось загрузить {kind} {key}: {e}")
+                        continue
+                    self._digests[(kind, key)] = self._digest(bytes(row['blob']))
+        except Exception as e:
+            # Как и раньше при ошибке БД — старт с пустым состоянием, а не с его частью
+            logger.error(f"Persistence: не удалось загрузить {kind}: {e}")
+            return {}
+        return result
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        # Лениво: строки читаются по одной в refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return await self._load_rows('chat_data')
+
+    async def get_bot_data(self) -> Dict:
+        return (await self._load_rows('bot_data')).get('bot_data', {})
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return (await self._load_rows('bot_data')).get('callback_data')
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        rows = await self._load_rows('conversations', "WHERE name = %s", (name,))
+        return {tuple(json.loads(key)): state for (_, key), state in rows.items()}
+
+    # --- запись ---
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        if user_id not in self._resident:
+            logger.debug(f"Persistence: user_data {user_id} не загружен, запись пропущена")
+            return
+        await self._stage('user_data', user_id, self._dumps(data))
+
+    async def store_user_data(self, user_id: int, data: Dict) -> None:
+        """Запись user_data без загрузки пользователя в память (импорт, бенчмарки)"""
+        await self._stage('user_data', user_id, self._dumps(data))
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        await self._stage('chat_data', chat_id, self._dumps(data))
+
+    async def update_bot_data(self, data: Dict) -> None:
+        await self._stage('bot_data', 'bot_data', self._dumps(data))
+
+    async def update_callback_data(self, data: Any) -> None:
+        await self._stage('bot_data', 'callback_data', self._dumps(data))
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        blob = None if new_state is None else self._dumps(new_state)
+        await self._stage('conversations', (name, self._conversation_key(key)), blob)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._resident.pop(user_id, None)
+        await self._stage('user_data', user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._stage('chat_data', chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        """Первое обращение к пользователю — загрузка его строки в user_data Application."""
+        if user_id in self._resident:
+            self._resident[user_id] = time.monotonic()
+            self._resident.move_to_end(user_id)
+            return
+        # Параллельные callback'и одного пользователя ждут одну загрузку
+        task = self._loading.get(user_id)
+        if task is None:
+            task = self._loading[user_id] = asyncio.create_task(self._load_user(user_id, user_data))
+            task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        await asyncio.shield(task)
+
+    async def _load_user(self, user_id: int, user_data: Dict):
+        # Через transaction(): ошибка БД пробрасывается, а не выглядит как «строки нет» —
+        # незагруженный пользователь не будет перезаписан пустым dict
+        async with transaction():
+            row = await db_query_async("""
+                SELECT data, EXTRACT(EPOCH FROM NOW() - updated_at) AS age
+                FROM persistence_user_data WHERE user_id = %s
+            """, (user_id,), fetchone=True)
+        if row:
+            try:
+                loaded = self._loads(row['data'])
+            except Exception as e:
+                logger.error(f"Persistence: не удалось загрузить user_data {user_id}: {e}")
+                loaded = {}
+            else:
+                self._digests[('user_data', user_id)] = self._digest(bytes(row['data']))
+            if row['age'] is not None and row['age'] >= USER_STATE_IDLE_TTL:
+                # Строка старше idle TTL (например, записана до вытеснения / рестарта) — сжимаем
+                for key in TRANSIENT_USER_KEYS:
+                    loaded.pop(key, None)
+            for key in LEGACY_USER_KEYS:
+                loaded.pop(key, None)
+            # Ключи, уже записанные в dict до загрузки, важнее сохранённых
+            user_data.update({key: value for key, value in loaded.items() if key not in user_data})
+        self._resident[user_id] = time.monotonic()
+        self.loads += 1
+
+    def eviction_candidates(self, idle_ttl: float, max_resident: int) -> List[int]:
+        """Пользователи для вытеснения: простаивающие дольше idle_ttl и сверх max_resident (LRU)"""
+        now = time.monotonic()
+        over_cap = len(self._resident) - max_resident
+        candidates = []
+        for user_id, last_seen in self._resident.items():
+            if now - last_seen >= idle_ttl or len(candidates) < over_cap:
+                candidates.append(user_id)
+            else:
+                break
+        return candidates
+
+    def last_seen(self, user_id: int) -> Optional[float]:
+        return self._resident.get(user_id)
+
+    def forget_user(self, user_id: int):
+        """Пользователь вытеснен из памяти: следующее обращение снова загрузит строку"""
+        if self._resident.pop(user_id, None) is not None:
+            self.evictions += 1
+        self._digests.pop(('user_data', user_id), None)
+
+    def stats(self) -> dict:
+        """Для /debug_jobs"""
+        return {'resident_users': len(self._resident), 'loads': self.loads, 'evictions': self.evictions}
+
+    # Остальные данные в памяти Application — источник истины, перечитывать из БД нечего
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Строки пишутся сразу в update_*; здесь только дожидаемся записи в процессе."""
+        if self._write_task is not None and not self._write_task.done():
+            await asyncio.shield(self._write_task)
+
+    async def _stage(self, kind: str, key: Any, blob: Optional[bytes]):
+        """
+        Ставит строку в очередь на запись и ждёт, пока очередь будет записана.
+        Неизменившаяся строка (тот же хеш) не пишется вовсе.
+        """
+        digest = None if blob is None else self._digest(blob)
+        entry = (kind, key)
+        if entry not in self._pending and self._digests.get(entry) == digest:
+            return
+        self._pending[entry] = blob
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_pending())
+        await asyncio.shield(self._write_task)
+
+    async def _write_pending(self):
+        # Даём остальным update_* этого цикла persistence встать в ту же очередь
+        await asyncio.sleep(0)
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            await self._write_batch(batch)
+            for entry, blob in batch.items():
+                if blob is None:
+                    self._digests.pop(entry, None)
+                else:
+                    self._digests[entry] = self._digest(blob)
+
+    async def _write_batch(self, batch: Dict[Tuple[str, Any], Optional[bytes]]):
+        upserts: Dict[str, list] = {}
+        deletes: Dict[str, list] = {}
+        for (kind, key), blob in batch.items():
+            keys = key if isinstance(key, tuple) else (key,)
+            if blob is None:
+                deletes.setdefault(kind, []).append(keys)
+            else:
+                upserts.setdefault(kind, []).append(keys + (blob,))
+
+        async with transaction():
+            for kind, rows in upserts.items():
+                table, key_columns, key_types = _TABLES[kind]
+                data_column = _DATA_COLUMN.get(kind, 'data')
+                columns = key_columns + (data_column,)
+                arrays = tuple(list(column) for column in zip(*rows))
+                unnest_args = ', '.join(f"%s::{sql_type}[]" for sql_type in key_types + ('bytea',))
+                await db_query_async(f"""
+                    INSERT INTO {table} ({', '.join(columns)}, updated_at)
+                    SELECT r.*, NOW() FROM unnest({unnest_args}) AS r({', '.join(columns)})
+                    ON CONFLICT ({', '.join(key_columns)}) DO UPDATE
+                    SET {data_column} = EXCLUDED.{data_column}, updated_at = NOW()
+                """, arrays, commit=True)
+
+            for kind, rows in deletes.items():
+                table, key_columns, key_types = _TABLES[kind]
+                arrays = tuple(list(column) for column in zip(*rows))
+                unnest_args = ', '.join(f"%s::{sql_type}[]" for sql_type in key_types)
+                await db_query_async(f"""
+                    DELETE FROM {table}
+                    WHERE ({', '.join(key_columns)}) IN (SELECT * FROM unnest({unnest_args}))
+                """, arrays, commit=True)
+
+        logger.debug(f"Persistence: записано {sum(map(len, upserts.values()))} строк, "
+                     f"удалено {sum(map(len, deletes.values()))}")
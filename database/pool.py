@@ -0,0 +1,318 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Deque, List, Tuple, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from utils.logging import logger
+
+
+class ConnectionPool:
+    """
+    Thread-safe пул соединений psycopg2 с управлением здоровьем соединений.
+
+    - idle-соединения проверяются в фоне (health-check поток), а не на каждом checkout;
+    - соединения старше max_lifetime закрываются и пересоздаются;
+    - request_health_check() просит health-check поток сразу проверить все idle-соединения
+      (после OperationalError, например при failover базы); запросы, пришедшие во время
+      проверки, схлопываются в одну — сам запрос не делает SELECT 1 в потоке вызывающего;
+    - при исчерпании пула getconn() ждёт освобождения соединения до timeout секунд
+      (очередь ожидания на Condition) и только потом бросает PoolError.
+
+    API совместим с psycopg2.pool: getconn() / putconn(conn, close=False) / closeall().
+    """
+
+    def __init__(self, minconn: int, maxconn: int, dsn: str,
+                 max_lifetime: float = 1800, health_check_interval: float = 60,
+                 timeout: float = 30):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.dsn = dsn
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+
+        self._lock = threading.Condition()
+        self._idle: Deque[Tuple[extensions.connection, float]] = deque()  # (conn, returned_at)
+        self._used: Dict[int, extensions.connection] = {}
+        self._created_at: Dict[int, float] = {}
+        self._opening = 0
+        self._waiting = 0
+        self.closed = False
+
+        # Метрики (защищены self._lock)
+        self._checkouts = 0
+        self._waited_checkouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._exhausted = 0
+        self._timeouts = 0
+        self._in_use_peak = 0
+
+        for _ in range(minconn):
+            conn = self._connect()
+            self._idle.append((conn, time.monotonic()))
+
+        self._stop = threading.Event()
+        self._check_requested = threading.Event()
+        # Поток работает и при health_check_interval=0: тогда только по request_health_check()
+        self._health_thread = threading.Thread(
+            target=self._health_loop, name="db-pool-health", daemon=True
+        )
+        self._health_thread.start()
+
+    # --- Connections ---
+
+    def _connect(self) -> extensions.connection:
+        conn = psycopg2.connect(self.dsn)
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _expired(self, conn) -> bool:
+        if not self.max_lifetime:
+            return False
+        created = self._created_at.get(id(conn), 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def _close(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout: Optional[float] = None) -> extensions.connection:
+        """
+        Берёт соединение из пула (LIFO — самые «тёплые» соединения первыми).
+        Если все maxconn соединений заняты, ждёт до timeout секунд (по умолчанию self.timeout).
+        """
+        if timeout is None:
+            timeout = self.timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        stale = []
+        waited = False
+        conn = None
+
+        with self._lock:
+            while True:
+                if self.closed:
+                    raise PoolError("connection pool is closed")
+                while self._idle:
+                    candidate, _ = self._idle.pop()
+                    if candidate.closed or self._expired(candidate):
+                        stale.append(candidate)
+                        continue
+                    conn = candidate
+                    break
+                if conn is not None or len(self._used) + self._opening < self.maxconn:
+                    break
+
+                # Пул исчерпан — встаём в очередь ожидания
+                if not waited:
+                    self._exhausted += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._record_wait(time.monotonic() - started, waited)
+                    for c in stale:
+                        self._close(c)
+                    raise PoolError(f"connection pool exhausted (waited {timeout:.1f}s)")
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            if conn is not None:
+                self._mark_used(conn)
+            else:
+                self._opening += 1
+            self._record_wait(time.monotonic() - started, waited)
+
+        for c in stale:
+            self._close(c)
+        if conn is not None:
+            return conn
+
+        # Новое соединение открываем вне блокировки: connect может занять время
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._opening -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._opening -= 1
+            self._mark_used(conn)
+        return conn
+
+    def _mark_used(self, conn):
+        self._used[id(conn)] = conn
+        self._checkouts += 1
+        self._in_use_peak = max(self._in_use_peak, len(self._used))
+
+    def _record_wait(self, elapsed: float, waited: bool):
+        if not waited:
+            return
+        self._waited_checkouts += 1
+        self._wait_time_total += elapsed
+        self._wait_time_max = max(self._wait_time_max, elapsed)
+
+    def putconn(self, conn, close: bool = False):
+        """Возвращает соединение в пул. Незавершённая транзакция откатывается."""
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = True
+        if not close and self._expired(conn):
+            close = True
+
+        with self._lock:
+            if self._used.pop(id(conn), None) is None:
+                raise PoolError("trying to put unkeyed connection")
+            # Освободился слот (или idle-соединение) — будим одного ожидающего
+            self._lock.notify()
+            if not (close or conn.closed or self.closed):
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def closeall(self):
+        """Закрывает все соединения и останавливает health-check поток."""
+        self._stop.set()
+        self._check_requested.set()
+        with self._lock:
+            self.closed = True
+            conns = [c for c, _ in self._idle] + list(self._used.values())
+            self._idle.clear()
+            self._used.clear()
+            self._lock.notify_all()
+        for conn in conns:
+            self._close(conn)
+
+    # --- Metrics ---
+
+    def stats(self) -> dict:
+        """Снимок метрик пула для мониторинга и подбора DB_POOL_MAX."""
+        with self._lock:
+            waited = self._waited_checkouts
+            return {
+                'max': self.maxconn,
+                'in_use': len(self._used),
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'waiting': self._waiting,
+                'in_use_peak': self._in_use_peak,
+                'checkouts': self._checkouts,
+                'waited_checkouts': waited,
+                'wait_avg_ms': (self._wait_time_total / waited * 1000) if waited else 0.0,
+                'wait_max_ms': self._wait_time_max * 1000,
+                'exhausted': self._exhausted,
+                'timeouts': self._timeouts,
+            }
+
+    # --- Health management ---
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _check_idle(self, min_idle_seconds: float = 0) -> int:
+        """
+        Проверяет idle-соединения, простоявшие не меньше min_idle_seconds.
+        Соединения на время проверки изымаются из пула, чтобы их никто не взял.
+        Returns: количество закрытых (мёртвых или устаревших) соединений.
+        """
+        now = time.monotonic()
+        to_check: List[extensions.connection] = []
+        with self._lock:
+            keep = deque()
+            for conn, returned_at in self._idle:
+                if now - returned_at >= min_idle_seconds:
+                    to_check.append(conn)
+                else:
+                    keep.append((conn, returned_at))
+            self._idle = keep
+            self._opening += len(to_check)
+
+        dropped = 0
+        healthy = []
+        for conn in to_check:
+            if not self._expired(conn) and self._is_alive(conn):
+                healthy.append(conn)
+            else:
+                self._close(conn)
+                dropped += 1
+
+        with self._lock:
+            self._opening -= len(to_check)
+            if self.closed:
+                for conn in healthy:
+                    self._close(conn)
+                return dropped
+            for conn in healthy:
+                self._idle.appendleft((conn, now))
+            self._lock.notify(len(to_check))
+
+        if dropped:
+            logger.warning(f"DB pool: dropped {dropped} dead/expired idle connection(s)")
+        return dropped
+
+    def validate_idle(self) -> int:
+        """Синхронно проверяет все idle-соединения (в потоке вызывающего)."""
+        return self._check_idle(0)
+
+    def request_health_check(self):
+        """Просит health-check поток проверить все idle-соединения сейчас (не блокирует)."""
+        self._check_requested.set()
+
+    def _fill_to_min(self):
+        while True:
+            with self._lock:
+                if self.closed or len(self._idle) + len(self._used) + self._opening >= self.minconn:
+                    return
+                self._opening += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.warning(f"DB pool: failed to open connection: {e}")
+                with self._lock:
+                    self._opening -= 1
+                return
+            with self._lock:
+                self._opening -= 1
+                self._idle.appendleft((conn, time.monotonic()))
+                self._lock.notify()
+
+    def _health_loop(self):
+        interval = self.health_check_interval or None
+        while True:
+            requested = self._check_requested.wait(interval)
+            if self._stop.is_set():
+                return
+            # Запросы, пришедшие во время этой проверки, вызовут ещё одну — не по одной на запрос
+            self._check_requested.clear()
+            try:
+                self._check_idle(0 if requested else self.health_check_interval)
+                self._fill_to_min()
+            except Exception as e:
+                logger.error(f"DB pool health check failed: {e}")
@@ -1,29 +1,29 @@
 from typing import List, Dict
 
-from database.connection import db_query
+from database.connection import db_query_async
 from utils.logging import logger
 
 
-def get_user_channels(user_id: int) -> List[Dict]:
-    return db_query("""
+async def get_user_channels(user_id: int) -> List[Dict]:
+    return await db_query_async("""
         SELECT * FROM channels
         WHERE user_id = %s AND is_active = TRUE
         ORDER BY added_at DESC
     """, (user_id,), fetchall=True) or []
 
-def add_channel(user_id: int, channel_id: int, title: str, username: str = None) -> tuple[bool, str]:
+async def add_channel(user_id: int, channel_id: int, title: str, username: str = None) -> tuple[bool, str]:
     """
     Добавляет канал.
     Возвращает (True, msg) если успешно или (False, msg) если канал занят другим юзером.
     """
     # 1. Check if channel exists and belongs to another user
-    existing = db_query("SELECT user_id FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
+    existing = await db_query_async("SELECT user_id FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
 
     if existing and existing['user_id'] != user_id:
         return False, "occupied"
 
     # 2. Insert or Update (Only if owner is same or new)
-    db_query("""
+    await db_query_async("""
         INSERT INTO channels (user_id, channel_id, channel_title, channel_username, is_active)
         VALUES (%s, %s, %s, %s, TRUE)
         ON CONFLICT (channel_id) DO UPDATE
@@ -37,8 +37,17 @@ def add_channel(user_id: int, channel_id: int, title: str, username: str = None)
     return True, "success"
 
 
-def deactivate_channel(channel_id: int):
-    db_query("UPDATE channels SET is_active = FALSE WHERE channel_id = %s", (channel_id,), commit=True)
+async def deactivate_channel(channel_id: int):
+    await db_query_async("UPDATE channels SET is_active = FALSE WHERE channel_id = %s", (channel_id,), commit=True)
     logger.info(f"Канал {channel_id} деактивирован")
 
 
+async def get_channels_info(channel_ids: List[int]) -> Dict[int, Dict]:
+    """Название и username сразу нескольких каналов одним запросом: {channel_id: row}"""
+    if not channel_ids:
+        return {}
+    rows = await db_query_async("""
+        SELECT channel_id, channel_title, channel_username
+        FROM channels WHERE channel_id = ANY(%s)
+    """, (channel_ids,), fetchall=True) or []
+    return {row['channel_id']: row for row in rows}
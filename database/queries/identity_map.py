@@ -0,0 +1,119 @@
+import copy
+import functools
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from database.connection import in_transaction, query_counter
+
+# Виды записей карты (ключ — (kind, task_id))
+KIND_TASK = 'task'
+KIND_SCHEDULE = 'schedule'
+KIND_CHANNELS = 'channels'
+ALL_KINDS = (KIND_TASK, KIND_SCHEDULE, KIND_CHANNELS)
+
+
+class RequestScope:
+    """
+    Identity map одного update'а: задача, расписание и каналы по task_id.
+    Заодно считает запросы к БД за update (queries) и попадания в карту (hits).
+    """
+    __slots__ = ('entries', 'queries', 'hits', 'generation', 'closed')
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, int], Any] = {}
+        self.queries = 0
+        self.hits = 0
+        # Растёт при каждой инвалидации: чтение, начатое до записи, не попадёт в карту
+        self.generation = 0
+        self.closed = False
+
+
+_scope: ContextVar[Optional[RequestScope]] = ContextVar('identity_map_scope', default=None)
+
+
+class request_scope:
+    """
+    Открывает identity map на время одного update'а:
+
+        with request_scope() as scope:
+            await application.process_update(update)
+
+    Вне блока (jobs, диспетчер, восстановление) чтения всегда идут в БД.
+    Задачи, запущенные из handler'а через create_task, наследуют scope, но
+    после выхода из блока он закрыт и не используется.
+    """
+
+    def __init__(self):
+        self.scope = RequestScope()
+        self._token = None
+        self._counter_token = None
+
+    def __enter__(self) -> RequestScope:
+        self._token = _scope.set(self.scope)
+        self._counter_token = query_counter.set(self.scope)
+        return self.scope
+
+    def __exit__(self, exc_type, exc, tb):
+        self.scope.closed = True
+        self.scope.entries.clear()
+        query_counter.reset(self._counter_token)
+        _scope.reset(self._token)
+        return False
+
+
+def _active_scope() -> Optional[RequestScope]:
+    scope = _scope.get()
+    if scope is None or scope.closed:
+        return None
+    return scope
+
+
+def identity_mapped(kind: str):
+    """
+    Кэширует чтение func(task_id) в identity map текущего update'а.
+
+    Мимо карты идут: вызовы вне request_scope, вызовы с дополнительными аргументами
+    (например, for_update=True) и всё внутри transaction() — там читается состояние
+    незакоммиченной транзакции. Значения отдаются копией, чтобы изменения объекта
+    вызывающим кодом (TaskSchedule в конструкторе) не попадали в карту.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(task_id: int, *args, **kwargs):
+            scope = _active_scope()
+            if scope is None or args or kwargs or in_transaction():
+                return await func(task_id, *args, **kwargs)
+
+            key = (kind, task_id)
+            if key in scope.entries:
+                scope.hits += 1
+                return copy.deepcopy(scope.entries[key])
+
+            generation = scope.generation
+            result = await func(task_id)
+            # None — задачи нет или ошибка БД: не кэшируем
+            if result is not None and scope.generation == generation and not scope.closed:
+                scope.entries[key] = copy.deepcopy(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def invalidate_task(task_id: int, *kinds: str):
+    """Сбрасывает записи задачи (по умолчанию — все виды). Вызывается после записи в БД."""
+    scope = _active_scope()
+    if scope is None:
+        return
+    scope.generation += 1
+    for kind in kinds or ALL_KINDS:
+        scope.entries.pop((kind, task_id), None)
+
+
+def invalidate_kind(kind: str):
+    """Сбрасывает записи вида kind у всех задач (запись, затрагивающая много задач)."""
+    scope = _active_scope()
+    if scope is None:
+        return
+    scope.generation += 1
+    for key in [key for key in scope.entries if key[0] == kind]:
+        del scope.entries[key]
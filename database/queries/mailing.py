@@ -0,0 +1,70 @@
+from typing import Optional, Dict, List
+
+from database.connection import db_query_async, transaction
+from database.queries.users import deactivate_users, invalidate_user_settings
+
+
+async def create_mailing_campaign(owner_id: int, from_chat_id: int, message_id: int,
+                                  excluded_user_ids: List[int], lang: str = None) -> Optional[Dict]:
+    """Создаёт рассылку (status='running'); total — активные пользователи без исключённых"""
+    return await db_query_async("""
+        INSERT INTO mailing_campaigns (owner_id, from_chat_id, message_id, excluded_user_ids, lang, total)
+        SELECT %s, %s, %s, %s::bigint[], %s, COUNT(*)
+        FROM users
+        WHERE is_active = TRUE AND user_id <> ALL(%s::bigint[])
+        RETURNING *
+    """, (owner_id, from_chat_id, message_id, excluded_user_ids, lang, excluded_user_ids), commit=True)
+
+
+async def set_mailing_progress_message(campaign_id: int, chat_id: int, message_id: int):
+    await db_query_async("""
+        UPDATE mailing_campaigns SET progress_chat_id = %s, progress_message_id = %s WHERE id = %s
+    """, (chat_id, message_id, campaign_id), commit=True)
+
+
+async def get_running_mailing_campaigns() -> List[Dict]:
+    """Незавершённые рассылки — продолжаются после рестарта"""
+    return await db_query_async(
+        "SELECT * FROM mailing_campaigns WHERE status = 'running' ORDER BY id", fetchall=True
+    ) or []
+
+
+async def get_mailing_recipients_page(after_user_id: int, excluded_user_ids: List[int],
+                                      limit: int) -> Optional[List[int]]:
+    """
+    Следующие получатели после курсора (keyset по user_id, индекс PK).
+    Не db_stream: рассылка идёт часами (лимит Telegram), а server-side курсор держал бы
+    соединение пула и открытую транзакцию всё это время и не пережил бы рестарт.
+    Returns: список user_id; None — ошибка БД (не путать с концом рассылки).
+    """
+    rows = await db_query_async("""
+        SELECT user_id FROM users
+        WHERE is_active = TRUE AND user_id > %s AND user_id <> ALL(%s::bigint[])
+        ORDER BY user_id
+        LIMIT %s
+    """, (after_user_id, excluded_user_ids, limit), fetchall=True)
+    if rows is None:
+        return None
+    return [row['user_id'] for row in rows]
+
+
+async def save_mailing_checkpoint(campaign_id: int, cursor_user_id: int, sent: int, failed: int,
+                                  blocked: int, blocked_user_ids: List[int]):
+    """Курсор и счётчики рассылки + деактивация заблокировавших бота — одной транзакцией (raises при ошибке БД)"""
+    async with transaction():
+        await deactivate_users(blocked_user_ids)
+        await db_query_async("""
+            UPDATE mailing_campaigns
+            SET cursor_user_id = %s, sent = %s, failed = %s, blocked = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (cursor_user_id, sent, failed, blocked, campaign_id), commit=True)
+    # После COMMIT, иначе в кэш мог попасть старый is_active = TRUE
+    invalidate_user_settings(blocked_user_ids)
+
+
+async def finish_mailing_campaign(campaign_id: int, status: str = 'done'):
+    await db_query_async("""
+        UPDATE mailing_campaigns
+        SET status = %s, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (status, campaign_id), commit=True)
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import List, Dict, Tuple
+
+from database.connection import db_query_async
+
+# Типы отложенных действий над опубликованным постом (scheduled_tasks.task_type)
+POST_ACTION_UNPIN = 'unpin'
+POST_ACTION_DELETE = 'delete'
+
+
+async def enqueue_post_actions(actions: List[Tuple[int, str, datetime]]):
+    """
+    Ставит unpin / auto-delete в очередь scheduled_tasks (status='pending') одним INSERT.
+    actions: [(job_id, task_type, execute_at_utc), ...]
+    Повторная постановка того же действия для той же публикации игнорируется.
+    """
+    if not actions:
+        return
+    await db_query_async("""
+        INSERT INTO scheduled_tasks (job_id, task_type, execute_at_utc, status)
+        SELECT r.job_id, r.task_type, r.execute_at_utc, 'pending'
+        FROM unnest(%s::int[], %s::varchar[], %s::timestamptz[]) AS r(job_id, task_type, execute_at_utc)
+        ON CONFLICT (job_id, task_type) DO NOTHING
+    """, (
+        [job_id for job_id, _, _ in actions],
+        [task_type for _, task_type, _ in actions],
+        [execute_at for _, _, execute_at in actions],
+    ), commit=True)
+
+
+async def claim_due_post_actions(limit: int, stale_claim_seconds: int) -> List[Dict]:
+    """
+    Атомарно забирает до limit наступивших действий (pending -> running), а также
+    «зависшие» running (воркер упал) — действия идемпотентны, их можно повторить.
+    Returns: строки с данными публикации (channel_id, posted_message_id(s)) и attempts.
+    """
+    return await db_query_async("""
+        UPDATE scheduled_tasks st
+        SET status = 'running', claimed_at = now(), attempts = COALESCE(st.attempts, 0) + 1
+        FROM publication_jobs p
+        WHERE p.id = st.job_id
+          AND st.id IN (
+              SELECT id FROM scheduled_tasks
+              WHERE (status = 'pending' AND execute_at_utc <= now())
+                 OR (status = 'running' AND claimed_at < now() - make_interval(secs => %s))
+              ORDER BY execute_at_utc
+              LIMIT %s
+              FOR UPDATE SKIP LOCKED
+          )
+        RETURNING st.id, st.job_id, st.task_type, st.attempts,
+                  p.channel_id, p.posted_message_id, p.posted_message_ids
+    """, (stale_claim_seconds, limit), fetchall=True, commit=True) or []
+
+
+async def complete_post_action(action_id: int):
+    await db_query_async(
+        "UPDATE scheduled_tasks SET status = 'done', executed_at = now(), last_error = NULL WHERE id = %s",
+        (action_id,), commit=True
+    )
+
+
+async def fail_post_action(action_id: int, error: str, retry_in_seconds: int = None):
+    """Ошибка выполнения: повтор через retry_in_seconds (status='pending') или окончательный 'failed'."""
+    if retry_in_seconds is None:
+        await db_query_async(
+            "UPDATE scheduled_tasks SET status = 'failed', executed_at = now(), last_error = %s WHERE id = %s",
+            (error, action_id), commit=True
+        )
+    else:
+        await db_query_async("""
+            UPDATE scheduled_tasks
+            SET status = 'pending', execute_at_utc = now() + make_interval(secs => %s), last_error = %s
+            WHERE id = %s
+        """, (retry_in_seconds, error, action_id), commit=True)
+
+
+async def get_post_action_counts() -> Dict[str, int]:
+    """Количество действий по статусам (для /debug_jobs)"""
+    rows = await db_query_async(
+        "SELECT status, COUNT(*) AS count FROM scheduled_tasks GROUP BY status", fetchall=True
+    ) or []
+    return {row['status']: row['count'] for row in rows}
@@ -1,32 +1,228 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
+from database.connection import db_query_async
 from utils.logging import logger
 
 
 async def cancel_task_jobs(task_id: int, context: ContextTypes.DEFAULT_TYPE):
     """
-    Cancels all scheduled jobs for a specific task in both JobQueue and DB.
+    Cancels all scheduled jobs for a specific task.
+    Публикации выполняет DB-диспетчер (jobs/dispatcher.py), поэтому достаточно
+    сменить статус в БД — в JobQueue таймеров публикаций нет.
     Used before refreshing a task to avoid duplicates.
     """
-    # 1. Find scheduled jobs in DB
-    jobs_to_cancel = db_query(
-        "SELECT aps_job_id FROM publication_jobs WHERE task_id = %s AND status = 'scheduled' AND aps_job_id IS NOT NULL",
-        (task_id,), fetchall=True
-    )
-
-    if jobs_to_cancel:
-        for job_row in jobs_to_cancel:
-            job_name = job_row.get('aps_job_id')
-            if job_name:
-                # Remove from Telegram JobQueue
-                jobs = context.application.job_queue.get_jobs_by_name(job_name)
-                for job in jobs:
-                    job.schedule_removal()
-
-    # 2. Mark them as cancelled in DB
-    db_query(
+    await db_query_async(
         "UPDATE publication_jobs SET status = 'cancelled' WHERE task_id = %s AND status = 'scheduled'",
         (task_id,), commit=True
     )
-    logger.info(f"Cancelled pending jobs for task {task_id}")
\ No newline at end of file
+    logger.info(f"Cancelled pending jobs for task {task_id}")
+
+
+async def cancel_stale_task_jobs(task_id: int, slots: List[Tuple[int, datetime]]) -> int:
+    """
+    Отменяет запланированные строки задачи, чьих слотов (channel_id, utc_dt) больше нет в slots.
+    Строки, которые диспетчер уже забрал (publishing), не трогаются. Наступившие, но ещё
+    не забранные (scheduled_time_utc <= now(), в пределах PUBLICATION_MISFIRE_GRACE) — тоже:
+    slots считаются от текущего момента, и без этого правка задачи при отстающем
+    диспетчере молча отменяла бы пост, который он ещё опубликует. Их судьбу решают
+    диспетчер и expire_missed_publication_jobs.
+    Returns: количество отменённых строк.
+    """
+    rows = await db_query_async("""
+        UPDATE publication_jobs p SET status = 'cancelled'
+        WHERE p.task_id = %s
+          AND p.status = 'scheduled'
+          AND p.scheduled_time_utc > now()
+          AND NOT EXISTS (
+              SELECT 1
+              FROM unnest(%s::bigint[], %s::timestamptz[]) AS r(channel_id, scheduled_time_utc)
+              WHERE r.channel_id = p.channel_id AND r.scheduled_time_utc = p.scheduled_time_utc
+          )
+        RETURNING p.id
+    """, (
+        task_id,
+        [channel_id for channel_id, _ in slots],
+        [utc_dt for _, utc_dt in slots],
+    ), fetchall=True, commit=True)
+    return len(rows or [])
+
+
+async def update_scheduled_jobs_snapshot(task: dict) -> int:
+    """
+    Переносит поля-снимки задачи (сообщение, закреп, авто-удаление, рекламодатель)
+    в её ещё не опубликованные строки — на месте, без пересоздания слотов.
+    Returns: количество изменённых строк.
+    """
+    snapshot = (
+        task['content_message_id'], task['content_chat_id'],
+        task['pin_duration'], task['pin_notify'],
+        task['auto_delete_hours'], task['advertiser_user_id'],
+    )
+    rows = await db_query_async("""
+        UPDATE publication_jobs
+        SET content_message_id = %s, content_chat_id = %s,
+            pin_duration = %s, pin_notify = %s,
+            auto_delete_hours = %s, advertiser_user_id = %s
+        WHERE task_id = %s
+          AND status = 'scheduled'
+          AND (content_message_id, content_chat_id, pin_duration, pin_notify, auto_delete_hours, advertiser_user_id)
+              IS DISTINCT FROM (%s::bigint, %s::bigint, %s::float, %s::boolean, %s::float, %s::bigint)
+        RETURNING id
+    """, snapshot + (task['id'],) + snapshot, fetchall=True, commit=True)
+    return len(rows or [])
+
+
+async def insert_publication_jobs(task: dict, slots: List[Tuple[int, datetime]]) -> List[Dict]:
+    """
+    Bulk-вставка publication_jobs для задачи одним запросом.
+
+    slots: [(channel_id, utc_datetime), ...]. Слот task/channel/time, для которого
+    уже есть не отменённая строка (запланирована, публикуется, опубликована,
+    пропущена), не создаётся повторно — материализатор горизонта может без
+    опаски передавать одни и те же слоты на каждом тике. Гонку двух вставок
+    одного слота отсекает уникальный частичный индекс uq_jobs_scheduled_slot
+    (ON CONFLICT DO NOTHING).
+    Returns: реально вставленные строки [{'id', 'channel_id', 'scheduled_time_utc'}, ...].
+    """
+    if not slots:
+        return []
+
+    channel_ids = [channel_id for channel_id, _ in slots]
+    times = [utc_dt for _, utc_dt in slots]
+
+    return await db_query_async("""
+        INSERT INTO publication_jobs (
+            task_id, user_id, channel_id, scheduled_time_utc,
+            content_message_id, content_chat_id, pin_duration,
+            pin_notify, auto_delete_hours, advertiser_user_id, status
+        )
+        SELECT %s, %s, r.channel_id, r.scheduled_time_utc,
+               %s, %s, %s, %s, %s, %s, 'scheduled'
+        FROM unnest(%s::bigint[], %s::timestamptz[]) AS r(channel_id, scheduled_time_utc)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM publication_jobs p
+            WHERE p.task_id = %s
+              AND p.channel_id = r.channel_id
+              AND p.scheduled_time_utc = r.scheduled_time_utc
+              AND p.status <> 'cancelled'
+        )
+        ON CONFLICT (task_id, channel_id, scheduled_time_utc) WHERE status = 'scheduled' DO NOTHING
+        RETURNING id, channel_id, scheduled_time_utc
+    """, (
+        task['id'], task['user_id'],
+        task['content_message_id'], task['content_chat_id'],
+        task['pin_duration'], task['pin_notify'],
+        task['auto_delete_hours'], task['advertiser_user_id'],
+        channel_ids, times, task['id']
+    ), fetchall=True, commit=True) or []
+
+
+async def claim_due_publication_batches(limit: int) -> List[List[int]]:
+    """
+    Атомарно забирает до limit наступивших «пачек» (scheduled -> publishing).
+    Пачка — все каналы одной задачи с одним scheduled_time_utc: их публикуют вместе.
+    FOR UPDATE SKIP LOCKED: параллельные диспетчеры никогда не получат одну строку дважды.
+    Returns: [[job_id, ...], ...] — по списку id на пачку.
+    """
+    rows = await db_query_async("""
+        WITH due AS (
+            SELECT DISTINCT task_id, scheduled_time_utc
+            FROM publication_jobs
+            WHERE status = 'scheduled' AND scheduled_time_utc <= now()
+            ORDER BY scheduled_time_utc
+            LIMIT %s
+        )
+        UPDATE publication_jobs SET status = 'publishing', claimed_at = now()
+        WHERE id IN (
+            SELECT j.id FROM publication_jobs j
+            JOIN due ON due.task_id = j.task_id AND due.scheduled_time_utc = j.scheduled_time_utc
+            WHERE j.status = 'scheduled'
+            FOR UPDATE OF j SKIP LOCKED
+        )
+        RETURNING id, task_id, scheduled_time_utc
+    """, (limit,), fetchall=True, commit=True) or []
+
+    batches = defaultdict(list)
+    for row in rows:
+        batches[(row['task_id'], row['scheduled_time_utc'])].append(row['id'])
+    return list(batches.values())
+
+
+async def get_publishing_jobs(job_ids: List[int]) -> List[Dict]:
+    """Забранные диспетчером строки (status='publishing') одним запросом"""
+    return await db_query_async("""
+        SELECT * FROM publication_jobs
+        WHERE id = ANY(%s) AND status = 'publishing'
+        ORDER BY id
+    """, (job_ids,), fetchall=True) or []
+
+
+async def mark_publication_jobs_published(results: List[Dict]):
+    """
+    Bulk-отметка опубликованных строк одним UPDATE.
+    results: [{'job_id', 'posted_message_id', 'all_posted_ids'}, ...]
+    """
+    if not results:
+        return
+    await db_query_async("""
+        UPDATE publication_jobs p
+        SET status = 'published', published_at = NOW(),
+            posted_message_id = r.posted_message_id, posted_message_ids = r.posted_message_ids
+        FROM unnest(%s::int[], %s::int[], %s::jsonb[]) AS r(id, posted_message_id, posted_message_ids)
+        WHERE p.id = r.id
+    """, (
+        [result['job_id'] for result in results],
+        [result['posted_message_id'] for result in results],
+        [json.dumps(result['all_posted_ids']) for result in results],
+    ), commit=True)
+
+
+async def set_publication_jobs_status(job_ids: List[int], status: str):
+    """Одинаковый статус для нескольких строк (failed / cancelled) одним UPDATE"""
+    if not job_ids:
+        return
+    await db_query_async("UPDATE publication_jobs SET status = %s WHERE id = ANY(%s)",
+                         (status, job_ids), commit=True)
+
+
+async def expire_missed_publication_jobs(grace_seconds: int, stale_claim_seconds: int,
+                                        in_flight_ids: List[int] = ()) -> int:
+    """
+    Помечает 'missed' публикации, опоздавшие больше чем на grace_seconds (бот был выключен),
+    и «зависшие» claim'ы (воркер упал посреди публикации) — чтобы не публиковать их повторно.
+    in_flight_ids — строки, которые этот диспетчер ещё публикует: их claimed_at обновляется
+    (долгая пачка не считается зависшей и для других инстансов), и они не трогаются.
+    """
+    in_flight_ids = list(in_flight_ids)
+    row = await db_query_async("""
+        WITH touched AS (
+            UPDATE publication_jobs SET claimed_at = now()
+            WHERE id = ANY(%s::int[]) AND status = 'publishing'
+            RETURNING id
+        ), expired AS (
+            UPDATE publication_jobs SET status = 'missed'
+            WHERE ((status = 'scheduled' AND scheduled_time_utc < now() - make_interval(secs => %s))
+                OR (status = 'publishing' AND claimed_at < now() - make_interval(secs => %s)))
+              AND id <> ALL(%s::int[])
+            RETURNING id
+        )
+        SELECT COUNT(*) AS count FROM expired
+    """, (in_flight_ids, grace_seconds, stale_claim_seconds, in_flight_ids), fetchone=True, commit=True)
+    return row['count'] if row else 0
+
+
+async def get_seconds_until_next_publication() -> Optional[float]:
+    """Секунды до ближайшей запланированной публикации (None — публикаций нет). Считается на сервере БД."""
+    row = await db_query_async("""
+        SELECT EXTRACT(EPOCH FROM (MIN(scheduled_time_utc)::timestamptz - now())) AS seconds
+        FROM publication_jobs
+        WHERE status = 'scheduled'
+    """, fetchone=True)
+    if not row or row['seconds'] is None:
+        return None
+    return float(row['seconds'])
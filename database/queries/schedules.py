@@ -1,26 +1,47 @@
 from typing import List, Dict
-from database.connection import db_query
-
-def get_task_schedules(task_id: int) -> List[Dict]:
-    """Получает расписание для задачи"""
-    return db_query("""
-        SELECT * FROM task_schedules WHERE task_id = %s
-    """, (task_id,), fetchall=True) or []
-
-
-def add_task_schedule(task_id: int, schedule_type: str, schedule_date: str = None,
-                      schedule_weekday: int = None, schedule_time: str = None):
-    """Добавляет расписание для задачи"""
-    db_query("""
-        INSERT INTO task_schedules (task_id, schedule_type, schedule_date, schedule_weekday, schedule_time)
-        VALUES (%s, %s, %s, %s, %s)
-    """, (task_id, schedule_type, schedule_date, schedule_weekday, schedule_time), commit=True)
-
-
-def remove_task_schedules(task_id: int):
-    """Удаляет все расписания для задачи"""
-    db_query("DELETE FROM task_schedules WHERE task_id = %s", (task_id,), commit=True)
-
-
-
 
+from database.connection import db_query_async
+from database.queries.identity_map import identity_mapped, invalidate_task, KIND_SCHEDULE
+from models.schedule import TaskSchedule
+
+
+@identity_mapped(KIND_SCHEDULE)
+async def get_task_schedule(task_id: int, for_update: bool = False) -> TaskSchedule:
+    """
+    Получает расписание задачи (одна строка task_schedule_sets).
+    for_update — блокирует строку до конца transaction() (read-modify-write в конструкторе);
+    такое чтение всегда идёт в БД, мимо identity map.
+    """
+    lock_sql = " FOR UPDATE" if for_update else ""
+    row = await db_query_async(f"""
+        SELECT dates, weekday_mask, times FROM task_schedule_sets WHERE task_id = %s{lock_sql}
+    """, (task_id,), fetchone=True)
+    return TaskSchedule.from_row(row)
+
+
+async def get_schedules_for_tasks(task_ids: List[int]) -> Dict[int, TaskSchedule]:
+    """Расписания сразу нескольких задач одним запросом: {task_id: TaskSchedule}"""
+    if not task_ids:
+        return {}
+    rows = await db_query_async("""
+        SELECT task_id, dates, weekday_mask, times FROM task_schedule_sets WHERE task_id = ANY(%s)
+    """, (task_ids,), fetchall=True) or []
+    return {row['task_id']: TaskSchedule.from_row(row) for row in rows}
+
+
+async def save_task_schedule(task_id: int, schedule: TaskSchedule):
+    """Сохраняет расписание задачи целиком (одна строка, UPSERT)"""
+    await db_query_async("""
+        INSERT INTO task_schedule_sets (task_id, dates, weekday_mask, times, updated_at)
+        VALUES (%s, %s::date[], %s, %s::time[], NOW())
+        ON CONFLICT (task_id) DO UPDATE
+        SET dates = EXCLUDED.dates, weekday_mask = EXCLUDED.weekday_mask,
+            times = EXCLUDED.times, updated_at = NOW()
+    """, (task_id, sorted(schedule.dates), schedule.weekday_mask, sorted(schedule.times)), commit=True)
+    invalidate_task(task_id, KIND_SCHEDULE)
+
+
+async def remove_task_schedules(task_id: int):
+    """Удаляет расписание задачи"""
+    await db_query_async("DELETE FROM task_schedule_sets WHERE task_id = %s", (task_id,), commit=True)
+    invalidate_task(task_id, KIND_SCHEDULE)
@@ -1,7 +1,80 @@
-from typing import Dict
+import time
+from typing import Dict, Optional, Tuple
 
-from database.connection import db_query
+from config.settings import USER_CACHE_TTL, USER_CACHE_MAX_SIZE
+from database.connection import db_query_async
 
-def get_user_settings(user_id: int) -> Dict:
-    return db_query("SELECT language_code, timezone, tariff FROM users WHERE user_id = %s", (user_id,),
-                    fetchone=True) or {}
\ No newline at end of file
+
+class UserSettingsCache:
+    """
+    In-process кэш настроек пользователя (language_code, timezone, tariff) с TTL.
+
+    global_user_loader выполняется на каждый update; с кэшем он обходится без
+    запросов к БД. Записи в users через database.queries.users сбрасывают запись
+    пользователя (invalidate), TTL страхует от изменений в обход бота.
+    Отсутствующие пользователи не кэшируются — db_query_async возвращает None
+    и при ошибке БД, их не отличить.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[int, Tuple[float, Dict]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, user_id: int, settings: Dict):
+        if self.ttl <= 0:
+            return
+        if user_id not in self._entries and len(self._entries) >= self.max_size:
+            self._evict()
+        self._entries[user_id] = (time.monotonic() + self.ttl, dict(settings))
+
+    def invalidate(self, user_id: int):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def _evict(self):
+        """Сначала просроченные записи; если их нет — самые старые (порядок вставки)"""
+        now = time.monotonic()
+        expired = [user_id for user_id, (expires, _) in self._entries.items() if expires <= now]
+        for user_id in expired:
+            del self._entries[user_id]
+        while len(self._entries) >= self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+    def stats(self) -> dict:
+        """Размер и hit rate (для /debug_jobs)."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+user_settings_cache = UserSettingsCache(USER_CACHE_TTL, USER_CACHE_MAX_SIZE)
+
+
+async def get_user_settings(user_id: int) -> Dict:
+    """Настройки пользователя; {} — пользователя нет (не нажимал /start)"""
+    settings = user_settings_cache.get(user_id)
+    if settings is not None:
+        return settings
+    settings = await db_query_async("SELECT language_code, timezone, tariff FROM users WHERE user_id = %s", (user_id,),
+                                    fetchone=True)
+    if not settings:
+        return {}
+    user_settings_cache.put(user_id, settings)
+    return settings
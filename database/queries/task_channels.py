@@ -1,26 +1,50 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Dict
 
-from database.connection import db_query
+from database.connection import db_query_async
+from database.queries.identity_map import identity_mapped, invalidate_task, invalidate_kind, KIND_CHANNELS
 
 
-def add_task_channel(task_id: int, channel_id: int):
+async def add_task_channel(task_id: int, channel_id: int):
     """Добавляет канал к задаче"""
-    db_query("""
+    await db_query_async("""
         INSERT INTO task_channels (task_id, channel_id)
         VALUES (%s, %s)
         ON CONFLICT (task_id, channel_id) DO NOTHING
     """, (task_id, channel_id), commit=True)
+    invalidate_task(task_id, KIND_CHANNELS)
 
-def get_task_channels(task_id: int) -> List[int]:
+@identity_mapped(KIND_CHANNELS)
+async def get_task_channels(task_id: int) -> List[int]:
     """Получает список channel_id для задачи"""
-    result = db_query("""
+    result = await db_query_async("""
         SELECT channel_id FROM task_channels WHERE task_id = %s
     """, (task_id,), fetchall=True)
     return [row['channel_id'] for row in result] if result else []
 
 
-def remove_task_channel(task_id: int, channel_id: int):
+async def get_channels_for_tasks(task_ids: List[int]) -> Dict[int, List[int]]:
+    """channel_id сразу нескольких задач одним запросом: {task_id: [channel_id, ...]}"""
+    if not task_ids:
+        return {}
+    rows = await db_query_async("""
+        SELECT task_id, channel_id FROM task_channels WHERE task_id = ANY(%s)
+    """, (task_ids,), fetchall=True) or []
+    result = defaultdict(list)
+    for row in rows:
+        result[row['task_id']].append(row['channel_id'])
+    return result
+
+
+async def remove_task_channel(task_id: int, channel_id: int):
     """Удаляет канал из задачи"""
-    db_query("""
+    await db_query_async("""
         DELETE FROM task_channels WHERE task_id = %s AND channel_id = %s
     """, (task_id, channel_id), commit=True)
+    invalidate_task(task_id, KIND_CHANNELS)
+
+
+async def remove_channel_from_tasks(channel_id: int):
+    """Убирает канал из всех задач"""
+    await db_query_async("DELETE FROM task_channels WHERE channel_id = %s", (channel_id,), commit=True)
+    invalidate_kind(KIND_CHANNELS)
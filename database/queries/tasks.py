@@ -1,12 +1,15 @@
-from typing import Optional, Dict, List
+import json
+from datetime import datetime
+from typing import Any, Optional, Dict, List, Tuple
 
-from database.connection import db_query
+from database.connection import db_query_async
+from database.queries.identity_map import identity_mapped, invalidate_task, KIND_TASK
 from utils.logging import logger
 
 
-def create_task(user_id: int) -> Optional[int]:
+async def create_task(user_id: int) -> Optional[int]:
     """Создает новую пустую задачу (черновик)"""
-    result = db_query("""
+    result = await db_query_async("""
         INSERT INTO tasks (user_id, status) 
         VALUES (%s, 'inactive') 
         RETURNING id
@@ -19,12 +22,12 @@ def create_task(user_id: int) -> Optional[int]:
         logger.error(f"Не удалось создать задачу для user {user_id}")
         return None
 
-def create_new_task(user_id: int) -> Optional[int]:
+async def create_new_task(user_id: int) -> Optional[int]:
     """
     Создает новую задачу (черновик).
     (Based on existing INSERT logic)
     """
-    result = db_query(""" 
+    result = await db_query_async(""" 
         INSERT INTO tasks (user_id, status) VALUES (%s, 'inactive') 
         RETURNING id 
     """, (user_id,), commit=True)
@@ -33,23 +36,130 @@ def create_new_task(user_id: int) -> Optional[int]:
         return result['id']
     return None
 
-def get_task_details(task_id: int) -> Optional[Dict]:
-    """Получает все данные о задаче для конструктора"""
-    return db_query("SELECT * FROM tasks WHERE id = %s", (task_id,), fetchone=True)
+@identity_mapped(KIND_TASK)
+async def get_task_details(task_id: int) -> Optional[Dict]:
+    """Получает все данные о задаче для конструктора (в пределах update'а — из identity map)"""
+    return await db_query_async("SELECT * FROM tasks WHERE id = %s", (task_id,), fetchone=True)
 
 
-def get_user_tasks(user_id: int) -> List[Dict]:
-    """Получает список задач для экрана 'Мои задачи'"""
-    return db_query("""
-        SELECT id, task_name, status, created_at
-        FROM tasks 
-        WHERE user_id = %s 
-        ORDER BY created_at DESC
-    """, (user_id,), fetchall=True) or []
+async def update_task_column(task_id: int, field: str, value: Any):
+    """
+    Обновляет одно поле задачи. field подставляется в SQL как есть —
+    проверка по белому списку на стороне вызывающего (services.task_service.update_task_field).
+    """
+    await db_query_async(f"UPDATE tasks SET {field} = %s WHERE id = %s", (value, task_id), commit=True)
+    invalidate_task(task_id, KIND_TASK)
+
+
+async def set_task_status(task_id: int, status: str):
+    """Меняет статус задачи ('active' / 'inactive')"""
+    await db_query_async("UPDATE tasks SET status = %s WHERE id = %s", (status, task_id), commit=True)
+    invalidate_task(task_id, KIND_TASK)
+
+
+async def set_task_message_content(task_id: int, snippet: Optional[str],
+                                   media_group_data: Optional[Dict] = None, payload: Optional[Dict] = None):
+    """Сниппет, данные альбома и снимок сообщения задачи — одним UPDATE"""
+    await db_query_async(
+        "UPDATE tasks SET message_snippet = %s, media_group_data = %s, message_payload = %s WHERE id = %s",
+        (snippet,
+         json.dumps(media_group_data) if media_group_data is not None else None,
+         json.dumps(payload) if payload is not None else None,
+         task_id), commit=True
+    )
+    invalidate_task(task_id, KIND_TASK)
+
+
+async def set_task_message_payload(task_id: int, payload: Optional[Dict]):
+    """Снимок сообщения задачи для публикации одним запросом (services/signature_service.py)"""
+    await db_query_async(
+        "UPDATE tasks SET message_payload = %s WHERE id = %s",
+        (json.dumps(payload) if payload is not None else None, task_id), commit=True
+    )
+    invalidate_task(task_id, KIND_TASK)
+
+
+async def delete_task(task_id: int):
+    """Удаляет задачу (task_channels и task_schedule_sets — каскадом)"""
+    await db_query_async("DELETE FROM tasks WHERE id = %s", (task_id,), commit=True)
+    invalidate_task(task_id)
+
+
+# «Светофор» задачи одним выражением (t — строка tasks):
+# 🟢 есть будущие публикации (запланированные строки или ещё не развёрнутое расписание активной задачи),
+# 🟡 будущих нет, но есть опубликованные посты, ожидающие авто-удаления, 🔴 — всё завершено.
+TASK_STATUS_ICON_SQL = """
+    CASE
+        WHEN EXISTS (SELECT 1 FROM publication_jobs pj
+                     WHERE pj.task_id = t.id AND pj.status = 'scheduled')
+          OR (t.status = 'active' AND EXISTS (
+                SELECT 1 FROM task_schedule_sets ts
+                WHERE ts.task_id = t.id AND (ts.weekday_mask <> 0 OR CURRENT_DATE <= ANY(ts.dates))))
+        THEN '🟢'
+        WHEN EXISTS (SELECT 1 FROM publication_jobs pj
+                     WHERE pj.task_id = t.id AND pj.status = 'published' AND pj.auto_delete_hours > 0
+                       AND pj.published_at + (pj.auto_delete_hours || ' hours')::INTERVAL > NOW())
+        THEN '🟡'
+        ELSE '🔴'
+    END
+"""
 
 
-def get_user_task_count(user_id: int) -> int:
+async def get_user_tasks_page(user_id: int, after: Optional[Tuple[datetime, int]] = None,
+                              limit: int = 20) -> List[Dict]:
+    """
+    Страница экрана 'Мои задачи' вместе со статусом (status_icon) — один запрос.
+    Keyset-пагинация по (created_at, id): after — (created_at, id) последней задачи
+    предыдущей страницы, стоимость не зависит от номера страницы (индекс idx_tasks_user_created).
+    Курсор — значения, а не ссылка на строку: удаление той задачи между страницами его не ломает.
+    В каждой строке total — всего задач пользователя.
+    """
+    after_created_at, after_id = after if after else (None, None)
+    return await db_query_async(f"""
+        SELECT t.id, t.task_name, t.status, t.created_at,
+               {TASK_STATUS_ICON_SQL} AS status_icon,
+               (SELECT COUNT(*) FROM tasks WHERE user_id = %s) AS total
+        FROM tasks t
+        WHERE t.user_id = %s
+          AND (%s::int IS NULL OR (t.created_at, t.id) < (%s::timestamp, %s::int))
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT %s
+    """, (user_id, user_id, after_id, after_created_at, after_id, limit), fetchall=True) or []
+
+
+async def get_task_status_icon(task_id: int) -> str:
+    """Статус одной задачи (🟢 / 🟡 / 🔴) — для конструктора"""
+    row = await db_query_async(f"SELECT {TASK_STATUS_ICON_SQL} AS status_icon FROM tasks t WHERE t.id = %s",
+                               (task_id,), fetchone=True)
+    return row['status_icon'] if row else '🔴'
+
+
+async def get_user_task_count(user_id: int) -> int:
     """Returns the total number of tasks (active or inactive) created by the user."""
-    result = db_query("SELECT COUNT(*) as count FROM tasks WHERE user_id = %s", (user_id,), fetchone=True)
+    result = await db_query_async("SELECT COUNT(*) as count FROM tasks WHERE user_id = %s", (user_id,), fetchone=True)
     return result['count'] if result else 0
 
+
+async def get_user_active_tasks(user_id: int) -> List[Dict]:
+    """Активные задачи пользователя"""
+    return await db_query_async(
+        "SELECT * FROM tasks WHERE user_id = %s AND status = 'active' ORDER BY id",
+        (user_id,), fetchall=True
+    ) or []
+
+
+async def get_active_tasks_page(after_id: int, limit: int) -> List[Dict]:
+    """
+    Страница активных задач (keyset по id) вместе с часовым поясом владельца.
+    Используется материализатором горизонта публикаций. Задачи забаненных и
+    деактивированных пользователей (users.is_active = FALSE) пропускаются, иначе
+    отменённые при бане слоты создавались бы заново.
+    """
+    return await db_query_async("""
+        SELECT t.*, COALESCE(u.timezone, 'Europe/Moscow') AS user_timezone
+        FROM tasks t
+        JOIN users u ON u.user_id = t.user_id
+        WHERE t.status = 'active' AND u.is_active = TRUE AND t.id > %s
+        ORDER BY t.id
+        LIMIT %s
+    """, (after_id, limit), fetchall=True) or []
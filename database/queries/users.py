@@ -1,15 +1,16 @@
 from typing import Optional, Dict, List
 
-from database.connection import db_query
+from database.connection import db_query_async, in_transaction
+from database.queries.settings import user_settings_cache
 
 
-def create_user(user_id: int, username: str, first_name: str):
+async def create_user(user_id: int, username: str, first_name: str):
     """
     Modified: Explicitly inserts NULL for language_code and timezone.
     This overrides the SQL DEFAULT 'en'/'Moscow', allowing us to detect
     new unconfigured users in start_command.
     """
-    db_query("""
+    await db_query_async("""
         INSERT INTO users (user_id, username, first_name, language_code, timezone)
         VALUES (%s, %s, %s, NULL, NULL)
         ON CONFLICT (user_id) DO UPDATE
@@ -17,24 +18,32 @@ def create_user(user_id: int, username: str, first_name: str):
             first_name = EXCLUDED.first_name,
             is_active = TRUE
     """, (user_id, username, first_name), commit=True)
+    user_settings_cache.invalidate(user_id)
 
 
-def get_user_by_username(username: str) -> Optional[Dict]:
-    return db_query("SELECT * FROM users WHERE lower(username) = lower(%s)", (username,), fetchone=True)
+async def get_user_by_username(username: str) -> Optional[Dict]:
+    return await db_query_async("SELECT * FROM users WHERE lower(username) = lower(%s)", (username,), fetchone=True)
 
-def set_user_lang_tz(user_id: int, lang: str = None, tz: str = None):
+async def set_user_lang_tz(user_id: int, lang: str = None, tz: str = None):
     if lang:
-        db_query("UPDATE users SET language_code = %s WHERE user_id = %s", (lang, user_id), commit=True)
+        await db_query_async("UPDATE users SET language_code = %s WHERE user_id = %s", (lang, user_id), commit=True)
     if tz:
-        db_query("UPDATE users SET timezone = %s WHERE user_id = %s", (tz, user_id), commit=True)
+        await db_query_async("UPDATE users SET timezone = %s WHERE user_id = %s", (tz, user_id), commit=True)
+    user_settings_cache.invalidate(user_id)
 
 
+async def set_user_tariff(user_id: int, tariff: str):
+    """Меняет тариф пользователя (оплата / выдача из админки)"""
+    await db_query_async("UPDATE users SET tariff = %s WHERE user_id = %s", (tariff, user_id), commit=True)
+    user_settings_cache.invalidate(user_id)
 
-def set_user_limit(user_id: int, limit_type: str, value: int):
+
+
+async def set_user_limit(user_id: int, limit_type: str, value: int):
     """Set custom limit for user (stores in a new table or user field)"""
     # For now, we'll use a simple JSON field approach
     # In production, you might want a separate limits table
-    db_query("""
+    await db_query_async("""
         UPDATE users 
         SET custom_limits = jsonb_set(
             COALESCE(custom_limits, '{}'::jsonb),
@@ -44,26 +53,46 @@ def set_user_limit(user_id: int, limit_type: str, value: int):
         WHERE user_id = %s
     """ % (limit_type, value, user_id), commit=True)
 
-def ban_user(user_id: int, reason: str = None):
+async def ban_user(user_id: int, reason: str = None):
     """Ban a user"""
-    db_query("""
+    await db_query_async("""
         UPDATE users 
         SET is_active = FALSE
         WHERE user_id = %s
     """, (user_id,), commit=True)
+    user_settings_cache.invalidate(user_id)
 
     # Cancel all scheduled jobs for this user
-    db_query("""
+    await db_query_async("""
         UPDATE publication_jobs 
         SET status = 'cancelled'
         WHERE user_id = %s AND status = 'scheduled'
     """, (user_id,), commit=True)
 
 
-def unban_user(user_id: int):
+async def deactivate_users(user_ids: List[int]):
+    """
+    Пользователи, заблокировавшие бота (Forbidden при рассылке); /start снова их активирует.
+    Внутри transaction() кэш настроек не сбрасывается: до COMMIT параллельный
+    get_user_settings закэшировал бы старую строку — вызывающий сбрасывает его после выхода из блока.
+    """
+    if not user_ids:
+        return
+    await db_query_async("UPDATE users SET is_active = FALSE WHERE user_id = ANY(%s)", (list(user_ids),), commit=True)
+    if not in_transaction():
+        invalidate_user_settings(user_ids)
+
+
+def invalidate_user_settings(user_ids: List[int]):
+    for user_id in user_ids:
+        user_settings_cache.invalidate(user_id)
+
+
+async def unban_user(user_id: int):
     """Unban a user"""
-    db_query("""
+    await db_query_async("""
         UPDATE users 
         SET is_active = TRUE
         WHERE user_id = %s
-    """, (user_id,), commit=True)
\ No newline at end of file
+    """, (user_id,), commit=True)
+    user_settings_cache.invalidate(user_id)
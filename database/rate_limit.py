@@ -4,43 +4,11 @@ Max 10 tasks per 10 minutes per user.
 """
 
 from datetime import datetime, timedelta
-from database.connection import db_query, db_pool
+from database.connection import db_query_async, db_pool
 from utils.logging import logger
 
 
-def init_rate_limit_table():
-    """Initialize rate limit tracking table"""
-    conn = db_pool.getconn()
-    try:
-        with conn.cursor() as cur:
-            # Set schema context
-            cur.execute("SET search_path TO public")
-            
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS public.task_creation_rate_limit (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES public.users(user_id) ON DELETE CASCADE
-                )
-            """)
-            
-            # Index for efficient querying
-            cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rate_limit_user_time 
-                ON public.task_creation_rate_limit(user_id, created_at)
-            """)
-            
-            conn.commit()
-            logger.info("Rate limit table initialized")
-    except Exception as e:
-        logger.error(f"Error initializing rate limit table: {e}")
-        conn.rollback()
-    finally:
-        db_pool.putconn(conn)
-
-
-def check_task_creation_rate_limit(user_id: int, max_tasks: int = 10, time_window_minutes: int = 10) -> dict:
+async def check_task_creation_rate_limit(user_id: int, max_tasks: int = 10, time_window_minutes: int = 10) -> dict:
     """
     Check if user has exceeded task creation rate limit.
     
@@ -61,7 +29,7 @@ def check_task_creation_rate_limit(user_id: int, max_tasks: int = 10, time_windo
     time_window = now - timedelta(minutes=time_window_minutes)
     
     # Get count of recent task creations
-    result = db_query("""
+    result = await db_query_async("""
         SELECT COUNT(*) as count, MAX(created_at) as latest
         FROM public.task_creation_rate_limit
         WHERE user_id = %s AND created_at > %s
@@ -77,7 +45,7 @@ def check_task_creation_rate_limit(user_id: int, max_tasks: int = 10, time_windo
     reset_at = None
     if latest_time and current_count >= max_tasks:
         # Find the oldest request in the window
-        oldest = db_query("""
+        oldest = await db_query_async("""
             SELECT created_at
             FROM public.task_creation_rate_limit
             WHERE user_id = %s AND created_at > %s
@@ -96,22 +64,12 @@ def check_task_creation_rate_limit(user_id: int, max_tasks: int = 10, time_windo
     }
 
 
-def record_task_creation(user_id: int):
+async def record_task_creation(user_id: int):
     """Record a new task creation for rate limiting"""
-    conn = db_pool.getconn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SET search_path TO public")
-            cur.execute("""
-                INSERT INTO public.task_creation_rate_limit (user_id, created_at)
-                VALUES (%s, CURRENT_TIMESTAMP)
-            """, (user_id,))
-            conn.commit()
-    except Exception as e:
-        logger.error(f"Error recording task creation: {e}")
-        conn.rollback()
-    finally:
-        db_pool.putconn(conn)
+    await db_query_async("""
+        INSERT INTO public.task_creation_rate_limit (user_id, created_at)
+        VALUES (%s, CURRENT_TIMESTAMP)
+    """, (user_id,), commit=True)
 
 
 def cleanup_old_rate_limit_records(days: int = 1):
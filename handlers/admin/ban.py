@@ -1,7 +1,7 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
+from database.connection import db_query_async
 from database.queries.users import unban_user, ban_user, get_user_by_username
 from handlers.admin.panel import nav_boss
 from localization.loader import get_text
@@ -29,11 +29,11 @@ async def boss_ban_receive_user(update: Update, context: ContextTypes.DEFAULT_TY
     target_user = None
     if user_input.startswith('@'):
         username = user_input[1:]
-        target_user = get_user_by_username(username)
+        target_user = await get_user_by_username(username)
     else:
         try:
             user_id = int(user_input)
-            target_user = db_query("SELECT * FROM users WHERE user_id = %s", (user_id,), fetchone=True)
+            target_user = await db_query_async("SELECT * FROM users WHERE user_id = %s", (user_id,), fetchone=True)
         except ValueError:
             pass
 
@@ -96,7 +96,7 @@ async def boss_ban_confirm_yes(update: Update, context: ContextTypes.DEFAULT_TYP
         return await nav_boss(update, context)
 
     # Вызываем функцию бана
-    ban_user(target_id)
+    await ban_user(target_id)
 
     # Локализация: сообщение об успешном бане
     text = get_text('boss_ban_success', context).format(
@@ -132,7 +132,7 @@ async def boss_unban_confirm_yes(update: Update, context: ContextTypes.DEFAULT_T
         return await nav_boss(update, context)
 
     # Вызываем функцию разбана
-    unban_user(target_id)
+    await unban_user(target_id)
 
     # Локализация: сообщение об успешном разбане
     text = get_text('boss_unban_success', context).format(
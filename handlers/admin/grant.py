@@ -1,9 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
 from database.queries.settings import get_user_settings
-from database.queries.users import get_user_by_username
+from database.queries.users import get_user_by_username, set_user_tariff
 from handlers.admin.panel import nav_boss
 from localization.loader import get_text
 from models.tariff import get_tariff_limits
@@ -50,7 +49,7 @@ async def boss_grant_receive_input(update: Update, context: ContextTypes.DEFAULT
         return BOSS_GRANT_TARIFF
 
     # Find user
-    target_user = get_user_by_username(username_input)
+    target_user = await get_user_by_username(username_input)
 
     if not target_user:
         await update.message.reply_text(get_text('boss_grant_user_not_found', context))
@@ -97,7 +96,7 @@ async def boss_grant_confirm_yes(update: Update, context: ContextTypes.DEFAULT_T
         return await nav_boss(update, context)
 
     # Update tariff in database
-    db_query("UPDATE users SET tariff = %s WHERE user_id = %s", (new_tariff, target_id), commit=True)
+    await set_user_tariff(target_id, new_tariff)
 
     # Get tariff name for display
     limits = get_tariff_limits(new_tariff)
@@ -112,7 +111,7 @@ async def boss_grant_confirm_yes(update: Update, context: ContextTypes.DEFAULT_T
 
     # Notify the user
     try:
-        user_settings = get_user_settings(target_id)
+        user_settings = await get_user_settings(target_id)
         user_lang = user_settings.get('language_code', 'en')
 
         notification = get_text('tariff_success_template', context, lang=user_lang).format(
@@ -2,11 +2,12 @@ from telegram import InlineKeyboardButton, Update, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config.settings import OWNER_ID
-from database.connection import db_query
+from database.connection import db_query_async
+from database.queries.mailing import create_mailing_campaign, set_mailing_progress_message
 from database.queries.users import get_user_by_username
+from jobs.mailing import mailing_engine
 from localization.loader import get_text
 from states.conversation import BOSS_MAILING_MESSAGE, BOSS_MAILING_CONFIRM, BOSS_MAILING_EXCLUDE, BOSS_PANEL
-from utils.logging import logger
 
 
 async def boss_mailing(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -48,7 +49,7 @@ async def boss_mailing_exclude(update: Update, context: ContextTypes.DEFAULT_TYP
     for item in exclude_list.split(','):
         item = item.strip()
         if item.startswith('@'):
-            user = get_user_by_username(item[1:])
+            user = await get_user_by_username(item[1:])
             if user:
                 excluded_users.append(user['user_id'])
         else:
@@ -76,7 +77,7 @@ async def boss_mailing_confirm_preview(update: Update, context: ContextTypes.DEF
     excluded = context.user_data.get('mailing_exclude', [])
 
     # Подсчитываем получателей
-    all_users = db_query("SELECT COUNT(*) as count FROM users WHERE is_active = TRUE", fetchone=True)
+    all_users = await db_query_async("SELECT COUNT(*) as count FROM users WHERE is_active = TRUE", fetchone=True)
     total_recipients = (all_users['count'] if all_users else 0) - len(excluded)
 
     text = get_text('boss_mailing_confirm_title', context) + "\n\n"
@@ -98,62 +99,42 @@ async def boss_mailing_confirm_preview(update: Update, context: ContextTypes.DEF
 
 
 async def boss_mailing_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Выполнение рассылки"""
+    """Запуск рассылки: строка mailing_campaigns + фоновая отправка (jobs/mailing.py)"""
     query = update.callback_query
     await query.answer(get_text('boss_mailing_started', context))
 
     message_id = context.user_data.get('mailing_message_id')
     chat_id = context.user_data.get('mailing_chat_id')
-    excluded = context.user_data.get('mailing_exclude', [])
-
-    # Получаем всех активных пользователей
-    users = db_query("""
-        SELECT user_id FROM users 
-        WHERE is_active = TRUE
-    """, fetchall=True) or []
-
-    sent = 0
-    failed = 0
-
-    await query.edit_message_text(get_text('boss_mailing_sending_initial', context))
-
-    for user in users:
-        user_id = user['user_id']
-
-        if user_id in excluded or user_id == OWNER_ID:
-            continue
+    excluded = set(context.user_data.get('mailing_exclude', []))
+    excluded.add(OWNER_ID)
 
-        try:
-            await context.bot.copy_message(
-                chat_id=user_id,
-                from_chat_id=chat_id,
-                message_id=message_id
-            )
-            sent += 1
-
-            # Обновляем прогресс каждые 10 сообщений
-            if sent % 10 == 0:
-                try:
-                    await query.edit_message_text(
-                        get_text('boss_mailing_sending', context).format(sent=sent, failed=failed)
-                    )
-                except:
-                    pass
+    keyboard = [[InlineKeyboardButton(get_text('boss_back_to_boss', context), callback_data="nav_boss")]]
 
-        except Exception as e:
-            failed += 1
-            logger.warning(f"Failed to send mailing to {user_id}: {e}")
+    campaign = await create_mailing_campaign(
+        query.from_user.id, chat_id, message_id, sorted(excluded), context.user_data.get('language_code')
+    )
+    if not campaign:
+        await query.edit_message_text(get_text('error_generic', context), reply_markup=InlineKeyboardMarkup(keyboard))
+        return BOSS_PANEL
 
     # Очищаем данные
     context.user_data.pop('mailing_message_id', None)
     context.user_data.pop('mailing_chat_id', None)
     context.user_data.pop('mailing_exclude', None)
 
-    text = get_text('boss_mailing_completed_title', context) + "\n\n"
-    text += get_text('boss_mailing_sent_count', context).format(sent=sent) + "\n"
-    text += get_text('boss_mailing_failed_count', context).format(failed=failed)
-
-    keyboard = [[InlineKeyboardButton(get_text('boss_back_to_boss', context), callback_data="nav_boss")]]
-
-    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    # Прогресс — отдельным сообщением: его редактирует только фоновая рассылка
+    progress_message = await context.bot.send_message(
+        chat_id=query.message.chat_id,
+        text=get_text('boss_mailing_sending', context).format(
+            campaign_id=campaign['id'], processed=0, total=campaign['total'], sent=0, failed=0, blocked=0
+        )
+    )
+    await set_mailing_progress_message(campaign['id'], progress_message.chat_id, progress_message.message_id)
+    campaign.update(progress_chat_id=progress_message.chat_id, progress_message_id=progress_message.message_id)
+    mailing_engine.launch(campaign)
+
+    await query.edit_message_text(
+        get_text('boss_mailing_background', context).format(campaign_id=campaign['id']),
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
     return BOSS_PANEL
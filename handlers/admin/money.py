@@ -11,7 +11,7 @@ async def boss_money(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    stats = get_money_statistics()
+    stats = await get_money_statistics()
 
     text = get_text('boss_money_title', context) + "\n\n"
     text += get_text('boss_money_tariff_title', context) + "\n"
@@ -29,16 +29,16 @@ async def boss_money(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
     return BOSS_PANEL
 
-from database.connection import db_query
+from database.connection import db_query_async
 
 
-def get_money_statistics():
+async def get_money_statistics():
     """Get revenue statistics"""
     stats = {}
 
     # This is a placeholder - in production you'd track actual payments
     # Count users by tariff
-    tariff_counts = db_query("""
+    tariff_counts = await db_query_async("""
         SELECT tariff, COUNT(*) as count
         FROM users
         WHERE is_active = TRUE
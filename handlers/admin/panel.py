@@ -24,7 +24,7 @@ async def nav_boss(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = get_text('boss_menu_title', context)
         text += "\n\n" + get_text('boss_quick_stats', context) + "\n"
 
-        stats = get_bot_statistics()
+        stats = await get_bot_statistics()
         text += get_text('boss_total_users', context).format(total_users=stats['total_users']) + "\n"
         text += get_text('boss_active_users', context).format(active_users=stats['active_users']) + "\n"
         text += get_text('boss_active_tasks', context).format(tasks_active=stats['tasks_active']) + "\n"
@@ -46,7 +46,7 @@ async def nav_boss(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = get_text('boss_menu_title', context)
         text += "\n\n" + get_text('boss_quick_stats', context) + "\n"
 
-        stats = get_bot_statistics()
+        stats = await get_bot_statistics()
         text += get_text('boss_total_users', context).format(total_users=stats['total_users']) + "\n"
         text += get_text('boss_active_users', context).format(active_users=stats['active_users']) + "\n"
         text += get_text('boss_active_tasks', context).format(tasks_active=stats['tasks_active']) + "\n"
@@ -2,7 +2,7 @@ import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
+from database.connection import db_query_async
 from localization.loader import get_text
 from states.conversation import BOSS_SIGNATURE_EDIT, BOSS_PANEL
 from utils.logging import logger
@@ -14,7 +14,7 @@ async def boss_signature(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     # Получаем текущую подпись из настроек
-    current_signature = db_query("""
+    current_signature = await db_query_async("""
         SELECT signature FROM bot_settings WHERE id = 1
     """, fetchone=True)
 
@@ -61,7 +61,7 @@ async def boss_signature_receive(update: Update, context: ContextTypes.DEFAULT_T
         return BOSS_SIGNATURE_EDIT
 
     # Создаем таблицу bot_settings если её нет
-    db_query("""
+    await db_query_async("""
         CREATE TABLE IF NOT EXISTS bot_settings (
             id INTEGER PRIMARY KEY DEFAULT 1,
             signature TEXT,
@@ -70,7 +70,7 @@ async def boss_signature_receive(update: Update, context: ContextTypes.DEFAULT_T
     """, commit=True)
 
     # Сохраняем подпись
-    db_query("""
+    await db_query_async("""
         INSERT INTO bot_settings (id, signature)
         VALUES (1, %s)
         ON CONFLICT (id) DO UPDATE SET signature = EXCLUDED.signature, updated_at = CURRENT_TIMESTAMP
@@ -90,7 +90,7 @@ async def boss_signature_delete(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
 
-    db_query("""
+    await db_query_async("""
         UPDATE bot_settings SET signature = NULL WHERE id = 1
     """, commit=True)
 
@@ -110,7 +110,7 @@ async def boss_signature_delete(update: Update, context: ContextTypes.DEFAULT_TY
     menu_text += get_text('boss_signature_info', context) + "\n\n"
     menu_text += get_text('boss_signature_current', context).format(current_text=current_text)
 
-    current_signature = db_query("""
+    current_signature = await db_query_async("""
             SELECT signature FROM bot_settings WHERE id = 1
         """, fetchone=True)
 
@@ -2,7 +2,15 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config.settings import OWNER_ID
-from database.connection import db_query
+from database.connection import db_query_async, db_pool
+from database.queries.post_actions import get_post_action_counts
+from database.queries.settings import user_settings_cache
+from jobs.mailing import mailing_engine
+from services.media_group_service import media_group_aggregator
+from jobs.registry import job_registry
+from jobs.restoration import restoration_progress
+from middleware.request_scope import update_query_stats
+from utils.rate_limiter import rate_limiter
 from localization.loader import get_text
 from states.conversation import BOSS_PANEL
 
@@ -12,7 +20,7 @@ async def boss_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer(get_text('boss_stats_loading', context))
 
-    stats = get_bot_statistics()
+    stats = await get_bot_statistics()
 
     text = get_text('boss_stats_title', context) + "\n\n"
     text += get_text('boss_stats_total_users', context).format(total_users=stats['total_users']) + "\n"
@@ -39,16 +47,16 @@ async def boss_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
     return BOSS_PANEL
 
-def get_bot_statistics():
+async def get_bot_statistics():
     """Get bot statistics for admin panel"""
     stats = {}
 
     # Total users
-    result = db_query("SELECT COUNT(*) as count FROM users WHERE is_active = TRUE", fetchone=True)
+    result = await db_query_async("SELECT COUNT(*) as count FROM users WHERE is_active = TRUE", fetchone=True)
     stats['total_users'] = result['count'] if result else 0
 
     # Active users (used bot in last 30 days)
-    result = db_query("""
+    result = await db_query_async("""
         SELECT COUNT(DISTINCT user_id) as count 
         FROM tasks 
         WHERE created_at > NOW() - INTERVAL '30 days'
@@ -56,7 +64,7 @@ def get_bot_statistics():
     stats['active_users'] = result['count'] if result else 0
 
     # Tasks created today
-    result = db_query("""
+    result = await db_query_async("""
         SELECT COUNT(*) as count 
         FROM tasks 
         WHERE DATE(created_at) = CURRENT_DATE
@@ -64,25 +72,25 @@ def get_bot_statistics():
     stats['tasks_today'] = result['count'] if result else 0
 
     # Active tasks
-    result = db_query("SELECT COUNT(*) as count FROM tasks WHERE status = 'active'", fetchone=True)
+    result = await db_query_async("SELECT COUNT(*) as count FROM tasks WHERE status = 'active'", fetchone=True)
     stats['tasks_active'] = result['count'] if result else 0
 
     # Completed tasks
-    result = db_query("SELECT COUNT(*) as count FROM publication_jobs WHERE status = 'published'", fetchone=True)
+    result = await db_query_async("SELECT COUNT(*) as count FROM publication_jobs WHERE status = 'published'", fetchone=True)
     stats['tasks_completed'] = result['count'] if result else 0
 
     # Total tasks in DB
-    result = db_query("SELECT COUNT(*) as count FROM tasks", fetchone=True)
+    result = await db_query_async("SELECT COUNT(*) as count FROM tasks", fetchone=True)
     stats['tasks_total'] = result['count'] if result else 0
 
     # Database size
-    result = db_query("""
+    result = await db_query_async("""
         SELECT pg_size_pretty(pg_database_size(current_database())) as size
     """, fetchone=True)
     stats['db_size'] = result['size'] if result else 'N/A'
 
     # User growth (last 30 days)
-    result = db_query("""
+    result = await db_query_async("""
         SELECT COUNT(*) as count 
         FROM users 
         WHERE created_at > NOW() - INTERVAL '30 days'
@@ -90,7 +98,7 @@ def get_bot_statistics():
     stats['users_30d'] = result['count'] if result else 0
 
     # User growth (last 60 days)
-    result = db_query("""
+    result = await db_query_async("""
         SELECT COUNT(*) as count 
         FROM users 
         WHERE created_at > NOW() - INTERVAL '60 days'
@@ -107,7 +115,8 @@ async def debug_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check scheduler jobs
     # ***** MODIFIED HERE *****
     jobs = context.application.job_queue.get_jobs()
-    text = f"📊 Scheduler jobs (job_queue): {len(jobs)}\n\n"
+    registry = job_registry.stats()
+    text = f"📊 Scheduler jobs (job_queue): {len(jobs)}, indexed one-off jobs: {registry['jobs']}\n\n"
 
     for job in jobs[:10]:  # Show first 10
         text += f"ID: {job.id}\n"
@@ -115,7 +124,7 @@ async def debug_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"Next run: {job.next_run_time}\n\n"
 
     # Check DB jobs
-    db_jobs = db_query(
+    db_jobs = await db_query_async(
         "SELECT COUNT(*) as count, status FROM publication_jobs GROUP BY status",
         fetchall=True
     )
@@ -127,4 +136,61 @@ async def debug_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         text += "No jobs in DB."
 
+    # Connection pool saturation
+    if db_pool:
+        pool = db_pool.stats()
+        text += "\n\n🔌 DB Pool:\n"
+        text += f"In use: {pool['in_use']}/{pool['max']} (peak {pool['in_use_peak']}), idle: {pool['idle']}, waiting: {pool['waiting']}\n"
+        text += f"Checkouts: {pool['checkouts']}, waited: {pool['waited_checkouts']} "
+        text += f"(avg {pool['wait_avg_ms']:.1f} ms, max {pool['wait_max_ms']:.1f} ms)\n"
+        text += f"Exhausted: {pool['exhausted']}, timeouts: {pool['timeouts']}"
+
+    # Outbound Bot API rate limiter
+    limiter = rate_limiter.stats()
+    text += "\n\n🚦 Rate limiter:\n"
+    text += f"Sent immediately: {limiter['immediate']}, queued: {limiter['queued']} (waiting now: {limiter['waiting']})\n"
+    text += f"Wait avg {limiter['wait_avg_ms']:.1f} ms, max {limiter['wait_max_ms']:.1f} ms, RetryAfter: {limiter['retry_after']}\n"
+    text += "Lanes: " + ", ".join(f"{lane} {count}" for lane, count in limiter['per_lane'].items())
+
+    # Unpin / auto-delete queue
+    action_counts = await get_post_action_counts()
+    text += "\n\n📌 Post actions: "
+    text += ", ".join(f"{status}: {count}" for status, count in action_counts.items()) or "none"
+
+    # Startup restoration progress
+    progress = restoration_progress
+    text += f"\n\n♻️ Restoration: {progress['state']}"
+    if progress['phases']:
+        text += " (" + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in progress['phases'].items()) + ")"
+    text += f"\nPublications added: {progress['publications_added']}"
+    if progress['error']:
+        text += f"\nError: {progress['error']}"
+
+    # User settings cache (global_user_loader)
+    users_cache = user_settings_cache.stats()
+    text += f"\n\n👤 User cache: {users_cache['size']} users, hit rate {users_cache['hit_rate']:.1%} "
+    text += f"({users_cache['hits']} hits / {users_cache['misses']} misses), invalidations: {users_cache['invalidations']}"
+
+    # Lazy user_data (PostgresPersistence)
+    persistence = context.application.persistence
+    if hasattr(persistence, 'stats'):
+        state = persistence.stats()
+        text += f"\n🧠 User state in memory: {state['resident_users']}, loads: {state['loads']}, evictions: {state['evictions']}"
+
+    albums = media_group_aggregator.stats()
+    text += f"\n🖼 Media groups: open {albums['open']}, completed {albums['completed']}, dropped {albums['dropped']}"
+
+    for campaign_id, progress in mailing_engine.stats().items():
+        text += (f"\n📣 Mailing #{campaign_id}: {progress['sent'] + progress['failed'] + progress['blocked']}"
+                 f"/{progress['total']} (sent {progress['sent']}, failed {progress['failed']}, blocked {progress['blocked']})")
+
+    # DB queries per update type (identity map hits = queries saved)
+    top_updates = update_query_stats.top()
+    if top_updates:
+        text += "\n\n🗂 DB queries per update:\n"
+        for kind, entry in top_updates:
+            text += (f"{kind}: {entry['queries'] / entry['updates']:.1f} "
+                     f"(without identity map {(entry['queries'] + entry['hits']) / entry['updates']:.1f}), "
+                     f"updates: {entry['updates']}\n")
+
     await update.message.reply_text(text)
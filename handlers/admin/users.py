@@ -1,7 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
+from database.connection import db_query_async
 from localization.loader import get_text
 from states.conversation import BOSS_PANEL
 
@@ -11,7 +11,7 @@ async def boss_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    users = get_recent_users(100)
+    users = await get_recent_users(100)
 
     text = get_text('boss_users_title', context) + "\n\n"
 
@@ -26,9 +26,9 @@ async def boss_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
     return BOSS_PANEL
 
-def get_recent_users(limit=100):
+async def get_recent_users(limit=100):
     """Get recent users list"""
-    return db_query("""
+    return await db_query_async("""
         SELECT user_id, username, first_name, created_at, tariff
         FROM users
         WHERE is_active = TRUE
@@ -2,8 +2,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TelegramError, Forbidden
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
+from database.connection import db_query_async
 from database.queries.channels import get_user_channels, deactivate_channel, add_channel
+from database.queries.task_channels import remove_channel_from_tasks
 from database.queries.settings import get_user_settings
 from localization.loader import get_text
 from models.tariff import get_tariff_limits
@@ -28,7 +29,7 @@ async def nav_my_channels(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = message.chat_id
 
     user_id = context.user_data['user_id']
-    channels = get_user_channels(user_id)
+    channels = await get_user_channels(user_id)
 
     text = get_text('my_channels_title', context).format(count=len(channels))
     keyboard = []
@@ -63,7 +64,7 @@ async def channel_manage_menu(update: Update, context: ContextTypes.DEFAULT_TYPE
     channel_id = int(query.data.replace("channel_manage_", ""))
 
     # Получаем информацию о канале
-    channel = db_query("SELECT * FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
+    channel = await db_query_async("SELECT * FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
 
     if not channel or not channel['is_active']:
         await query.edit_message_text(
@@ -98,20 +99,20 @@ async def channel_delete_confirm(update: Update, context: ContextTypes.DEFAULT_T
     channel_id = int(query.data.replace("channel_delete_", ""))
 
     # Проверяем существование
-    channel = db_query("SELECT * FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
+    channel = await db_query_async("SELECT * FROM channels WHERE channel_id = %s", (channel_id,), fetchone=True)
     title = channel['channel_title'] if channel else str(channel_id)
 
     # Деактивируем канал
-    deactivate_channel(channel_id)
+    await deactivate_channel(channel_id)
 
     # Удаляем из всех будущих задач (опционально, но желательно)
-    db_query("DELETE FROM task_channels WHERE channel_id = %s", (channel_id,), commit=True)
+    await remove_channel_from_tasks(channel_id)
 
     text = get_text('channel_remove_success', context).format(title=title)
 
     # Возвращаемся к списку
     user_id = context.user_data['user_id']
-    channels = get_user_channels(user_id)
+    channels = await get_user_channels(user_id)
 
     list_text = get_text('my_channels_title', context).format(count=len(channels))
     keyboard = []
@@ -142,7 +143,7 @@ async def my_chat_member_handler(update: Update, context: ContextTypes.DEFAULT_T
         new_status = member_update.new_chat_member.status
         user = member_update.from_user
 
-        user_settings = get_user_settings(user.id)
+        user_settings = await get_user_settings(user.id)
         lang = user_settings.get('language_code', 'en')
         tariff_key = user_settings.get('tariff', 'free')
 
@@ -154,7 +155,7 @@ async def my_chat_member_handler(update: Update, context: ContextTypes.DEFAULT_T
             # --- CHECK CHANNEL LIMITS ---
             limits = get_tariff_limits(tariff_key)
             max_channels = limits.get('channels', 1)
-            current_channels = get_user_channels(user.id)
+            current_channels = await get_user_channels(user.id)
             is_existing = any(c['channel_id'] == chat.id for c in current_channels)
 
             if not is_existing and len(current_channels) >= max_channels:
@@ -173,7 +174,7 @@ async def my_chat_member_handler(update: Update, context: ContextTypes.DEFAULT_T
             # --- END LIMIT CHECK ---
 
             # --- ADD CHANNEL (With Unique Check) ---
-            success, msg = add_channel(
+            success, msg = await add_channel(
                 user_id=user.id,
                 channel_id=chat.id,
                 title=chat.title,
@@ -202,7 +203,7 @@ async def my_chat_member_handler(update: Update, context: ContextTypes.DEFAULT_T
             logger.info(f"Бот добавлен в {chat.title} (ID: {chat.id}) пользователем {user.id}")
 
         elif new_status in ["left", "kicked"]:
-            deactivate_channel(chat.id)
+            await deactivate_channel(chat.id)
             try:
                 text = local_get_text('channel_removed').format(title=chat.title)
                 await context.bot.send_message(chat_id=user.id, text=text)
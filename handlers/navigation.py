@@ -1,16 +1,17 @@
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from config.settings import OWNER_ID
-from database.connection import db_query
-from database.queries.tasks import get_user_tasks
+from config.settings import OWNER_ID, MY_TASKS_PAGE_SIZE
+from database.queries.tasks import get_user_tasks_page
 from handlers.admin.panel import nav_boss
 from handlers.channels import nav_my_channels
 from handlers.tariffs import nav_tariff
 from handlers.tasks.constructor import task_constructor_entrypoint
+from jobs.scheduler import get_planned_publications
 from keyboards.lang import lang_keyboard
 from keyboards.main_menu import main_menu_keyboard
 from keyboards.reply import main_menu_reply_keyboard
@@ -21,7 +22,6 @@ from localization.texts import TEXTS
 from models.tariff import get_tariff_limits
 from states.conversation import MAIN_MENU, MY_TASKS, START_SELECT_TZ, START_SELECT_LANG, FREE_DATES
 from utils.cleanup import cleanup_temp_messages
-from utils.helpers import determine_task_status_color
 from utils.logging import logger
 from utils.text_utils import generate_smart_name
 
@@ -81,15 +81,8 @@ async def nav_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Comprehensive cleanup of ALL previous messages
     chat_id = update.effective_chat.id
 
-    # Cleanup all temporary messages
-    await cleanup_temp_messages(context, chat_id)
-
-    # Also delete the current message that triggered this callback
-    if query and query.message:
-        try:
-            await query.delete_message()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить текущее сообщение: {e}")
+    # Cleanup all temporary messages + the current message that triggered this callback (one request)
+    await cleanup_temp_messages(context, chat_id, [query.message.message_id] if query and query.message else ())
 
     if 'current_task_id' in context.user_data:
         del context.user_data['current_task_id']
@@ -121,6 +114,24 @@ async def handle_reply_keyboard(update: Update, context: ContextTypes.DEFAULT_TY
             return await nav_boss(update, context)
 
 
+MY_TASKS_PAGE_PREFIX = "nav_my_tasks_after_"
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _my_tasks_cursor(task: dict) -> str:
+    """callback_data следующей страницы: created_at (микросекунды от epoch) и id последней задачи"""
+    created_us = (task['created_at'] - _EPOCH) // timedelta(microseconds=1)
+    return f"{MY_TASKS_PAGE_PREFIX}{created_us}_{task['id']}"
+
+
+def _parse_my_tasks_cursor(data: str) -> Optional[Tuple[datetime, int]]:
+    """Обратное к _my_tasks_cursor; старый формат (только id) — None, т.е. первая страница"""
+    parts = data[len(MY_TASKS_PAGE_PREFIX):].split('_')
+    if len(parts) != 2:
+        return None
+    return _EPOCH + timedelta(microseconds=int(parts[0])), int(parts[1])
+
+
 async def nav_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает экран 'Мои задачи' (Обновленный дизайн)"""
     if update.callback_query:
@@ -128,22 +139,29 @@ async def nav_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer()
         message = query.message
 
-        # Cleanup previous menu messages
-        await cleanup_temp_messages(context, query.message.chat_id)
-
-        # Also cleanup the main menu message that called this
-        try:
-            await query.delete_message()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить меню сообщение: {e}")
+        # Cleanup previous menu messages + the main menu message that called this (one request)
+        await cleanup_temp_messages(context, query.message.chat_id, [query.message.message_id])
     else:
         message = update.message
         # Cleanup for message-based navigation
         if update.message:
             await cleanup_temp_messages(context, update.message.chat_id)
 
+    # Keyset-страница: nav_my_tasks_after_<created_at>_<id> последней задачи предыдущей страницы
+    after = None
+    if update.callback_query and update.callback_query.data.startswith(MY_TASKS_PAGE_PREFIX):
+        after = _parse_my_tasks_cursor(update.callback_query.data)
+
     user_id = context.user_data['user_id']
-    tasks = get_user_tasks(user_id)
+    # Страница задач сразу со статусом-«светофором» — один запрос
+    tasks = await get_user_tasks_page(user_id, after, MY_TASKS_PAGE_SIZE + 1)
+    if after and not tasks:
+        # Хвост списка исчез (задачи удалены) — показываем первую страницу, а не «задач нет»
+        after = None
+        tasks = await get_user_tasks_page(user_id, None, MY_TASKS_PAGE_SIZE + 1)
+    has_next = len(tasks) > MY_TASKS_PAGE_SIZE
+    tasks = tasks[:MY_TASKS_PAGE_SIZE]
+    total_tasks = tasks[0]['total'] if tasks else 0
 
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
@@ -156,7 +174,7 @@ async def nav_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
         list_text = get_text('my_tasks_empty', context)
     else:
         for task in tasks:
-            icon = determine_task_status_color(task['id'], context)
+            icon = task['status_icon']
 
             # Определяем текстовый статус для списка
             if icon == '🟢':
@@ -191,9 +209,18 @@ async def nav_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         list_text = "\n".join(list_text_items)
 
+    # Пагинация: «в начало» и «дальше» (keyset, без номеров страниц)
+    page_row = []
+    if after:
+        page_row.append(InlineKeyboardButton("⏮", callback_data="nav_my_tasks"))
+    if has_next:
+        page_row.append(InlineKeyboardButton("➡️", callback_data=_my_tasks_cursor(tasks[-1])))
+    if page_row:
+        keyboard.append(page_row)
+
     # Шапка + Список + Легенда
     full_text = get_text('my_tasks_header', context).format(
-        count=len(tasks),
+        count=total_tasks,
         list_text=list_text
     )
 
@@ -203,7 +230,7 @@ async def nav_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Плашка тарифа (неактивная кнопка или callback на тариф)
     tariff_info = get_text('task_tariff_info', context).format(
         name=limits['name'],
-        current=len(tasks),
+        current=total_tasks,
         max=max_tasks
     )
     keyboard.append([InlineKeyboardButton(tariff_info, callback_data="nav_tariff")])
@@ -280,14 +307,10 @@ async def nav_free_dates(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- 1. Верхняя часть (Свободные даты) ---
 
-    scheduled_jobs_60d = db_query("""
-        SELECT scheduled_time_utc 
-        FROM publication_jobs 
-        WHERE user_id = %s 
-          AND status = 'scheduled' 
-          AND scheduled_time_utc >= %s 
-          AND scheduled_time_utc < %s
-    """, (user_id, now_utc, end_date_free), fetchall=True)
+    # В publication_jobs лежит только rolling horizon, поэтому занятость считаем
+    # по расписаниям активных задач (включая ещё не материализованные публикации)
+    end_free_utc = datetime.combine(end_date_free, datetime.min.time(), tzinfo=user_tz).astimezone(ZoneInfo('UTC'))
+    scheduled_jobs_60d = await get_planned_publications(user_id, user_tz_str, end_free_utc)
 
     scheduled_dates_set = set()
     if scheduled_jobs_60d:
@@ -314,15 +337,8 @@ async def nav_free_dates(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     text += get_text('free_dates_schedule_header_30d', context)
 
-    jobs_30_days = db_query("""
-        SELECT scheduled_time_utc, task_id, pin_duration 
-        FROM publication_jobs 
-        WHERE user_id = %s 
-          AND status = 'scheduled' 
-          AND scheduled_time_utc >= %s 
-          AND scheduled_time_utc < %s 
-        ORDER BY scheduled_time_utc
-    """, (user_id, now_utc, end_date_schedule), fetchall=True)
+    end_schedule_utc = datetime.combine(end_date_schedule, datetime.min.time(), tzinfo=user_tz).astimezone(ZoneInfo('UTC'))
+    jobs_30_days = [job for job in scheduled_jobs_60d if job['scheduled_time_utc'] < end_schedule_utc]
 
     if not jobs_30_days:
         text += get_text('free_dates_schedule_empty_30d', context)
@@ -2,7 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from config.settings import OWNER_ID
-from database.connection import db_query
+from database.queries.users import set_user_tariff
 from keyboards.reply import main_menu_reply_keyboard
 from localization.loader import get_text
 from models.tariff import get_tariff_limits
@@ -54,7 +54,7 @@ async def successful_payment_callback(update: Update, context: ContextTypes.DEFA
             tariff_name = limits['name']
 
             # 1. Обновить тариф в БД (сохраняем 'pro1', 'pro2' и т.д.)
-            db_query("UPDATE users SET tariff = %s WHERE user_id = %s", (tariff_key_str, user_id), commit=True)
+            await set_user_tariff(user_id, tariff_key_str)
 
             # 2. Обновить тариф в context.user_data
             context.user_data['tariff'] = tariff_key_str
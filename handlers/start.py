@@ -1,4 +1,3 @@
-import asyncio
 from zoneinfo import ZoneInfoNotFoundError, ZoneInfo
 
 from telegram import Update
@@ -28,32 +27,23 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return await nav_boss(update, context)
 
     # --- Step 1: Check if user exists (middleware no longer creates them) ---
-    from database.connection import db_query
+    from database.connection import db_query_async
     from database.queries.users import create_user
     from database.queries.settings import get_user_settings
 
-    def db_check_user():
-        return db_query("SELECT 1 FROM users WHERE user_id = %s", (user_id,), fetchone=True)
+    user_exists = await db_query_async("SELECT 1 FROM users WHERE user_id = %s", (user_id,), fetchone=True)
 
-    def db_create_user():
-        create_user(
+    # --- Step 2: Create user only on /start ---
+    if not user_exists:
+        await create_user(
             user_id=user_id,
             username=user.username or "",
             first_name=user.first_name or ""
         )
-
-    def db_get_settings():
-        return get_user_settings(user_id)
-
-    user_exists = await asyncio.to_thread(db_check_user)
-
-    # --- Step 2: Create user only on /start ---
-    if not user_exists:
-        await asyncio.to_thread(db_create_user)
         logger.info(f"Created new user via /start: {user_id}")
 
     # --- Step 3: Load settings ---
-    settings = await asyncio.to_thread(db_get_settings)
+    settings = await get_user_settings(user_id)
 
     # Update context.user_data
     context.user_data['user_id'] = user_id
@@ -90,12 +80,8 @@ async def start_select_lang(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lang = 'en'
 
     # 3. Save to DB NON-BLOCKINGLY
-    def run_set_lang():
-        # Synchronous call
-        set_user_lang_tz(user_id=query.from_user.id, lang=lang)
-
     try:
-        await asyncio.to_thread(run_set_lang)
+        await set_user_lang_tz(user_id=query.from_user.id, lang=lang)
     except Exception as e:
         logger.error(f"Failed to save language non-blocking: {e}")
         # Continue anyway
@@ -124,7 +110,7 @@ async def start_select_timezone(update: Update, context: ContextTypes.DEFAULT_TY
         logger.warning(f"Неверная таймзона: {tz_name}")
         tz_name = 'Europe/Moscow'
 
-    set_user_lang_tz(user_id=query.from_user.id, tz=tz_name)
+    await set_user_lang_tz(user_id=query.from_user.id, tz=tz_name)
     context.user_data['timezone'] = tz_name
 
     return await show_main_menu(update, context)
\ No newline at end of file
@@ -1,7 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from database.queries.tasks import get_user_tasks
+from database.queries.tasks import get_user_task_count
 from localization.loader import get_text
 from models.tariff import get_tariff_limits, Tariff
 from states.conversation import TARIFF
@@ -21,13 +21,13 @@ async def nav_tariff(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
 
-    tasks = get_user_tasks(user_id)
+    task_count = await get_user_task_count(user_id)
 
     # (Добавьте эти ключи в i18n)
     text = get_text('tariff_title', context) + "\n\n"
     text += (get_text('tariff_current_status', context) or "Ваш текущий тариф: **{name}**").format(
         name=limits['name']) + "\n"
-    text += (get_text('tariff_tasks_limit', context) or "Задачи: {current} / {limit}").format(current=len(tasks),
+    text += (get_text('tariff_tasks_limit', context) or "Задачи: {current} / {limit}").format(current=task_count,
                                                                                               limit=limits['tasks'])
     text += "\n\n"
     text += "Вы можете обновить свой тариф:\n"
@@ -20,7 +20,7 @@ async def task_activate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     task_id = context.user_data.get('current_task_id')
 
     # --- 1. Validation (Using the helper) ---
-    is_valid, error_msg = validate_task(task_id, context)
+    is_valid, error_msg = await validate_task(task_id, context)
 
     if not is_valid:
         # Construct the error message UI
@@ -47,7 +47,7 @@ async def task_activate(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # Create new scheduler jobs
-        job_count = create_publication_jobs_for_task(task_id, user_tz, context.application)
+        job_count = await create_publication_jobs_for_task(task_id, user_tz)
         logger.info(f"Task {task_id} activated. Jobs created: {job_count}")
 
     except Exception as e:
@@ -98,7 +98,7 @@ async def ensure_task_and_refresh(user_id: int, context: ContextTypes.DEFAULT_TY
     Updates status to 'active' if required.
     Triggers Hot-Reload of the scheduler.
     """
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
     if auto_activate:
         # If adding a time/date, we assume the user wants it active
@@ -6,8 +6,8 @@ from telegram.error import TelegramError
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
-from database.queries.schedules import get_task_schedules, add_task_schedule, remove_task_schedules
+from database.connection import transaction
+from database.queries.schedules import get_task_schedule, save_task_schedule
 from keyboards.calendar import calendar_keyboard
 from localization.loader import get_text
 from models.tariff import get_tariff_limits
@@ -23,7 +23,7 @@ async def task_select_calendar(update: Update, context: ContextTypes.DEFAULT_TYP
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation - Check if name or message is set
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -50,9 +50,9 @@ async def task_select_calendar(update: Update, context: ContextTypes.DEFAULT_TYP
     max_time_slots = limits['date_slots']
 
     # Получаем выбранные даты и дни недели из БД
-    schedules = get_task_schedules(task_id)
-    selected_dates = [s['schedule_date'].strftime('%Y-%m-%d') for s in schedules if s['schedule_date']]
-    selected_weekdays = [s['schedule_weekday'] for s in schedules if s['schedule_weekday'] is not None]  # 0-6
+    schedule = await get_task_schedule(task_id)
+    selected_dates = schedule.date_strings()
+    selected_weekdays = sorted(schedule.weekdays)  # 0-6
 
     # Устанавливаем текущий месяц
     if 'calendar_year' not in context.user_data:
@@ -120,7 +120,7 @@ async def calendar_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -165,9 +165,9 @@ async def calendar_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE
     context.user_data['calendar_month'] = month
 
     # Получаем выбранные даты и дни недели из БД
-    schedules = get_task_schedules(task_id)
-    selected_dates = [s['schedule_date'].strftime('%Y-%m-%d') for s in schedules if s['schedule_date']]
-    selected_weekdays = [s['schedule_weekday'] for s in schedules if s['schedule_weekday'] is not None]
+    schedule = await get_task_schedule(task_id)
+    selected_dates = schedule.date_strings()
+    selected_weekdays = sorted(schedule.weekdays)
 
     # --- Формирование шапки ---
     header_text = ""
@@ -222,9 +222,9 @@ async def calendar_day_select(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
 
     user_id = query.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -234,42 +234,38 @@ async def calendar_day_select(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     date_str = query.data.replace("calendar_day_", "")
 
-    # 1. Enforce Mutual Exclusivity: Remove ANY weekdays
-    db_query("DELETE FROM task_schedules WHERE task_id = %s AND schedule_weekday IS NOT NULL",
-             (task_id,), commit=True)
-
-    # 2. Toggle Date
-    schedules = get_task_schedules(task_id)
-    selected_dates = [s['schedule_date'].strftime('%Y-%m-%d') for s in schedules if s['schedule_date']]
-
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
     max_dates = limits['date_slots']
+    alert_text = None
+
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+
+    async with transaction():
+        schedule = await get_task_schedule(task_id, for_update=True)
 
-    if date_str in selected_dates:
-        db_query("DELETE FROM task_schedules WHERE task_id = %s AND schedule_date = %s",
-                 (task_id, date_str), commit=True)
-        await query.answer()
-    else:
-        if len(selected_dates) >= max_dates:
+        # 1. Enforce Mutual Exclusivity: Remove ANY weekdays
+        schedule.weekdays.clear()
+
+        # 2. Toggle Date (times are kept independently)
+        if date_obj in schedule.dates:
+            schedule.dates.discard(date_obj)
+        elif len(schedule.dates) >= max_dates:
             alert_text = get_text('limit_error_dates', context).format(
-                current=len(selected_dates),
+                current=len(schedule.dates),
                 max=max_dates,
                 tariff=limits['name']
             )
-            await query.answer(alert_text, show_alert=False)
-            return CALENDAR_VIEW
-
-        # UPDATED: Preserve times independently
-        times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
-        if times:
-            for time_str in times:
-                add_task_schedule(task_id, 'datetime', schedule_date=date_str, schedule_time=time_str)
         else:
-            # No times selected yet - just add the date
-            add_task_schedule(task_id, 'date', schedule_date=date_str)
+            schedule.dates.add(date_obj)
+
+        await save_task_schedule(task_id, schedule)
 
-        await query.answer()
+    if alert_text:
+        await query.answer(alert_text, show_alert=False)
+        return CALENDAR_VIEW
+
+    await query.answer()
 
     await refresh_task_jobs(task_id, context)
     return await task_select_calendar(update, context)
@@ -344,21 +340,19 @@ async def calendar_select_all(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     await query.answer()  # Valid, close loading animation
 
-    # 5. Apply Changes
-    # Remove old schedules
-    remove_task_schedules(task_id)
-
-    # Add only the valid future days
-    for date_obj in valid_dates_to_add:
-        date_str = date_obj.strftime("%Y-%m-%d")
-        add_task_schedule(task_id, 'date', schedule_date=date_str)
+    # 5. Apply Changes (одной транзакцией)
+    async with transaction():
+        # Replace dates/weekdays with only the valid future days (times are kept)
+        schedule = await get_task_schedule(task_id, for_update=True)
+        schedule.dates = set(valid_dates_to_add)
+        schedule.weekdays.clear()
+        await save_task_schedule(task_id, schedule)
 
     # Hot-reload (if task is active)
     await refresh_task_jobs(task_id, context)
 
     # 6. Update UI
-    schedules = get_task_schedules(task_id)
-    selected_dates = [s['schedule_date'].strftime('%Y-%m-%d') for s in schedules if s['schedule_date']]
+    selected_dates = schedule.date_strings()
 
     month_year = datetime(year, month, 1).strftime("%B %Y")
 
@@ -385,7 +379,12 @@ async def calendar_reset(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     task_id = context.user_data.get('current_task_id')
 
-    remove_task_schedules(task_id)
+    # Сбрасываются даты и дни недели, выбранное время остаётся
+    async with transaction():
+        schedule = await get_task_schedule(task_id, for_update=True)
+        schedule.dates.clear()
+        schedule.weekdays.clear()
+        await save_task_schedule(task_id, schedule)
 
     # --- Обновляем календарь (Копи-паст из task_select_calendar) ---
     user_tz_str = context.user_data.get('timezone', 'Europe/Moscow')
@@ -429,7 +428,7 @@ async def calendar_weekday_select(update: Update, context: ContextTypes.DEFAULT_
 
     task_id = context.user_data.get('current_task_id')
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -446,50 +445,37 @@ async def calendar_weekday_select(update: Update, context: ContextTypes.DEFAULT_
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
 
-    # 1. Enforce Mutual Exclusivity: Remove ANY specific dates
-    # If we are selecting a weekday, we cannot have specific dates.
-    db_query("DELETE FROM task_schedules WHERE task_id = %s AND schedule_date IS NOT NULL",
-             (task_id,), commit=True)
-
-    # 2. Get current weekday schedules
-    schedules = get_task_schedules(task_id)
-    selected_weekdays = list(set([s['schedule_weekday'] for s in schedules if s['schedule_weekday'] is not None]))
-
-    # 3. Toggle Weekday
-    if weekday in selected_weekdays:
-        # Remove
-        db_query("DELETE FROM task_schedules WHERE task_id = %s AND schedule_weekday = %s",
-                 (task_id, weekday), commit=True)
-        selected_weekdays.remove(weekday)
-
-        # If no weekdays left, cleanup is automatic via db logic usually,
-        # but good to ensure we don't leave empty rows if any.
-        if not selected_weekdays:
-            remove_task_schedules(task_id)  # Safe because dates were already deleted above
-    else:
-        # Add
-        # Check Limits
-        max_weekdays = limits.get('date_slots', 7)  # reuse date_slots for weekdays limit
-        if max_weekdays > 7: max_weekdays = 7
-
-        if len(selected_weekdays) >= max_weekdays:
-            alert_text = get_text('limit_error_weekdays', context).format(
-                current=len(selected_weekdays),
-                max=max_weekdays,
-                tariff=limits['name']
-            )
-            await query.answer(alert_text, show_alert=True)
-            return CALENDAR_VIEW
+    alert_text = None
 
-        # Insert new weekday
-        # Preserve times if they exist
-        times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
+    async with transaction():
+        schedule = await get_task_schedule(task_id, for_update=True)
 
-        if times:
-            for time_str in times:
-                add_task_schedule(task_id, 'weekday_and_time', schedule_weekday=weekday, schedule_time=time_str)
+        # 1. Enforce Mutual Exclusivity: Remove ANY specific dates
+        # If we are selecting a weekday, we cannot have specific dates.
+        schedule.dates.clear()
+
+        # 2. Toggle Weekday (times are kept independently)
+        if weekday in schedule.weekdays:
+            schedule.weekdays.discard(weekday)
         else:
-            add_task_schedule(task_id, 'weekday', schedule_weekday=weekday)
+            # Check Limits
+            max_weekdays = limits.get('date_slots', 7)  # reuse date_slots for weekdays limit
+            if max_weekdays > 7: max_weekdays = 7
+
+            if len(schedule.weekdays) >= max_weekdays:
+                alert_text = get_text('limit_error_weekdays', context).format(
+                    current=len(schedule.weekdays),
+                    max=max_weekdays,
+                    tariff=limits['name']
+                )
+            else:
+                schedule.weekdays.add(weekday)
+
+        await save_task_schedule(task_id, schedule)
+
+    if alert_text:
+        await query.answer(alert_text, show_alert=True)
+        return CALENDAR_VIEW
 
     # 4. Refresh View
     # We simply call task_select_calendar, which re-reads the DB and renders the correct view.
@@ -16,11 +16,11 @@ async def task_select_channels(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
 
     user_id = query.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
-    selected_channels = get_task_channels(task_id)
+    task_id = await get_or_create_task_id(user_id, context)
+    selected_channels = await get_task_channels(task_id)
 
     user_id = context.user_data['user_id']
-    channels = get_user_channels(user_id)
+    channels = await get_user_channels(user_id)
 
     if not channels:
         await query.edit_message_text(
@@ -32,7 +32,7 @@ async def task_select_channels(update: Update, context: ContextTypes.DEFAULT_TYP
     text = get_text('choose_channel', context)
     await query.edit_message_text(
         text,
-        reply_markup=channels_selection_keyboard(context, selected_channels)
+        reply_markup=await channels_selection_keyboard(context, selected_channels)
     )
     return TASK_SELECT_CHANNELS
 
@@ -44,7 +44,7 @@ async def task_toggle_channel(update: Update, context: ContextTypes.DEFAULT_TYPE
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation - Check if name or message is set
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -56,22 +56,22 @@ async def task_toggle_channel(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     channel_id = int(query.data.replace("channel_toggle_", ""))
 
-    selected_channels = get_task_channels(task_id)
+    selected_channels = await get_task_channels(task_id)
 
     if channel_id in selected_channels:
-        remove_task_channel(task_id, channel_id)
+        await remove_task_channel(task_id, channel_id)
     else:
-        add_task_channel(task_id, channel_id)
+        await add_task_channel(task_id, channel_id)
 
     # --- HOT RELOAD ---
     await refresh_task_jobs(task_id, context)
 
     # ... (rest of the function: updating keyboard) ...
-    selected_channels = get_task_channels(task_id)
+    selected_channels = await get_task_channels(task_id)
     # --- FIX: Use Localized Text ---
     text = get_text('task_channels_title', context)
     await query.edit_message_text(
         text,
-        reply_markup=channels_selection_keyboard(context, selected_channels)
+        reply_markup=await channels_selection_keyboard(context, selected_channels)
     )
     return TASK_SELECT_CHANNELS
\ No newline at end of file
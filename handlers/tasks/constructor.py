@@ -6,12 +6,12 @@ from telegram.ext import ContextTypes
 
 from database.rate_limit import check_task_creation_rate_limit, record_task_creation
 from states.conversation import TASK_CONSTRUCTOR
-from utils.helpers import send_or_edit_message, determine_task_status_color
+from utils.helpers import send_or_edit_message
 from utils.time_utils import format_hours_to_dhms
-from database.connection import db_query
-from database.queries.schedules import get_task_schedules
+from database.connection import db_query_async
+from database.queries.schedules import get_task_schedule
 from database.queries.task_channels import get_task_channels
-from database.queries.tasks import get_user_task_count, get_task_details
+from database.queries.tasks import get_user_task_count, get_task_details, get_task_status_icon
 
 from keyboards.task_constructor import task_constructor_keyboard
 from localization.loader import get_text
@@ -34,7 +34,7 @@ async def task_constructor_entrypoint(update: Update, context: ContextTypes.DEFA
     user_tariff = context.user_data.get('tariff', 'free')
 
     # 1. Проверка Rate Limit (max 10 задач за 10 минут)
-    rate_limit = check_task_creation_rate_limit(user_id, max_tasks=10, time_window_minutes=10)
+    rate_limit = await check_task_creation_rate_limit(user_id, max_tasks=10, time_window_minutes=10)
     
     if not rate_limit['allowed']:
         reset_at = rate_limit['reset_at']
@@ -58,7 +58,7 @@ async def task_constructor_entrypoint(update: Update, context: ContextTypes.DEFA
     # 2. Проверка лимита тарифа
     limits = get_tariff_limits(user_tariff)
     max_tasks = limits['tasks']
-    current_task_count = get_user_task_count(user_id)
+    current_task_count = await get_user_task_count(user_id)
 
     if current_task_count >= max_tasks:
         error_text = get_text('limit_error_tasks', context).format(
@@ -79,7 +79,7 @@ async def task_constructor_entrypoint(update: Update, context: ContextTypes.DEFA
 
     # 3. Лимиты не превышены - продолжаем
     # Записываем создание новой задачи в rate limit
-    record_task_creation(user_id)
+    await record_task_creation(user_id)
 
     # Очищаем ID, чтобы система знала, что мы в режиме "Новая задача"
     if 'current_task_id' in context.user_data:
@@ -102,20 +102,20 @@ async def show_task_constructor(update: Update, context: ContextTypes.DEFAULT_TY
         # Cleanup ALL temporary messages including media groups
         await cleanup_temp_messages(context, chat_id)
 
-    text = get_task_constructor_text(context)
+    text = await get_task_constructor_text(context)
 
     # If we need to force a new message or there's no query to edit, send new message
     if force_new_message and chat_id:
-        msg = await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=task_constructor_keyboard(context))
+        msg = await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=await task_constructor_keyboard(context))
         # Store this new message for future cleanup
         context.user_data['temp_message_ids'] = [msg.message_id]
     else:
         # Try to edit existing message
-        await send_or_edit_message(update, context, text, task_constructor_keyboard(context))
+        await send_or_edit_message(update, context, text, await task_constructor_keyboard(context))
 
     return TASK_CONSTRUCTOR
 
-def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
+async def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
     """Form text for task constructor with Dynamic Traffic Light Status and Smart Duration Formatting"""
     task_id = context.user_data.get('current_task_id')
 
@@ -154,12 +154,12 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
         text += f"{get_text('header_advertiser', context)}{advertiser_text}\n"
         return text
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task:
         return get_text('error_task_not_found_db', context).format(task_id=task_id)
 
     # Get channels
-    channels_ids = get_task_channels(task_id)
+    channels_ids = await get_task_channels(task_id)
     channels_count = len(channels_ids)
 
     # Suffixes
@@ -169,7 +169,7 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
 
     # --- DETERMINE STATUS (Traffic Light Logic) ---
     status_label = get_text('task_status_label', context)
-    status_icon = determine_task_status_color(task_id, context)
+    status_icon = await get_task_status_icon(task_id)
 
     if status_icon == '🟢':
         status_val = f"🟢 {get_text('status_text_active', context)}"
@@ -187,7 +187,7 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
         display_name = raw_name
 
     # Schedules
-    schedules = get_task_schedules(task_id)
+    schedule = await get_task_schedule(task_id)
     dates_text = get_text('status_not_selected', context)
     weekdays_text = get_text('status_not_selected', context)
 
@@ -199,11 +199,11 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
         user_tz = ZoneInfo('UTC')
     today_user = datetime.now(user_tz).date()
 
-    unique_dates = sorted(list(set([s['schedule_date'] for s in schedules if s['schedule_date']])))
+    unique_dates = sorted(schedule.dates)
     # Filter: Only show dates >= today
     future_dates = [d for d in unique_dates if d >= today_user]
 
-    unique_weekdays = sorted(list(set([s['schedule_weekday'] for s in schedules if s['schedule_weekday'] is not None])))
+    unique_weekdays = sorted(schedule.weekdays)
 
     if future_dates:
         if len(future_dates) > 5:
@@ -223,7 +223,7 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
         dates_text = "⚠️ All dates passed"
 
     times_text = get_text('status_not_selected', context)
-    unique_times = sorted(list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']])))
+    unique_times = schedule.time_strings()
 
     if unique_times:
         if len(unique_times) > 5:
@@ -234,8 +234,8 @@ def get_task_constructor_text(context: ContextTypes.DEFAULT_TYPE) -> str:
     # Advertiser
     advertiser_text = get_text('status_not_set', context)
     if task['advertiser_user_id']:
-        advertiser_user = db_query("SELECT username FROM users WHERE user_id = %s", (task['advertiser_user_id'],),
-                                   fetchone=True)
+        advertiser_user = await db_query_async("SELECT username FROM users WHERE user_id = %s", (task['advertiser_user_id'],),
+                                               fetchone=True)
         if advertiser_user and advertiser_user.get('username'):
             advertiser_text = f"✅ @{advertiser_user['username']}"
         else:
@@ -311,16 +311,9 @@ async def task_back_to_constructor(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
 
-    # Cleanup ALL temporary messages before showing constructor
+    # Cleanup ALL temporary messages + the current message that has the back button (one request)
     if query and query.message:
-        await cleanup_temp_messages(context, query.message.chat_id)
-
-    # Also delete the current message that has the back button
-    try:
-        await query.delete_message()
-    except Exception as e:
-        from utils.logging import logger
-        logger.warning(f"Не удалось удалить текущее сообщение: {e}")
+        await cleanup_temp_messages(context, query.message.chat_id, [query.message.message_id])
 
     # We return to constructor which will send a new clean message
     return await show_task_constructor(update, context, force_new_message=True)
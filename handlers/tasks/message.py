@@ -5,11 +5,12 @@ from telegram import Update, InlineKeyboardButton, InputMediaPhoto, InputMediaVi
 from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
-from database.queries.tasks import get_task_details
+from database.queries.tasks import get_task_details, set_task_message_content
 from handlers.tasks.constructor import show_task_constructor
 from keyboards.task_constructor import back_to_constructor_keyboard
 from localization.loader import get_text
+from services.media_group_service import media_group_aggregator, Album
+from services.signature_service import snapshot_message
 from services.task_service import update_task_field, get_or_create_task_id
 from states.conversation import TASK_SET_MESSAGE, TASK_CONSTRUCTOR
 from utils.cleanup import cleanup_temp_messages
@@ -28,7 +29,7 @@ async def task_ask_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     task_id = context.user_data.get('current_task_id')
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
 
     # Cleanup previous temp messages if any
     if query and query.message:
@@ -268,41 +269,14 @@ async def task_receive_message(update: Update, context: ContextTypes.DEFAULT_TYP
     Handles receiving a message (or media group) for the task.
     Enhanced: Properly initializes temp_message_ids tracking.
     """
-    user_id = update.message.from_user.id
-    chat_id = update.effective_chat.id
-
     # Initialize temp_message_ids if not exists
     if 'temp_message_ids' not in context.user_data:
         context.user_data['temp_message_ids'] = []
 
     # Check if this message is part of a media group
     if update.message.media_group_id:
-        media_group_id = update.message.media_group_id
-
-        # Initialize buffer if not exists
-        if 'media_group_buffer' not in context.user_data:
-            context.user_data['media_group_buffer'] = {}
-
-        if media_group_id not in context.user_data['media_group_buffer']:
-            context.user_data['media_group_buffer'][media_group_id] = []
-
-        # Add the current message object to the buffer
-        context.user_data['media_group_buffer'][media_group_id].append(update.message)
-
-        # Schedule the processing job (debounce)
-        job_name = f"process_mg_{media_group_id}"
-        existing_jobs = context.job_queue.get_jobs_by_name(job_name)
-
-        if not existing_jobs:
-            # Schedule execution in 2 seconds
-            context.job_queue.run_once(
-                process_media_group,
-                when=2,
-                data={'media_group_id': media_group_id},
-                name=job_name,
-                user_id=user_id,
-                chat_id=chat_id
-            )
+        # Parts are collected in memory (not in user_data); process_media_group runs once per album
+        media_group_aggregator.add(update.message, context, process_media_group)
         return TASK_SET_MESSAGE
 
     # --- Standard Single Message Logic ---
@@ -321,7 +295,7 @@ async def task_delete_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Обнуляем данные в БД
     await update_task_field(task_id, 'content_message_id', None, context)
     await update_task_field(task_id, 'content_chat_id', None, context)
-    db_query("UPDATE tasks SET message_snippet = NULL, media_group_data = NULL WHERE id = %s", (task_id,), commit=True)
+    await set_task_message_content(task_id, None)
 
     await query.answer(get_text('task_message_deleted_alert', context), show_alert=True)
 
@@ -338,7 +312,7 @@ async def save_single_task_message(update: Update, context: ContextTypes.DEFAULT
     3. Media -> 1024 chars (API Limitation).
     """
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
     if not task_id:
         await update.message.reply_text(get_text('error_generic', context))
@@ -408,7 +382,7 @@ async def save_single_task_message(update: Update, context: ContextTypes.DEFAULT
     snippet = " ".join(words[:4]) + ("..." if len(words) > 4 else "")
 
     # Set Task Name if empty
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task.get('task_name'):
         new_name = snippet[:200] if snippet else "New Task"
         await update_task_field(task_id, 'task_name', new_name, context)
@@ -423,91 +397,64 @@ async def save_single_task_message(update: Update, context: ContextTypes.DEFAULT
     await update_task_field(task_id, 'content_message_id', content_message_id, context)
     await update_task_field(task_id, 'content_chat_id', content_chat_id, context)
 
+    # Снимок содержимого: подпись free-тарифа потом добавляется без лишних запросов
+    payload = None if is_forward else snapshot_message(message)
+
     # Directly update fields
-    db_query("UPDATE tasks SET message_snippet = %s, media_group_data = NULL WHERE id = %s",
-             (snippet, task_id), commit=True)
+    await set_task_message_content(task_id, snippet, payload=payload or None)
 
     # UI Feedback
     await send_task_preview(user_id, task_id, context, is_group=False)
     return TASK_SET_MESSAGE
 
 
-async def process_media_group(context: ContextTypes.DEFAULT_TYPE):
+async def process_media_group(context: ContextTypes.DEFAULT_TYPE, album: Album):
     """
-    Job that runs after a short delay to process a buffered media group.
+    Called by media_group_aggregator once the album is complete (quiet period passed).
     FIXED: Properly saves all media in the group for reconstruction as a single media group.
     """
-    job = context.job
-    job_data = job.data
-    media_group_id = job_data['media_group_id']
-    user_id = job.user_id
-
-    if not context.user_data:
-        logger.error(f"context.user_data is None for job {job.name}.")
-        return
+    user_id = album.user_id
 
     if 'temp_message_ids' not in context.user_data:
         context.user_data['temp_message_ids'] = []
 
-    # Retrieve messages from buffer
-    buffer = context.user_data.get('media_group_buffer', {})
-    messages = buffer.pop(media_group_id, [])
-
-    if not buffer:
-        context.user_data.pop('media_group_buffer', None)
-
-    if not messages:
-        logger.warning(f"No messages found for media group {media_group_id}")
+    # Parts ordered by message_id
+    parts = album.sorted_parts()
+    if not parts:
+        logger.warning(f"No messages found for media group {album.media_group_id}")
         return
 
-    # Sort messages by message_id to ensure correct order
-    messages.sort(key=lambda m: m.message_id)
-
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
     # --- DETECT POST TYPE ---
-    first_msg = messages[0]
-    # Check if the message is forwarded (using forward_origin for python-telegram-bot v20+)
-    is_forward = first_msg.forward_origin is not None
+    # Forward detected on the first received part (forward_origin, python-telegram-bot v20+)
+    is_forward = album.is_forward
 
     new_post_type = 'repost' if is_forward else 'from_bot'
 
     # Extract Media Data & Caption
     caption = ""
+    caption_html = None
     media_list = []
 
-    for msg in messages:
+    for part in parts:
         # Capture caption from the first message that has one
-        if msg.caption and not caption:
-            caption = msg.caption
-
-        file_id = None
-        file_type = None
-
-        if msg.photo:
-            file_id = msg.photo[-1].file_id  # Best quality
-            file_type = 'photo'
-        elif msg.video:
-            file_id = msg.video.file_id
-            file_type = 'video'
-        elif msg.document:
-            file_id = msg.document.file_id
-            file_type = 'document'
-        elif msg.audio:
-            file_id = msg.audio.file_id
-            file_type = 'audio'
-
-        if file_id:
+        if part.caption and not caption:
+            caption = part.caption
+            caption_html = part.caption_html
+
+        if part.file_id:
             media_list.append({
-                'type': file_type,
-                'media': file_id,
-                'has_spoiler': msg.has_media_spoiler if hasattr(msg, 'has_media_spoiler') else False
+                'type': part.type,
+                'media': part.file_id,
+                'has_spoiler': part.has_spoiler
             })
 
     # For from_bot posts, validate caption length
     if not is_forward and caption and len(caption) > MAX_MEDIA_CAPTION_LENGTH:
         original_length = len(caption)
         caption = caption[:MAX_MEDIA_CAPTION_LENGTH]
+        caption_html = None  # HTML обрезанной подписи не восстановить, публикуется plain caption
         logger.warning(f"Caption too long ({original_length} chars), truncating to {MAX_MEDIA_CAPTION_LENGTH}")
 
         warning_msg = await context.bot.send_message(
@@ -523,9 +470,10 @@ async def process_media_group(context: ContextTypes.DEFAULT_TYPE):
     # ✅ Build complete media_group_data with ALL files
     media_group_data = {
         'caption': caption,
+        'caption_html': caption_html,  # caption вместе с entities
         'files': media_list,  # All media files in the group
         'is_repost': is_forward,
-        'message_ids': [m.message_id for m in messages]
+        'message_ids': [part.message_id for part in parts]
     }
 
     # Generate Snippet
@@ -539,7 +487,7 @@ async def process_media_group(context: ContextTypes.DEFAULT_TYPE):
         snippet = f"📸 Media Group ({len(media_list)} items)"
 
     # Set Task Name if empty
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task.get('task_name'):
         new_name = snippet[:200]
         await update_task_field(task_id, 'task_name', new_name, context)
@@ -548,22 +496,20 @@ async def process_media_group(context: ContextTypes.DEFAULT_TYPE):
     await update_task_field(task_id, 'post_type', new_post_type, context)
 
     # Save to DB
-    first_msg_id = messages[0].message_id
-    chat_id = messages[0].chat_id
-    json_data = json.dumps(media_group_data)
+    first_msg_id = parts[0].message_id
+    chat_id = album.chat_id
 
     await update_task_field(task_id, 'content_message_id', first_msg_id, context)
     await update_task_field(task_id, 'content_chat_id', chat_id, context)
 
-    db_query(
-        "UPDATE tasks SET message_snippet = %s, media_group_data = %s WHERE id = %s",
-        (snippet, json_data, task_id),
-        commit=True
-    )
+    await set_task_message_content(task_id, snippet, media_group_data=media_group_data)
 
     # Trigger UI update
     await send_task_preview(user_id, task_id, context, is_group=True, media_data=media_group_data)
 
+    # Runs outside update processing: make sure user_data changes reach persistence
+    context.application.mark_data_for_update_persistence(user_ids=user_id)
+
 
 async def send_task_preview(user_id, task_id, context, is_group=False, media_data=None):
     """
@@ -575,7 +521,7 @@ async def send_task_preview(user_id, task_id, context, is_group=False, media_dat
         context.user_data['temp_message_ids'] = []
 
     # Fetch task details to check post_type
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     is_repost = task.get('post_type') == 'repost' if task else False
 
     # --- PREVIEW LOGIC ---
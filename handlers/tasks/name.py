@@ -28,7 +28,7 @@ async def task_ask_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def task_receive_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Updates name and triggers hot-reload if active, with proper cleanup"""
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
     if not task_id:
         await update.message.reply_text(get_text('error_generic', context))
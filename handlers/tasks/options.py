@@ -27,7 +27,7 @@ async def task_set_pin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -37,7 +37,7 @@ async def task_set_pin(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await query.answer()
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     current_duration = task['pin_duration'] if task else 0
 
     text = get_text('duration_ask_pin', context)
@@ -52,7 +52,7 @@ async def pin_duration_select(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
 
     user_id = query.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     duration = int(query.data.replace("pin_", ""))
 
     # Update DB
@@ -91,7 +91,7 @@ async def pin_custom(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def pin_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process custom pin duration with minute precision"""
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     text_input = update.message.text.strip()
 
     hours = parse_human_duration(text_input)
@@ -133,7 +133,7 @@ async def task_set_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -143,7 +143,7 @@ async def task_set_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await query.answer()
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     current_duration = task['auto_delete_hours'] if task else 0
 
     text = get_text('duration_ask_delete', context)
@@ -158,7 +158,7 @@ async def delete_duration_select(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
 
     user_id = query.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     duration = int(query.data.replace("delete_", ""))
 
     # Update DB
@@ -197,7 +197,7 @@ async def delete_custom(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def delete_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process custom auto-delete duration with minute precision"""
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     text_input = update.message.text.strip()
 
     hours = parse_human_duration(text_input)
@@ -236,7 +236,7 @@ async def task_set_advertiser(update: Update, context: ContextTypes.DEFAULT_TYPE
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -257,7 +257,7 @@ async def task_set_advertiser(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def task_receive_advertiser(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Получение username рекламодателя и уведомление"""
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     if not task_id:
         await update.message.reply_text(get_text('error_generic', context))
         return TASK_CONSTRUCTOR
@@ -267,7 +267,7 @@ async def task_receive_advertiser(update: Update, context: ContextTypes.DEFAULT_
     if username.startswith('@'):
         username = username[1:]
 
-    advertiser_user = get_user_by_username(username)
+    advertiser_user = await get_user_by_username(username)
 
     if not advertiser_user:
         await update.message.reply_text(get_text('task_advertiser_not_found', context))
@@ -279,10 +279,10 @@ async def task_receive_advertiser(update: Update, context: ContextTypes.DEFAULT_
     # --- NOTIFY ADVERTISER (Task 1) ---
     try:
         # Get advertiser's language settings
-        adv_settings = get_user_settings(advertiser_user['user_id'])
+        adv_settings = await get_user_settings(advertiser_user['user_id'])
         adv_lang = adv_settings.get('language_code', 'en')
 
-        task = get_task_details(task_id)
+        task = await get_task_details(task_id)
         task_name = task.get('task_name', 'Unknown')
 
         # Localized notification
@@ -322,7 +322,7 @@ async def task_set_pin_notify(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not task_id:
         return TASK_CONSTRUCTOR
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     current_status = task.get('pin_notify', False)
 
     # Toggle status
@@ -331,8 +331,8 @@ async def task_set_pin_notify(update: Update, context: ContextTypes.DEFAULT_TYPE
     await update_task_field(task_id, 'pin_notify', new_status, context)
 
     # Refresh screen
-    text = get_task_constructor_text(context)
-    keyboard = task_constructor_keyboard(context)
+    text = await get_task_constructor_text(context)
+    keyboard = await task_constructor_keyboard(context)
 
     try:
         await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
@@ -348,12 +348,12 @@ async def task_set_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
     task_id = context.user_data.get('current_task_id')
 
     # Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(get_text('task_error_no_name_or_message', context), show_alert=False)
         return TASK_CONSTRUCTOR
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     new_value = not task['report_enabled']
 
     # --- FIX: Calculate text and Answer IMMEDIATELY ---
@@ -378,7 +378,7 @@ async def task_set_post_type(update: Update, context: ContextTypes.DEFAULT_TYPE)
     task_id = context.user_data.get('current_task_id')
 
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -386,7 +386,7 @@ async def task_set_post_type(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return TASK_CONSTRUCTOR
 
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
 
     # Переключаем между from_bot и repost
     new_value = 'repost' if task['post_type'] == 'from_bot' else 'from_bot'
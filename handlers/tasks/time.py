@@ -6,8 +6,8 @@ import asyncio
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
-from database.queries.schedules import get_task_schedules, add_task_schedule, remove_task_schedules
+from database.connection import transaction
+from database.queries.schedules import get_task_schedule, save_task_schedule
 from database.queries.tasks import get_task_details
 from handlers.tasks.constructor import show_task_constructor
 from keyboards.duration import pin_duration_keyboard
@@ -25,7 +25,7 @@ async def task_select_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     task_id = context.user_data.get('current_task_id')
     # Task 3: Validation
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -37,9 +37,8 @@ async def task_select_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     task_id = context.user_data.get('current_task_id')
 
     # Получаем выбранное время
-    schedules = get_task_schedules(task_id)
-    selected_times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
-    selected_times.sort()  # Сортируем для красоты
+    schedule = await get_task_schedule(task_id)
+    selected_times = schedule.time_strings()  # отсортированы
 
     user_tz_str = context.user_data.get('timezone', 'Europe/Moscow')
     try:
@@ -81,9 +80,9 @@ async def time_slot_select(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
 
     user_id = query.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
 
-    can_modify, error_msg = can_modify_task_parameter(task_id)
+    can_modify, error_msg = await can_modify_task_parameter(task_id)
     if not can_modify:
         await query.answer(
             get_text('task_error_no_name_or_message', context),
@@ -93,49 +92,39 @@ async def time_slot_select(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     time_str = query.data.replace("time_select_", "")
 
-    schedules = get_task_schedules(task_id)
-    selected_times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
-
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
     max_slots = limits['time_slots']
+    alert_text = None
+
+    time_obj = datetime.strptime(time_str, '%H:%M').time()
 
-    if time_str in selected_times:
-        db_query("DELETE FROM task_schedules WHERE task_id = %s AND schedule_time = %s",
-                 (task_id, time_str), commit=True)
-        await query.answer()
-    else:
-        if len(selected_times) >= max_slots:
+    async with transaction():
+        schedule = await get_task_schedule(task_id, for_update=True)
+
+        # Time applies to all selected dates/weekdays (expanded only by the scheduler)
+        if time_obj in schedule.times:
+            schedule.times.discard(time_obj)
+        elif len(schedule.times) >= max_slots:
             alert_text = get_text('limit_error_times', context).format(
-                current=len(selected_times), max=max_slots, tariff=limits['name']
+                current=len(schedule.times), max=max_slots, tariff=limits['name']
             )
-            await query.answer(alert_text, show_alert=False)
-            return TIME_SELECTION
-
-        # UPDATED: Apply time to existing dates/weekdays independently
-        dates = [s for s in schedules if s['schedule_date']]
-        weekdays = [s for s in schedules if s['schedule_weekday'] is not None]
-
-        if dates:
-            unique_dates_data = {d['schedule_date'] for d in dates}
-            for date_val in unique_dates_data:
-                add_task_schedule(task_id, 'datetime', schedule_date=date_val, schedule_time=time_str)
-        elif weekdays:
-            unique_weekdays = {w['schedule_weekday'] for w in weekdays}
-            for wd in unique_weekdays:
-                add_task_schedule(task_id, 'weekday_and_time', schedule_weekday=wd, schedule_time=time_str)
         else:
-            # No dates/weekdays selected yet - just add the time
-            add_task_schedule(task_id, 'time', schedule_time=time_str)
+            schedule.times.add(time_obj)
+
+        if not alert_text:
+            await save_task_schedule(task_id, schedule)
 
-        await query.answer()
+    if alert_text:
+        await query.answer(alert_text, show_alert=False)
+        return TIME_SELECTION
+
+    await query.answer()
 
     await refresh_task_jobs(task_id, context)
 
     # Update UI with new list
-    schedules = get_task_schedules(task_id)
-    selected_times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
-    selected_times.sort()
+    selected_times = schedule.time_strings()
 
     user_tz = context.user_data.get('timezone', 'Europe/Moscow')
     text = get_text('time_selection_title', context)
@@ -184,7 +173,7 @@ async def time_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Получение своего времени с проверкой лимитов и чистый переход UI."""
 
     user_id = update.message.from_user.id
-    task_id = get_or_create_task_id(user_id, context)
+    task_id = await get_or_create_task_id(user_id, context)
     chat_id = update.effective_chat.id
 
     if not task_id:
@@ -219,17 +208,17 @@ async def time_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE
     hours, minutes = time_str.split(':')
     time_str = f"{int(hours):02d}:{int(minutes):02d}"
 
-    schedules = get_task_schedules(task_id)
-    selected_times = list(set([s['schedule_time'].strftime('%H:%M') for s in schedules if s['schedule_time']]))
+    time_obj = datetime.strptime(time_str, '%H:%M').time()
+    schedule = await get_task_schedule(task_id)
 
     user_tariff = context.user_data.get('tariff', 'free')
     limits = get_tariff_limits(user_tariff)
     max_slots = limits['time_slots']
 
     time_added = False
-    if time_str not in selected_times:
+    if time_obj not in schedule.times:
         # --- CHECK TIME LIMITS ---
-        if len(selected_times) >= max_slots:
+        if len(schedule.times) >= max_slots:
             # Удаляем сообщение пользователя
             try:
                 await update.message.delete()
@@ -237,7 +226,7 @@ async def time_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE
                 logger.warning(f"Не удалось удалить сообщение пользователя: {e}")
 
             error_text = get_text('limit_error_times', context).format(
-                current=len(selected_times),
+                current=len(schedule.times),
                 max=max_slots,
                 tariff=limits['name']
             )
@@ -257,21 +246,10 @@ async def time_receive_custom(update: Update, context: ContextTypes.DEFAULT_TYPE
             return TASK_SET_CUSTOM_TIME
         # --- END CHECK ---
 
-        dates = [s for s in schedules if s['schedule_date']]
-        weekdays = [s for s in schedules if s['schedule_weekday'] is not None]
-
-        if dates:
-            unique_dates_data = {d['schedule_date'] for d in dates}
-            for date_val in unique_dates_data:
-                add_task_schedule(task_id, 'datetime', schedule_date=date_val, schedule_time=time_str)
-
-        elif weekdays:
-            unique_weekdays = {w['schedule_weekday'] for w in weekdays}
-            for wd in unique_weekdays:
-                add_task_schedule(task_id, 'weekday_and_time', schedule_weekday=wd, schedule_time=time_str)
-
-        else:
-            add_task_schedule(task_id, 'time', schedule_time=time_str)
+        async with transaction():
+            schedule = await get_task_schedule(task_id, for_update=True)
+            schedule.times.add(time_obj)
+            await save_task_schedule(task_id, schedule)
 
         time_added = True
 
@@ -310,21 +288,11 @@ async def time_clear(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     task_id = context.user_data.get('current_task_id')
 
-    # 1. Capture existing Dates AND Weekdays before wiping
-    schedules = get_task_schedules(task_id)
-    dates = [s['schedule_date'] for s in schedules if s['schedule_date']]
-    weekdays = [s['schedule_weekday'] for s in schedules if s['schedule_weekday'] is not None]
-
-    # 2. Wipe all schedules
-    remove_task_schedules(task_id)
-
-    # 3. Restore Dates (without time)
-    for date in set(dates):  # Use set to avoid duplicates
-        add_task_schedule(task_id, 'date', schedule_date=date)
-
-    # 4. Restore Weekdays (without time) <-- THIS WAS MISSING
-    for wd in set(weekdays):
-        add_task_schedule(task_id, 'weekday', schedule_weekday=wd)
+    async with transaction():
+        # Dates and weekdays stay in the same row, only times are cleared
+        schedule = await get_task_schedule(task_id, for_update=True)
+        schedule.times.clear()
+        await save_task_schedule(task_id, schedule)
 
     # UI Update Logic
     user_tz = context.user_data.get('timezone', 'Europe/Moscow')
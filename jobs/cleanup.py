@@ -1,8 +1,7 @@
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from database.connection import db_query
-from database.queries.settings import get_user_settings
+from database.connection import db_query, db_stream
 from database.rate_limit import cleanup_old_rate_limit_records
 from utils.logging import logger
 
@@ -13,19 +12,23 @@ def cleanup_inactive_tasks():
     Called daily via scheduled job.
     Cascading deletes will automatically remove related records from:
     - task_channels
-    - task_schedules
+    - task_schedule_sets
     - publication_jobs
     - scheduled_tasks
     """
     try:
+        # Считаем в БД, а не списком id
         result = db_query("""
-            DELETE FROM tasks 
-            WHERE status = 'inactive' 
-            AND created_at < NOW() - INTERVAL '60 days'
-            RETURNING id
-        """, fetchall=True, commit=True)
+            WITH deleted AS (
+                DELETE FROM tasks 
+                WHERE status = 'inactive' 
+                AND created_at < NOW() - INTERVAL '60 days'
+                RETURNING id
+            )
+            SELECT COUNT(*) AS count FROM deleted
+        """, fetchone=True, commit=True)
 
-        deleted_count = len(result) if result else 0
+        deleted_count = result['count'] if result else 0
         if deleted_count > 0:
             logger.info(f"🗑️ Cleaned up {deleted_count} inactive tasks older than 60 days")
         else:
@@ -41,35 +44,37 @@ def cleanup_past_schedules():
     try:
         now_utc = datetime.now(ZoneInfo('UTC'))
 
-        # Get all tasks with specific dates
-        tasks_with_dates = db_query("""
-            SELECT DISTINCT ts.task_id, t.user_id
-            FROM task_schedules ts
+        # All tasks with specific dates (with the owner's timezone in the same query),
+        # streamed in batches: memory does not grow with the number of tasks
+        for rows in db_stream("""
+            SELECT ts.task_id, u.timezone
+            FROM task_schedule_sets ts
             JOIN tasks t ON ts.task_id = t.id
-            WHERE ts.schedule_date IS NOT NULL
-        """, fetchall=True)
+            JOIN users u ON t.user_id = u.user_id
+            WHERE cardinality(ts.dates) > 0
+        """):
+            task_ids = []
+            todays = []
+            for task_row in rows:
+                # Get user timezone
+                user_tz_str = task_row.get('timezone') or 'Europe/Moscow'
 
-        for task_row in tasks_with_dates or []:
-            task_id = task_row['task_id']
-            user_id = task_row['user_id']
+                try:
+                    user_tz = ZoneInfo(user_tz_str)
+                except:
+                    user_tz = ZoneInfo('UTC')
 
-            # Get user timezone
-            user_settings = get_user_settings(user_id)
-            user_tz_str = user_settings.get('timezone', 'Europe/Moscow')
+                task_ids.append(task_row['task_id'])
+                todays.append(now_utc.astimezone(user_tz).date())
 
-            try:
-                user_tz = ZoneInfo(user_tz_str)
-            except:
-                user_tz = ZoneInfo('UTC')
-
-            today_user = now_utc.astimezone(user_tz).date()
-
-            # Delete schedules with dates before today
+            # Remove dates before the owner's today (the row itself and times stay) — one UPDATE per batch
             db_query("""
-                DELETE FROM task_schedules
-                WHERE task_id = %s 
-                AND schedule_date < %s
-            """, (task_id, today_user), commit=True)
+                UPDATE task_schedule_sets ts
+                SET dates = ARRAY(SELECT d FROM unnest(ts.dates) AS d WHERE d >= c.today ORDER BY d), updated_at = NOW()
+                FROM unnest(%s::integer[], %s::date[]) AS c(task_id, today)
+                WHERE ts.task_id = c.task_id
+                AND c.today > ANY(ts.dates)
+            """, (task_ids, todays), commit=True)
 
         logger.info("✅ Cleaned up past schedule dates")
     except Exception as e:
@@ -86,4 +91,24 @@ def cleanup_rate_limit_records():
         cleanup_old_rate_limit_records(days=1)
         logger.info("✅ Cleaned up old rate limit records")
     except Exception as e:
-        logger.error(f"Error during rate limit cleanup: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Error during rate limit cleanup: {e}", exc_info=True)
+
+
+def cleanup_finished_post_actions():
+    """
+    Removes executed unpin/auto-delete actions (scheduled_tasks done/failed)
+    older than 30 days. Pending actions are never touched.
+    """
+    try:
+        result = db_query("""
+            WITH deleted AS (
+                DELETE FROM scheduled_tasks
+                WHERE status IN ('done', 'failed')
+                AND executed_at < NOW() - INTERVAL '30 days'
+                RETURNING id
+            )
+            SELECT COUNT(*) AS count FROM deleted
+        """, fetchone=True, commit=True)
+        logger.info(f"✅ Cleaned up {result['count'] if result else 0} finished post actions")
+    except Exception as e:
+        logger.error(f"Error during post action cleanup: {e}", exc_info=True)
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telegram.ext import Application, ContextTypes
+
+from config.settings import (
+    DISPATCHER_CONCURRENCY, DISPATCHER_BATCH_SIZE, DISPATCHER_MAX_SLEEP,
+    PUBLICATION_MISFIRE_GRACE, PUBLICATION_STALE_CLAIM
+)
+from database.queries.publications import (
+    claim_due_publication_batches, expire_missed_publication_jobs, get_seconds_until_next_publication
+)
+from utils.logging import logger
+from utils.rate_limiter import rate_limit_lane, PRIORITY_PUBLICATION
+
+# Минимальная пауза цикла — защита от busy-loop при рассинхронизации часов
+MIN_SLEEP = 0.05
+# Как часто помечать просроченные публикации как 'missed', секунды
+EXPIRE_INTERVAL = 30
+
+Worker = Callable[[ContextTypes.DEFAULT_TYPE, List[int]], Awaitable[None]]
+
+
+class PublicationDispatcher:
+    """
+    DB-диспетчер публикаций вместо отдельного JobQueue-таймера на каждый пост.
+
+    Источник правды — таблица publication_jobs. Цикл:
+      1. забирает наступившие пачки — все каналы задачи с одним временем
+         (FOR UPDATE SKIP LOCKED, scheduled -> publishing);
+      2. отдаёт их воркерам (не больше concurrency пачек одновременно);
+      3. спит ровно до следующего scheduled_time_utc (или до wake()).
+
+    Память не зависит от числа запланированных постов, а после рестарта
+    ничего не нужно пересоздавать — строки просто остаются в БД.
+    """
+
+    def __init__(self, concurrency: int = DISPATCHER_CONCURRENCY, batch_size: int = DISPATCHER_BATCH_SIZE,
+                 max_sleep: float = DISPATCHER_MAX_SLEEP):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+
+        self._application: Optional[Application] = None
+        self._worker: Optional[Worker] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._in_flight: Dict[asyncio.Task, List[int]] = {}  # задача -> job_ids её пачки
+        self._saturated = False
+        self._stopping = False
+
+    def start(self, application: Application, worker: Worker):
+        """Запускает цикл диспетчера (вызывается из post_init)."""
+        if self._loop_task:
+            return
+        self._application = application
+        self._worker = worker
+        self._stopping = False
+        self._loop_task = asyncio.create_task(self._run(), name="publication-dispatcher")
+        logger.info(f"🚀 Publication dispatcher started (concurrency={self.concurrency})")
+
+    async def stop(self):
+        """Останавливает цикл и дожидается текущих публикаций."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._loop_task:
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        logger.info("Publication dispatcher stopped")
+
+    def wake(self):
+        """Будит цикл: появились новые публикации, возможно раньше текущей цели сна."""
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_expire_at = 0.0
+
+        while not self._stopping:
+            try:
+                # Просроченные (бот был выключен / воркер упал) — не чаще раза в EXPIRE_INTERVAL
+                if loop.time() >= next_expire_at:
+                    in_flight_ids = [job_id for job_ids in self._in_flight.values() for job_id in job_ids]
+                    missed = await expire_missed_publication_jobs(PUBLICATION_MISFIRE_GRACE, PUBLICATION_STALE_CLAIM,
+                                                                  in_flight_ids)
+                    if missed:
+                        logger.warning(f"⚠️ {missed} publication(s) missed their grace window, skipped")
+                    next_expire_at = loop.time() + EXPIRE_INTERVAL
+
+                free_slots = self.concurrency - len(self._in_flight)
+                self._saturated = free_slots <= 0
+                if self._saturated:
+                    # Все воркеры заняты — _on_done разбудит, когда освободится
+                    await self._wait(self.max_sleep)
+                    continue
+
+                limit = min(free_slots, self.batch_size)
+                claimed = await claim_due_publication_batches(limit)
+                for job_ids in claimed:
+                    self._spawn(job_ids)
+
+                if len(claimed) == limit:
+                    # Возможно, наступивших больше — сразу следующая пачка
+                    continue
+
+                delay = await get_seconds_until_next_publication()
+                if delay is None:
+                    delay = self.max_sleep
+                await self._wait(min(max(delay, MIN_SLEEP), self.max_sleep))
+
+            except Exception as e:
+                logger.error(f"Publication dispatcher loop error: {e}", exc_info=True)
+                await self._wait(self.max_sleep)
+
+    async def _wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _spawn(self, job_ids: List[int]):
+        task = asyncio.create_task(self._execute(job_ids), name=f"publish-{job_ids[0]}")
+        self._in_flight[task] = job_ids
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        self._in_flight.pop(task, None)
+        if self._saturated:
+            # Освободился воркер — можно забрать следующую пачку
+            self._saturated = False
+            self._wakeup.set()
+
+    async def _execute(self, job_ids: List[int]):
+        try:
+            context = ContextTypes.DEFAULT_TYPE(self._application)
+            # Публикации по расписанию идут впереди отчётов и рассылки
+            with rate_limit_lane(PRIORITY_PUBLICATION):
+                await self._worker(context, job_ids)
+        except Exception as e:
+            logger.error(f"❌ Dispatcher worker failed for jobs {job_ids}: {e}", exc_info=True)
+
+
+publication_dispatcher = PublicationDispatcher()
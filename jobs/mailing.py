@@ -0,0 +1,209 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import Application
+
+from config.settings import MAILING_CONCURRENCY, MAILING_BATCH_SIZE, MAILING_PROGRESS_INTERVAL
+from database.queries.mailing import (
+    get_running_mailing_campaigns, get_mailing_recipients_page, save_mailing_checkpoint, finish_mailing_campaign
+)
+from localization.loader import get_text
+from utils.logging import logger
+from utils.rate_limiter import rate_limit_lane, PRIORITY_BULK
+
+# Результат отправки одному получателю
+SENT, FAILED, BLOCKED = 'sent', 'failed', 'blocked'
+
+# RetryAfter, который лимитер уже не стал повторять: ещё столько попыток на получателя
+MAX_RETRY_AFTER = 3
+# Пауза перед повтором после ошибки БД (страница получателей / курсор), секунды
+DB_RETRY_DELAY = 5
+
+
+def _retry_after_seconds(retry_after) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class MailingEngine:
+    """
+    Фоновая рассылка вместо цикла copy_message внутри callback'а.
+
+    Рассылка — строка mailing_campaigns. На каждую running-рассылку — asyncio-задача:
+      1. берёт следующую страницу получателей после cursor_user_id (keyset по user_id);
+      2. отправляет copy_message не более чем concurrency одновременно, в полосе
+         PRIORITY_BULK общего лимитера (публикации и ответы её обгоняют);
+      3. сохраняет курсор, счётчики и деактивирует заблокировавших бота — одной транзакцией;
+      4. редактирует сообщение прогресса не чаще progress_interval.
+
+    После рестарта start() продолжает running-рассылки с сохранённого курсора:
+    повторно может уйти только несохранённая страница (не больше batch_size получателей).
+    """
+
+    def __init__(self, concurrency: int = MAILING_CONCURRENCY, batch_size: int = MAILING_BATCH_SIZE,
+                 progress_interval: float = MAILING_PROGRESS_INTERVAL):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+
+        self._application: Optional[Application] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._progress: Dict[int, dict] = {}
+
+    async def start(self, application: Application):
+        """Продолжает незавершённые рассылки (вызывается из post_init)."""
+        self._application = application
+        campaigns = await get_running_mailing_campaigns()
+        for campaign in campaigns:
+            logger.info(f"📣 Resuming mailing #{campaign['id']} after user {campaign['cursor_user_id']}")
+            self.launch(campaign)
+
+    def launch(self, campaign: dict):
+        """Запускает отправку созданной рассылки в фоне."""
+        campaign_id = campaign['id']
+        if campaign_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(campaign), name=f"mailing-{campaign_id}")
+        self._tasks[campaign_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(campaign_id, None))
+
+    async def stop(self):
+        """Прерывает рассылки при остановке; они остаются running и продолжатся после старта."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, campaign: dict):
+        campaign_id = campaign['id']
+        bot = self._application.bot
+        lang = campaign['lang'] or 'en'
+        progress = self._progress[campaign_id] = {
+            'total': campaign['total'], 'sent': campaign['sent'],
+            'failed': campaign['failed'], 'blocked': campaign['blocked'],
+        }
+        cursor = campaign['cursor_user_id']
+        excluded = list(campaign['excluded_user_ids'] or [])
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_edit = 0.0
+        pending_blocked: List[int] = []
+
+        async def send_limited(user_id: int) -> str:
+            async with semaphore:
+                return await self._send(bot, campaign, user_id)
+
+        try:
+            while True:
+                recipients = await get_mailing_recipients_page(cursor, excluded, self.batch_size)
+                if recipients is None:
+                    await asyncio.sleep(DB_RETRY_DELAY)
+                    continue
+                if not recipients:
+                    break
+
+                results = await asyncio.gather(*(send_limited(user_id) for user_id in recipients),
+                                               return_exceptions=True)
+                # Не-Telegram ошибка (бот остановлен, отмена, баг) — это не «не доставлено»:
+                # курсор сохраняется только до первого такого получателя, остальные получат
+                # сообщение при следующей попытке
+                aborted = next((i for i, result in enumerate(results) if isinstance(result, BaseException)), None)
+                done = len(results) if aborted is None else aborted
+                for user_id, result in zip(recipients[:done], results[:done]):
+                    progress[result] += 1
+                    if result == BLOCKED:
+                        pending_blocked.append(user_id)
+                if done:
+                    cursor = recipients[done - 1]
+                    try:
+                        await save_mailing_checkpoint(campaign_id, cursor, progress['sent'], progress['failed'],
+                                                      progress['blocked'], pending_blocked)
+                        pending_blocked = []
+                    except Exception as e:
+                        # Курсор сохранится со следующей страницей
+                        logger.error(f"Mailing #{campaign_id}: checkpoint failed: {e}")
+
+                if aborted is not None:
+                    error = results[aborted]
+                    if isinstance(error, asyncio.CancelledError):
+                        raise error
+                    logger.error(f"Mailing #{campaign_id}: page aborted at user {recipients[aborted]}: {error!r}")
+                    await asyncio.sleep(DB_RETRY_DELAY)
+                    continue
+
+                now = time.monotonic()
+                if now - last_edit >= self.progress_interval:
+                    last_edit = now
+                    processed = progress['sent'] + progress['failed'] + progress['blocked']
+                    await self._edit_progress(campaign, get_text('boss_mailing_sending', None, lang).format(
+                        campaign_id=campaign_id, processed=processed, **progress))
+
+            while True:
+                try:
+                    await save_mailing_checkpoint(campaign_id, cursor, progress['sent'], progress['failed'],
+                                                  progress['blocked'], pending_blocked)
+                    break
+                except Exception as e:
+                    logger.error(f"Mailing #{campaign_id}: final checkpoint failed: {e}")
+                    await asyncio.sleep(DB_RETRY_DELAY)
+            await finish_mailing_campaign(campaign_id)
+        except asyncio.CancelledError:
+            logger.info(f"Mailing #{campaign_id} interrupted at user {cursor}, will resume on restart")
+            raise
+        finally:
+            self._progress.pop(campaign_id, None)
+
+        text = get_text('boss_mailing_completed_title', None, lang) + "\n\n"
+        text += get_text('boss_mailing_sent_count', None, lang).format(sent=progress['sent']) + "\n"
+        text += get_text('boss_mailing_failed_count', None, lang).format(failed=progress['failed']) + "\n"
+        text += get_text('boss_mailing_blocked_count', None, lang).format(blocked=progress['blocked'])
+        await self._edit_progress(campaign, text)
+        logger.info(f"📣 Mailing #{campaign_id} completed: {progress}")
+
+    async def _send(self, bot: Bot, campaign: dict, user_id: int) -> str:
+        for attempt in range(MAX_RETRY_AFTER + 1):
+            try:
+                # Рассылка — самая низкая полоса лимитера, публикации её обгоняют
+                with rate_limit_lane(PRIORITY_BULK):
+                    await bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=campaign['from_chat_id'],
+                        message_id=campaign['message_id']
+                    )
+                return SENT
+            except RetryAfter as e:
+                # Лимитер уже повторял запрос и поставил трафик на паузу; ждём и пробуем снова
+                if attempt >= MAX_RETRY_AFTER:
+                    break
+                await asyncio.sleep(_retry_after_seconds(e.retry_after))
+            except Forbidden:
+                return BLOCKED
+            except TelegramError as e:
+                logger.warning(f"Failed to send mailing #{campaign['id']} to {user_id}: {e}")
+                return FAILED
+        logger.warning(f"Failed to send mailing #{campaign['id']} to {user_id}: flood limit")
+        return FAILED
+
+    async def _edit_progress(self, campaign: dict, text: str):
+        if not campaign.get('progress_message_id'):
+            return
+        try:
+            await self._application.bot.edit_message_text(
+                chat_id=campaign['progress_chat_id'],
+                message_id=campaign['progress_message_id'],
+                text=text
+            )
+        except TelegramError as e:
+            logger.debug(f"Mailing #{campaign['id']}: progress edit failed: {e}")
+
+    def stats(self) -> dict:
+        """Текущие рассылки (для /debug_jobs)."""
+        return {campaign_id: dict(progress) for campaign_id, progress in self._progress.items()}
+
+
+mailing_engine = MailingEngine()
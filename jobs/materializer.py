@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from telegram.ext import ContextTypes
+
+from config.settings import SCHEDULE_HORIZON_HOURS
+from database.queries.schedules import get_schedules_for_tasks
+from database.queries.task_channels import get_channels_for_tasks
+from database.queries.tasks import get_active_tasks_page
+from jobs.publication import create_publication_jobs
+from jobs.scheduler import compute_schedule_slots
+from utils.logging import logger
+
+# Сколько активных задач обрабатывается за одну порцию (3 запроса на порцию)
+MATERIALIZE_PAGE_SIZE = 200
+
+
+async def materialize_publication_horizon(horizon_hours: float = SCHEDULE_HORIZON_HOURS) -> int:
+    """
+    Продлевает rolling horizon: для каждой активной задачи создаёт publication_jobs
+    на ближайшие horizon_hours часов (по умолчанию SCHEDULE_HORIZON_HOURS). Дальние
+    даты и повторы по дням недели остаются «виртуальными» в task_schedule_sets, пока не
+    попадут в горизонт.
+
+    Идемпотентно: уже созданные слоты (в любом статусе, кроме cancelled) пропускаются,
+    поэтому тик может спокойно пересчитывать всё окно целиком.
+    Returns: количество новых publication_jobs.
+    """
+    now_utc = datetime.now(ZoneInfo('UTC'))
+    until_utc = now_utc + timedelta(hours=horizon_hours)
+
+    created = 0
+    tasks_seen = 0
+    last_id = 0
+    while True:
+        tasks = await get_active_tasks_page(last_id, MATERIALIZE_PAGE_SIZE)
+        if not tasks:
+            break
+        last_id = tasks[-1]['id']
+        tasks_seen += len(tasks)
+
+        task_ids = [task['id'] for task in tasks]
+        schedules_by_task = await get_schedules_for_tasks(task_ids)
+        channels_by_task = await get_channels_for_tasks(task_ids)
+
+        for task in tasks:
+            schedule = schedules_by_task.get(task['id'])
+            channels = channels_by_task.get(task['id'])
+            if not schedule or not channels:
+                continue
+
+            slot_times = compute_schedule_slots(schedule, task['user_timezone'], now_utc, until_utc)
+            slots = [(channel_id, utc_dt) for utc_dt in slot_times for channel_id in channels]
+            try:
+                created += len(await create_publication_jobs(task, slots))
+            except Exception as e:
+                logger.error(f"Horizon materialization failed for task {task['id']}: {e}", exc_info=True)
+
+        if len(tasks) < MATERIALIZE_PAGE_SIZE:
+            break
+
+    logger.info(f"🗓 Horizon extended to {until_utc:%Y-%m-%d %H:%M} UTC: "
+                f"{tasks_seen} active tasks, {created} new publication jobs")
+    return created
+
+
+async def materialize_horizon_job(context: ContextTypes.DEFAULT_TYPE):
+    """Периодический тик (JobQueue.run_repeating) — см. materialize_publication_horizon"""
+    try:
+        await materialize_publication_horizon()
+    except Exception as e:
+        logger.error(f"Horizon materializer tick failed: {e}", exc_info=True)
@@ -0,0 +1,63 @@
+import asyncio
+
+from telegram.ext import ContextTypes
+
+from config.settings import POST_ACTION_BATCH_SIZE, POST_ACTION_MAX_ATTEMPTS, PUBLICATION_STALE_CLAIM
+from database.queries.post_actions import (
+    POST_ACTION_UNPIN, POST_ACTION_DELETE,
+    claim_due_post_actions, complete_post_action, fail_post_action
+)
+from jobs.delete import delete_post
+from jobs.unpin import unpin_post
+from utils.logging import logger
+from utils.rate_limiter import rate_limit_lane, PRIORITY_SERVICE
+
+POST_ACTION_HANDLERS = {
+    POST_ACTION_UNPIN: unpin_post,
+    POST_ACTION_DELETE: delete_post,
+}
+
+# Пауза перед повтором после ошибки: attempts * RETRY_DELAY секунд
+RETRY_DELAY = 60
+
+
+async def execute_due_post_actions(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Поллер очереди scheduled_tasks (JobQueue.run_repeating): выполняет наступившие
+    unpin / auto-delete. Действия живут в БД, поэтому рестарт ничего не пересканирует —
+    после старта просто выполняются всё ещё pending строки.
+    """
+    while True:
+        actions = await claim_due_post_actions(POST_ACTION_BATCH_SIZE, PUBLICATION_STALE_CLAIM)
+        if not actions:
+            return
+        with rate_limit_lane(PRIORITY_SERVICE):
+            await asyncio.gather(*(_execute(context.bot, action) for action in actions))
+        if len(actions) < POST_ACTION_BATCH_SIZE:
+            return
+
+
+async def _execute(bot, action: dict):
+    action_id = action['id']
+    handler = POST_ACTION_HANDLERS.get(action['task_type'])
+    if not handler:
+        await fail_post_action(action_id, f"unknown task_type {action['task_type']}")
+        return
+    if (action.get('attempts') or 1) > POST_ACTION_MAX_ATTEMPTS:
+        # Повторно забранный «зависший» claim, попытки исчерпаны
+        await fail_post_action(action_id, "attempts exhausted (stale claim)")
+        return
+
+    try:
+        await handler(bot, action)
+    except Exception as e:
+        attempts = action.get('attempts') or 1
+        if attempts >= POST_ACTION_MAX_ATTEMPTS:
+            logger.error(f"❌ {action['task_type']} for job {action['job_id']} failed after {attempts} attempts: {e}")
+            await fail_post_action(action_id, str(e))
+        else:
+            logger.warning(f"⚠️ {action['task_type']} for job {action['job_id']} failed (attempt {attempts}), retrying: {e}")
+            await fail_post_action(action_id, str(e), retry_in_seconds=attempts * RETRY_DELAY)
+        return
+
+    await complete_post_action(action_id)
@@ -1,195 +1,265 @@
 import asyncio
 import json
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from telegram import InputMediaPhoto, InputMediaVideo, InputMediaDocument, InputMediaAudio, Message
+from telegram import InputMediaPhoto, InputMediaVideo, InputMediaDocument, InputMediaAudio
 from telegram.constants import ParseMode
-from telegram.ext import ContextTypes, Application
-
-from database.connection import db_query
-from database.queries.schedules import get_task_schedules
+from telegram.ext import ContextTypes
+
+from database.connection import db_query_async, transaction
+from config.settings import PUBLICATION_FANOUT_CONCURRENCY
+from database.queries.channels import get_channels_info
+from database.queries.post_actions import POST_ACTION_UNPIN, POST_ACTION_DELETE, enqueue_post_actions
+from database.queries.publications import (
+    insert_publication_jobs, get_publishing_jobs, mark_publication_jobs_published, set_publication_jobs_status
+)
 from database.queries.settings import get_user_settings
-from jobs.delete import execute_delete_job
-from jobs.unpin import execute_unpin_job
+from database.queries.tasks import get_task_details, set_task_message_payload
+from jobs.dispatcher import publication_dispatcher
+from jobs.registry import job_registry
 from localization.loader import get_text
+from services.signature_service import (
+    MAX_CAPTION_LENGTH, PAYLOAD_COPY, snapshot_message, sign_html, send_signed_payload
+)
 from utils.logging import logger
+from utils.rate_limiter import rate_limit_lane, PRIORITY_SERVICE
 
+# Попыток записать результат пачки (статусы + post actions) при ошибках БД; паузы 2, 4, 8, 16 с
+RECORD_RESULTS_ATTEMPTS = 5
 
 
-def create_single_publication_job(task: dict, channel_id: int, utc_dt: datetime, application: Application) -> Optional[int]:
-    """Helper function to create a single publication job in DB and JobQueue"""
+async def create_publication_jobs(task: dict, slots: List[Tuple[int, datetime]]) -> List[int]:
+    """
+    Bulk-создание publication jobs: все слоты (channel_id, utc_dt) вставляются
+    одним INSERT ... ON CONFLICT DO NOTHING. Таймеров в JobQueue нет — строки
+    забирает DB-диспетчер (jobs/dispatcher.py), его достаточно разбудить.
+    Returns: ID реально созданных (не дублирующих) jobs.
+    """
+    rows = await insert_publication_jobs(task, slots)
+    job_ids = [row['id'] for row in rows]
 
-    # 1. Insert into DB
-    job_data = db_query("""
-        INSERT INTO publication_jobs (
-            task_id, user_id, channel_id, scheduled_time_utc,
-            content_message_id, content_chat_id, pin_duration,
-            pin_notify, auto_delete_hours, advertiser_user_id, status
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'scheduled')
-        RETURNING id
-    """, (
-        task['id'], task['user_id'], channel_id, utc_dt,
-        task['content_message_id'], task['content_chat_id'],
-        task['pin_duration'], task['pin_notify'],
-        task['auto_delete_hours'], task['advertiser_user_id']
-    ), commit=True)
-
-    if job_data and 'id' in job_data:
-        job_id = job_data['id']
-        job_name = f"pub_{job_id}"
+    if job_ids:
+        publication_dispatcher.wake()
+        logger.info(f"✅ Scheduled {len(job_ids)} jobs for task {task['id']} "
+                    f"({len(slots) - len(rows)} duplicate slots skipped)")
+    return job_ids
 
-        try:
-            # 2. Schedule in Telegram JobQueue
-            application.job_queue.run_once(
-                execute_publication_job,
-                when=utc_dt,
-                data={'job_id': job_id},
-                name=job_name,
-                job_kwargs={'misfire_grace_time': 300}  # 5 minutes grace period
-            )
 
-            # 3. Update DB with job name
-            db_query(
-                "UPDATE publication_jobs SET aps_job_id = %s WHERE id = %s",
-                (job_name, job_id),
-                commit=True
-            )
-            logger.info(f"✅ Scheduled job {job_id} at {utc_dt} (channel {channel_id})")
-            return job_id
+async def execute_publication_batch(context: ContextTypes.DEFAULT_TYPE, job_ids: List[int]):
+    """
+    EXECUTOR: Publishes one batch (all channels of a task with the same scheduled_time_utc),
+    schedules post-actions, and buffers reports.
+    Вызывается DB-диспетчером для строк, которые он уже забрал (status='publishing').
+    Общие данные (задача, тариф, подпись, каналы) загружаются один раз, каналы
+    публикуются параллельно (не больше PUBLICATION_FANOUT_CONCURRENCY одновременно,
+    сверху — общий rate limiter), статусы пишутся bulk UPDATE'ами.
+    """
+    jobs = await get_publishing_jobs(job_ids)
+    jobs_by_task = defaultdict(list)
+    for job in jobs:
+        jobs_by_task[job['task_id']].append(job)
+
+    for task_id, task_jobs in jobs_by_task.items():
+        await _publish_task_batch(context, task_id, task_jobs)
+
+
+async def _publish_task_batch(context: ContextTypes.DEFAULT_TYPE, task_id: int, jobs: List[Dict]):
+    job_ids = [job['id'] for job in jobs]
+
+    # 1. Shared data: Task, signature, channels
+    task_data = await get_task_details(task_id)
+    if not task_data:
+        await set_publication_jobs_status(job_ids, 'cancelled')
+        return
+
+    signature = await _load_signature(task_data)
+    if signature and not task_data.get('media_group_data') and not task_data.get('message_payload'):
+        task_data['message_payload'] = await _snapshot_legacy_message(context.bot, task_data, jobs[0])
+    channels_info = await get_channels_info([job['channel_id'] for job in jobs])
+
+    # 2. Fan-out across channels
+    semaphore = asyncio.Semaphore(PUBLICATION_FANOUT_CONCURRENCY)
+
+    async def publish(job_data: dict) -> dict:
+        async with semaphore:
+            return await _publish_to_channel(context.bot, task_data, job_data, signature)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(publish(job) for job in jobs), return_exceptions=True)
+    spread = time.perf_counter() - started
+
+    published = []
+    failed_ids = []
+    for job_data, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Execution failed for job {job_data['id']}: {result}", exc_info=result)
+            failed_ids.append(job_data['id'])
+        else:
+            published.append(result)
+
+    logger.info(f"📣 Task {task_id}: published to {len(published)}/{len(jobs)} channels in {spread:.2f}s")
+
+    # 3. POST ACTIONS: unpin / auto-delete (all message IDs are read from posted_message_ids at execution time)
+    now_utc = datetime.now(ZoneInfo('UTC'))
+    jobs_by_id = {job['id']: job for job in jobs}
+    post_actions = []
+    for result in published:
+        job_data = jobs_by_id[result['job_id']]
+        pin_duration = float(job_data['pin_duration'] or 0)
+        if result['pinned']:
+            post_actions.append((result['job_id'], POST_ACTION_UNPIN, now_utc + timedelta(hours=pin_duration)))
+        delete_hours = float(job_data['auto_delete_hours'] or 0)
+        if delete_hours > 0:
+            post_actions.append((result['job_id'], POST_ACTION_DELETE, now_utc + timedelta(hours=delete_hours)))
 
+    # 4. UPDATE STATUS (bulk) + post actions — together, otherwise a sent ad may never be deleted
+    await _record_publication_results(task_id, published, failed_ids, post_actions)
+
+    # 5. REPORTING (Consolidated with Hyperlinks)
+    if published:
+        _buffer_report(context, task_data, jobs[0], [
+            _format_channel_link(jobs_by_id[result['job_id']]['channel_id'], result['posted_message_id'], channels_info)
+            for result in published
+        ])
+    # Следующие повторы по дням недели создаёт материализатор горизонта (jobs/materializer.py)
+
+
+async def _record_publication_results(task_id: int, published: List[Dict], failed_ids: List[int],
+                                      post_actions: List[Tuple[int, str, datetime]]):
+    """
+    Статусы, posted_message_ids и unpin / auto-delete — одной транзакцией: посты уже
+    отправлены, поэтому при ошибке БД запись повторяется (строки остаются 'publishing',
+    диспетчер продлевает их claim, пока пачка в работе).
+    """
+    for attempt in range(1, RECORD_RESULTS_ATTEMPTS + 1):
+        try:
+            async with transaction():
+                await mark_publication_jobs_published(published)
+                await set_publication_jobs_status(failed_ids, 'failed')
+                await enqueue_post_actions(post_actions)
+            return
         except Exception as e:
-            logger.error(f"❌ Failed to schedule job {job_id} via job_queue: {e}", exc_info=True)
-            db_query("UPDATE publication_jobs SET status = 'failed' WHERE id = %s", (job_id,), commit=True)
-            return None
-    else:
-        logger.error(f"Failed to insert publication_job in DB for task {task['id']}")
+            if attempt >= RECORD_RESULTS_ATTEMPTS:
+                posted = {result['job_id']: result['all_posted_ids'] for result in published}
+                logger.critical(f"❌ Task {task_id}: could not record published jobs {posted}: {e}")
+                raise
+            logger.warning(f"Task {task_id}: recording publication results failed "
+                           f"(attempt {attempt}/{RECORD_RESULTS_ATTEMPTS}): {e}")
+            await asyncio.sleep(2 ** attempt)
+
+
+async def _load_signature(task_data: dict) -> Optional[str]:
+    """Подпись бота для постов free-тарифа (None — подпись не нужна)."""
+    if task_data.get('post_type') == 'repost':  # Signatures cannot be applied to Forwards
+        return None
+    user_settings = await get_user_settings(task_data['user_id'])
+    if user_settings.get('tariff') != 'free':
         return None
+    sig_row = await db_query_async("SELECT signature FROM bot_settings WHERE id = 1", fetchone=True)
+    if sig_row and sig_row.get('signature'):
+        return f"\n\n{sig_row['signature']}"
+    return None
 
 
-async def execute_publication_job(context: ContextTypes.DEFAULT_TYPE):
+async def _snapshot_legacy_message(bot, task_data: dict, job_data: dict) -> Optional[dict]:
     """
-    EXECUTOR: Publishes post, schedules post-actions, and buffers reports.
-    Updated to preserve 'Forwarded from' header for Repost Albums.
+    Задачи, сохранённые до появления tasks.message_payload (или переключённые из repost):
+    один раз читаем исходное сообщение (forward в исходный чат + delete) и сохраняем снимок,
+    дальше все публикации идут одним запросом.
     """
-    bot = context.bot
-    job_id = context.job.data.get('job_id')
+    content_chat_id = job_data['content_chat_id']
+    try:
+        original_msg = await bot.forward_message(
+            chat_id=content_chat_id,
+            from_chat_id=content_chat_id,
+            message_id=job_data['content_message_id']
+        )
+    except Exception as e:
+        logger.warning(f"Could not read message of task {task_data['id']} for signature: {e}")
+        return None
 
-    if not job_id:
-        try:
-            job_id = int(context.job.name.replace('pub_', ''))
-        except:
-            return
+    try:
+        await bot.delete_message(chat_id=content_chat_id, message_id=original_msg.message_id)
+    except Exception:
+        pass
 
-    # 1. Fetch Job info
-    job_data = db_query("SELECT * FROM publication_jobs WHERE id = %s AND status = 'scheduled'", (job_id,),
-                        fetchone=True)
-    if not job_data:
-        return
+    payload = snapshot_message(original_msg)
+    await set_task_message_payload(task_data['id'], payload)
+    return payload
 
-    # 2. Fetch Task info
-    task_data = db_query("SELECT * FROM tasks WHERE id = %s", (job_data['task_id'],), fetchone=True)
-    if not task_data:
-        return
 
+async def _publish_to_channel(bot, task_data: dict, job_data: dict, signature: Optional[str]) -> dict:
+    """
+    Публикует пост в один канал (+ подпись и закреп).
+    Подпись free-тарифа добавляется в сам отправляемый payload (снимок сообщения из
+    tasks.message_payload / caption альбома) — без copy + forward + edit + delete.
+    Updated to preserve 'Forwarded from' header for Repost Albums.
+    Returns: {'job_id', 'posted_message_id', 'all_posted_ids', 'pinned'}; ошибка публикации — исключение.
+    """
+    job_id = job_data['id']
     media_group_json = task_data.get('media_group_data')
     channel_id = job_data['channel_id']
     content_message_id = job_data['content_message_id']
     content_chat_id = job_data['content_chat_id']
     api_disable_notification = not job_data['pin_notify']
 
+    payload = task_data.get('message_payload')
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+
     # Variables to track message IDs
     posted_message_id = None
     all_posted_ids = []
-    sent_msg_object = None
 
-    try:
-        # --- 3. PUBLISHING LOGIC --- #
-        # Check if this is a "Repost" (Forward) or "From Bot"
-        is_repost = task_data.get('post_type') == 'repost'
+    # --- 3. PUBLISHING LOGIC --- #
+    # Check if this is a "Repost" (Forward) or "From Bot"
+    is_repost = task_data.get('post_type') == 'repost'
+
+    # LOGIC A: True Forwarding (Single Message)
+    if is_repost and not media_group_json:
+        sent_msg = await bot.forward_message(
+            chat_id=channel_id,
+            from_chat_id=content_chat_id,
+            message_id=content_message_id,
+            disable_notification=api_disable_notification
+        )
+        posted_message_id = sent_msg.message_id
+        all_posted_ids = [posted_message_id]
 
-        # LOGIC A: True Forwarding (Single Message)
-        if is_repost and not media_group_json:
-            sent_msg = await bot.forward_message(
-                chat_id=channel_id,
-                from_chat_id=content_chat_id,
-                message_id=content_message_id,
-                disable_notification=api_disable_notification
-            )
-            posted_message_id = sent_msg.message_id
-            all_posted_ids = [posted_message_id]
-            sent_msg_object = sent_msg
+    # LOGIC B: From Bot (Copy) OR Album
+    else:
+        if media_group_json:
+            media_data = media_group_json if isinstance(media_group_json, dict) else json.loads(media_group_json)
 
-        # LOGIC B: From Bot (Copy) OR Album
-        else:
-            if media_group_json:
-                media_data = media_group_json if isinstance(media_group_json, dict) else json.loads(media_group_json)
-
-                # === REPOST MEDIA GROUP: Forward as group ===
-                if is_repost:
-                    # We rely on 'message_ids' being present in the saved JSON to forward the specific album messages
-                    ids_to_forward = media_data.get('message_ids', [])
-
-                    # Fallback: if no IDs stored, try to use the single content_message_id
-                    if not ids_to_forward and content_message_id:
-                        ids_to_forward = [content_message_id]
-
-                    sent_msgs = []
-                    
-                    # Try forward_messages first (keeps "Forwarded from" header AND grouping)
-                    if ids_to_forward:
-                        try:
-                            sent_msgs = await bot.forward_messages(
-                                chat_id=channel_id,
-                                from_chat_id=content_chat_id,
-                                message_ids=ids_to_forward,
-                                disable_notification=api_disable_notification
-                            )
-                        except Exception as e:
-                            logger.warning(f"forward_messages failed: {e}, falling back to send_media_group...")
-                    
-                    # Fallback: Use send_media_group (preserves grouping, loses "Forwarded from" header)
-                    if not sent_msgs and 'files' in media_data:
-                        input_media = []
-                        raw_caption = media_data.get('caption', '')
-                        caption_to_use = raw_caption[:1024] if raw_caption else None
-                        
-                        for i, f in enumerate(media_data['files']):
-                            media_obj = None
-                            item_caption = caption_to_use if i == 0 else None
-                            
-                            if f['type'] == 'photo':
-                                media_obj = InputMediaPhoto(media=f['media'], caption=item_caption,
-                                                            has_spoiler=f.get('has_spoiler', False))
-                            elif f['type'] == 'video':
-                                media_obj = InputMediaVideo(media=f['media'], caption=item_caption,
-                                                            has_spoiler=f.get('has_spoiler', False))
-                            elif f['type'] == 'document':
-                                media_obj = InputMediaDocument(media=f['media'], caption=item_caption)
-                            elif f['type'] == 'audio':
-                                media_obj = InputMediaAudio(media=f['media'], caption=item_caption)
-                            
-                            if media_obj:
-                                input_media.append(media_obj)
-                        
-                        if input_media:
-                            sent_msgs = await bot.send_media_group(
-                                chat_id=channel_id,
-                                media=input_media,
-                                disable_notification=api_disable_notification
-                            )
-
-                    if sent_msgs:
-                        all_posted_ids = [msg.message_id for msg in sent_msgs]
-                        posted_message_id = sent_msgs[0].message_id
-                        sent_msg_object = sent_msgs[0]
-                    else:
-                        raise Exception("No messages could be forwarded or reconstructed for this album.")
-
-                # === FROM_BOT MEDIA GROUP: Reconstruct from file IDs ===
-                elif 'files' in media_data:
+            # === REPOST MEDIA GROUP: Forward as group ===
+            if is_repost:
+                # We rely on 'message_ids' being present in the saved JSON to forward the specific album messages
+                ids_to_forward = media_data.get('message_ids', [])
+
+                # Fallback: if no IDs stored, try to use the single content_message_id
+                if not ids_to_forward and content_message_id:
+                    ids_to_forward = [content_message_id]
+
+                sent_msgs = []
+
+                # Try forward_messages first (keeps "Forwarded from" header AND grouping)
+                if ids_to_forward:
+                    try:
+                        sent_msgs = await bot.forward_messages(
+                            chat_id=channel_id,
+                            from_chat_id=content_chat_id,
+                            message_ids=ids_to_forward,
+                            disable_notification=api_disable_notification
+                        )
+                    except Exception as e:
+                        logger.warning(f"forward_messages failed: {e}, falling back to send_media_group...")
+
+                # Fallback: Use send_media_group (preserves grouping, loses "Forwarded from" header)
+                if not sent_msgs and 'files' in media_data:
                     input_media = []
                     raw_caption = media_data.get('caption', '')
                     caption_to_use = raw_caption[:1024] if raw_caption else None
@@ -199,9 +269,11 @@ async def execute_publication_job(context: ContextTypes.DEFAULT_TYPE):
                         item_caption = caption_to_use if i == 0 else None
 
                         if f['type'] == 'photo':
-                            media_obj = InputMediaPhoto(media=f['media'], caption=item_caption)
+                            media_obj = InputMediaPhoto(media=f['media'], caption=item_caption,
+                                                        has_spoiler=f.get('has_spoiler', False))
                         elif f['type'] == 'video':
-                            media_obj = InputMediaVideo(media=f['media'], caption=item_caption)
+                            media_obj = InputMediaVideo(media=f['media'], caption=item_caption,
+                                                        has_spoiler=f.get('has_spoiler', False))
                         elif f['type'] == 'document':
                             media_obj = InputMediaDocument(media=f['media'], caption=item_caption)
                         elif f['type'] == 'audio':
@@ -216,236 +288,147 @@ async def execute_publication_job(context: ContextTypes.DEFAULT_TYPE):
                             media=input_media,
                             disable_notification=api_disable_notification
                         )
-                        all_posted_ids = [msg.message_id for msg in sent_msgs]
-                        posted_message_id = sent_msgs[0].message_id
-                        sent_msg_object = sent_msgs[0]
-                    else:
-                        raise Exception("Empty media group or invalid file types")
 
-            # LOGIC C: Single Message Copy (From Bot)
-            else:
-                sent_msg = await bot.copy_message(
-                    chat_id=channel_id,
-                    from_chat_id=content_chat_id,
-                    message_id=content_message_id,
-                    disable_notification=api_disable_notification
-                )
-                posted_message_id = sent_msg.message_id
-                all_posted_ids = [posted_message_id]
-                sent_msg_object = sent_msg
-
-        logger.info(f"✅ Published successfully. Main Msg ID: {posted_message_id}, Total Msgs: {len(all_posted_ids)}")
-
-        # --- SIGNATURE LOGIC ---
-        if not is_repost:  # Signatures cannot be applied to Forwards
-            user_settings = get_user_settings(task_data['user_id'])
-            if user_settings.get('tariff') == 'free':
-                sig_row = db_query("SELECT signature FROM bot_settings WHERE id = 1", fetchone=True)
-                if sig_row and sig_row.get('signature'):
-                    signature = f"\n\n{sig_row['signature']}"
-                    signature_len = len(signature)
-                    
-                    try:
-                        # For media groups, apply signature to first message caption
-                        if media_group_json and all_posted_ids:
-                            media_data = media_group_json if isinstance(media_group_json, dict) else json.loads(media_group_json)
-                            original_caption = media_data.get('caption', '') or ''
-                            # Check if signature fits (caption limit: 1024)
-                            if len(original_caption) + signature_len + 1 <= 1024:
-                                new_caption = original_caption + signature
-                                try:
-                                    await bot.edit_message_caption(
-                                        chat_id=channel_id,
-                                        message_id=posted_message_id,
-                                        caption=new_caption,
-                                        parse_mode=ParseMode.HTML
-                                    )
-                                    logger.info(f"✅ Signature applied to media group caption for job {job_id}")
-                                except Exception as e:
-                                    logger.warning(f"Could not apply signature to media group: {e}")
-                            else:
-                                logger.info(f"⏭️ Signature skipped for job {job_id}: caption too long ({len(original_caption)}/{1024 - signature_len - 1})")
-                        
-                        # For single messages from copy_message
-                        elif isinstance(sent_msg_object, Message):
-                            # sent_msg_object is a real Message (from forward or send_media_group)
-                            if sent_msg_object.text:
-                                # Check if signature fits (text limit: 4096)
-                                if len(sent_msg_object.text) + signature_len + 1 <= 4096:
-                                    new_text = sent_msg_object.text + signature
-                                    await bot.edit_message_text(
-                                        chat_id=channel_id,
-                                        message_id=posted_message_id,
-                                        text=new_text,
-                                        parse_mode=ParseMode.HTML,
-                                        disable_web_page_preview=True
-                                    )
-                                    logger.info(f"✅ Signature applied to text message for job {job_id}")
-                                else:
-                                    logger.info(f"⏭️ Signature skipped for job {job_id}: text too long ({len(sent_msg_object.text)}/{4096 - signature_len - 1})")
-                            elif sent_msg_object.caption is not None:
-                                current_caption = sent_msg_object.caption or ""
-                                # Check if signature fits (caption limit: 1024)
-                                if len(current_caption) + signature_len + 1 <= 1024:
-                                    new_caption = current_caption + signature
-                                    await bot.edit_message_caption(
-                                        chat_id=channel_id,
-                                        message_id=posted_message_id,
-                                        caption=new_caption,
-                                        parse_mode=ParseMode.HTML,
-                                    )
-                                    logger.info(f"✅ Signature applied to caption for job {job_id}")
-                                else:
-                                    logger.info(f"⏭️ Signature skipped for job {job_id}: caption too long ({len(current_caption)}/{1024 - signature_len - 1})")
-                        else:
-                            # copy_message returns MessageId, not Message
-                            # Fetch original message from source chat to get its content
-                            try:
-                                # Forward original message to get its content
-                                original_msg = await bot.forward_message(
-                                    chat_id=content_chat_id,
-                                    from_chat_id=content_chat_id,
-                                    message_id=content_message_id
-                                )
-                                
-                                # Apply signature based on original content
-                                if original_msg.text:
-                                    # Check if signature fits
-                                    if len(original_msg.text) + signature_len + 1 <= 4096:
-                                        new_text = original_msg.text + signature
-                                        await bot.edit_message_text(
-                                            chat_id=channel_id,
-                                            message_id=posted_message_id,
-                                            text=new_text,
-                                            parse_mode=ParseMode.HTML,
-                                            disable_web_page_preview=True
-                                        )
-                                        logger.info(f"✅ Signature applied to text for job {job_id}")
-                                    else:
-                                        logger.info(f"⏭️ Signature skipped for job {job_id}: text too long")
-                                elif original_msg.caption is not None:
-                                    current_caption = original_msg.caption or ""
-                                    # Check if signature fits
-                                    if len(current_caption) + signature_len + 1 <= 1024:
-                                        new_caption = current_caption + signature
-                                        await bot.edit_message_caption(
-                                            chat_id=channel_id,
-                                            message_id=posted_message_id,
-                                            caption=new_caption,
-                                            parse_mode=ParseMode.HTML,
-                                        )
-                                        logger.info(f"✅ Signature applied to caption for job {job_id}")
-                                    else:
-                                        logger.info(f"⏭️ Signature skipped for job {job_id}: caption too long ({len(current_caption)}/{1024 - signature_len - 1})")
-                                else:
-                                    # Message has no text or caption, try adding signature as new caption
-                                    try:
-                                        await bot.edit_message_caption(
-                                            chat_id=channel_id,
-                                            message_id=posted_message_id,
-                                            caption=signature.strip(),
-                                            parse_mode=ParseMode.HTML,
-                                        )
-                                        logger.info(f"✅ Signature applied as new caption for job {job_id}")
-                                    except Exception:
-                                        logger.info(f"⏭️ Could not add signature to message without caption for job {job_id}")
-                                
-                                # Delete the forwarded message we used to get content
-                                try:
-                                    await bot.delete_message(chat_id=content_chat_id, message_id=original_msg.message_id)
-                                except Exception:
-                                    pass
-                            except Exception as e2:
-                                logger.warning(f"Signature application failed: {e2}")
-                    except Exception as e:
-                        logger.warning(f"⚠️ Could not apply signature to job {job_id}: {e}")
+                if sent_msgs:
+                    all_posted_ids = [msg.message_id for msg in sent_msgs]
+                    posted_message_id = sent_msgs[0].message_id
+                else:
+                    raise Exception("No messages could be forwarded or reconstructed for this album.")
+
+            # === FROM_BOT MEDIA GROUP: Reconstruct from file IDs (подпись — сразу в caption) ===
+            elif 'files' in media_data:
+                input_media = []
+                raw_caption = media_data.get('caption', '') or ''
+                caption_html = media_data.get('caption_html')
+                if caption_html is not None or signature:
+                    caption_to_use = sign_html(raw_caption, caption_html, signature, MAX_CAPTION_LENGTH) or None
+                    caption_parse_mode = ParseMode.HTML
+                else:
+                    caption_to_use = raw_caption[:1024] if raw_caption else None
+                    caption_parse_mode = None
+
+                for i, f in enumerate(media_data['files']):
+                    media_obj = None
+                    item_caption = caption_to_use if i == 0 else None
+                    item_parse_mode = caption_parse_mode if i == 0 else None
+
+                    if f['type'] == 'photo':
+                        media_obj = InputMediaPhoto(media=f['media'], caption=item_caption, parse_mode=item_parse_mode)
+                    elif f['type'] == 'video':
+                        media_obj = InputMediaVideo(media=f['media'], caption=item_caption, parse_mode=item_parse_mode)
+                    elif f['type'] == 'document':
+                        media_obj = InputMediaDocument(media=f['media'], caption=item_caption, parse_mode=item_parse_mode)
+                    elif f['type'] == 'audio':
+                        media_obj = InputMediaAudio(media=f['media'], caption=item_caption, parse_mode=item_parse_mode)
+
+                    if media_obj:
+                        input_media.append(media_obj)
+
+                if input_media:
+                    sent_msgs = await bot.send_media_group(
+                        chat_id=channel_id,
+                        media=input_media,
+                        disable_notification=api_disable_notification
+                    )
+                    all_posted_ids = [msg.message_id for msg in sent_msgs]
+                    posted_message_id = sent_msgs[0].message_id
+                else:
+                    raise Exception("Empty media group or invalid file types")
+
+        # LOGIC C: Signed single message (free tier) — готовый снимок с подписью, один запрос
+        elif signature and payload and payload['type'] != PAYLOAD_COPY:
+            sent_msg = await send_signed_payload(bot, channel_id, payload, signature, api_disable_notification)
+            posted_message_id = sent_msg.message_id
+            all_posted_ids = [posted_message_id]
 
-        # 4. PINNING
-        pin_duration = float(job_data['pin_duration'] or 0)
-        if pin_duration > 0 and posted_message_id:
-            try:
-                await bot.pin_chat_message(chat_id=channel_id, message_id=posted_message_id,
-                                           disable_notification=api_disable_notification)
-                unpin_time = datetime.now(ZoneInfo('UTC')) + timedelta(hours=pin_duration)
-                context.application.job_queue.run_once(execute_unpin_job, when=unpin_time,
-                                                       data={'channel_id': channel_id, 'message_id': posted_message_id,
-                                                             'job_id': job_id},
-                                                       name=f"unpin_{job_id}_{posted_message_id}")
-            except Exception as e:
-                logger.error(f"Pinning failed: {e}")
-
-        # 5. AUTO DELETE - Pass all message IDs for media groups
-        delete_hours = float(job_data['auto_delete_hours'] or 0)
-        if delete_hours > 0 and posted_message_id:
-            del_time = datetime.now(ZoneInfo('UTC')) + timedelta(hours=delete_hours)
-            context.application.job_queue.run_once(execute_delete_job, when=del_time,
-                                                   data={'channel_id': channel_id, 'message_id': posted_message_id,
-                                                         'message_ids': all_posted_ids,  # Pass ALL message IDs
-                                                         'job_id': job_id}, name=f"del_{job_id}_{posted_message_id}")
-
-        # 6. UPDATE STATUS
-        ids_json = json.dumps(all_posted_ids)
-        db_query(
-            "UPDATE publication_jobs SET status = 'published', published_at = NOW(), posted_message_id = %s, posted_message_ids = %s WHERE id = %s",
-            (posted_message_id, ids_json, job_id), commit=True)
-
-        # --- 7. REPORTING (Consolidated with Hyperlinks) ---
-        # A. Fetch Channel Info
-        ch_info = db_query("SELECT channel_username, channel_title FROM channels WHERE channel_id = %s", (channel_id,),
-                           fetchone=True)
-        raw_title = ch_info.get('channel_title', str(channel_id)) if ch_info else str(channel_id)
-        channel_username = ch_info.get('channel_username') if ch_info else None
-
-        # B. Generate Hyperlink
-        if channel_username:
-            post_link = f"https://t.me/{channel_username}/{posted_message_id}"
+        # LOGIC D: Single Message Copy (From Bot)
         else:
-            clean_id = str(channel_id).replace("-100", "")
-            post_link = f"https://t.me/c/{clean_id}/{posted_message_id}"
-
-        # C. Format Entry
-        safe_title = raw_title.replace("[", "").replace("]", "")
-        formatted_link_entry = f"[{safe_title}]({post_link})"
-
-        # D. Buffer for Consolidated Report
-        batch_id = int(job_data['scheduled_time_utc'].timestamp())
-        report_key = f"rep_{task_data['id']}_{batch_id}"
-
-        if report_key not in context.bot_data:
-            context.bot_data[report_key] = {
-                'channels': [],
-                'task_name': task_data.get('task_name'),
-                'time': datetime.now(ZoneInfo('UTC')),
-                'advertiser_id': job_data['advertiser_user_id'],
-                'creator_id': task_data['user_id'],
-                'report_enabled': bool(task_data.get('report_enabled', False))
-            }
-        context.bot_data[report_key]['channels'].append(formatted_link_entry)
-
-        # E. Schedule Debounced Sender
-        sender_job_name = f"send_{report_key}"
-        existing_jobs = context.job_queue.get_jobs_by_name(sender_job_name)
-        for job in existing_jobs:
-            job.schedule_removal()
-
-        context.job_queue.run_once(
-            send_consolidated_report,
-            when=3,
-            data={'report_key': report_key},
-            name=sender_job_name
-        )
+            sent_msg = await bot.copy_message(
+                chat_id=channel_id,
+                from_chat_id=content_chat_id,
+                message_id=content_message_id,
+                disable_notification=api_disable_notification
+            )
+            posted_message_id = sent_msg.message_id
+            all_posted_ids = [posted_message_id]
 
-        # 8. SCHEDULE NEXT RECURRENCE
-        schedules = get_task_schedules(task_data['id'])
-        this_run_time_utc = job_data['scheduled_time_utc'].replace(tzinfo=ZoneInfo('UTC'))
-        for schedule in schedules:
-            if schedule['schedule_weekday'] is not None:
-                next_run_utc = this_run_time_utc + timedelta(days=7)
-                create_single_publication_job(task_data, channel_id, next_run_utc, context.application)
+    logger.info(f"✅ Published successfully. Main Msg ID: {posted_message_id}, Total Msgs: {len(all_posted_ids)}")
+
+    # PINNING
+    pinned = False
+    pin_duration = float(job_data['pin_duration'] or 0)
+    if pin_duration > 0 and posted_message_id:
+        try:
+            await bot.pin_chat_message(chat_id=channel_id, message_id=posted_message_id,
+                                       disable_notification=api_disable_notification)
+            pinned = True
+        except Exception as e:
+            logger.error(f"Pinning failed: {e}")
+
+    return {
+        'job_id': job_id,
+        'posted_message_id': posted_message_id,
+        'all_posted_ids': all_posted_ids,
+        'pinned': pinned,
+    }
+
+
+def _format_channel_link(channel_id: int, posted_message_id: int, channels_info: Dict[int, Dict]) -> str:
+    # A. Channel Info
+    ch_info = channels_info.get(channel_id)
+    raw_title = ch_info.get('channel_title', str(channel_id)) if ch_info else str(channel_id)
+    channel_username = ch_info.get('channel_username') if ch_info else None
+
+    # B. Generate Hyperlink
+    if channel_username:
+        post_link = f"https://t.me/{channel_username}/{posted_message_id}"
+    else:
+        clean_id = str(channel_id).replace("-100", "")
+        post_link = f"https://t.me/c/{clean_id}/{posted_message_id}"
+
+    # C. Format Entry
+    safe_title = raw_title.replace("[", "").replace("]", "")
+    return f"[{safe_title}]({post_link})"
+
+
+def _buffer_report(context: ContextTypes.DEFAULT_TYPE, task_data: dict, job_data: dict, entries: List[str]):
+    # D. Buffer for Consolidated Report
+    batch_id = int(job_data['scheduled_time_utc'].timestamp())
+    report_key = f"rep_{task_data['id']}_{batch_id}"
+
+    if report_key not in context.bot_data:
+        context.bot_data[report_key] = {
+            'channels': [],
+            'task_name': task_data.get('task_name'),
+            'time': datetime.now(ZoneInfo('UTC')),
+            'advertiser_id': job_data['advertiser_user_id'],
+            'creator_id': task_data['user_id'],
+            'report_enabled': bool(task_data.get('report_enabled', False))
+        }
+    context.bot_data[report_key]['channels'].extend(entries)
+
+    # E. Schedule Debounced Sender (пачку могли разбить на несколько claim'ов)
+    sender_job_name = f"send_{report_key}"
+    job_registry.cancel_by_name(sender_job_name)
+
+    job_registry.run_once(
+        context.job_queue,
+        send_consolidated_report,
+        when=3,
+        data={'report_key': report_key},
+        name=sender_job_name,
+        task_id=task_data['id'],
+        user_id=task_data['user_id']
+    )
+
+
+def cancel_task_reports(bot_data: dict, task_id: int) -> int:
+    """Отменяет отложенные отчёты задачи (удаление задачи) вместе с их буфером в bot_data."""
+    for job in job_registry.get_by('task_id', task_id):
+        if isinstance(job.data, dict):
+            bot_data.pop(job.data.get('report_key'), None)
+    return job_registry.cancel_by('task_id', task_id)
 
-    except Exception as e:
-        logger.error(f"❌ Execution failed for job {job_id}: {e}", exc_info=True)
-        db_query("UPDATE publication_jobs SET status = 'failed' WHERE id = %s", (job_id,), commit=True)
 
 async def send_consolidated_report(context: ContextTypes.DEFAULT_TYPE):
     """
@@ -483,7 +466,7 @@ async def send_consolidated_report(context: ContextTypes.DEFAULT_TYPE):
     for user_id in targets:
         try:
             # Get user settings for Language AND Timezone
-            user_settings = get_user_settings(user_id)
+            user_settings = await get_user_settings(user_id)
             lang = user_settings.get('language_code', 'en')
             tz_name = user_settings.get('timezone', 'Europe/Moscow')
 
@@ -521,11 +504,13 @@ async def send_consolidated_report(context: ContextTypes.DEFAULT_TYPE):
                 time=time_str  # Now localized
             )
 
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=report_text,
-                parse_mode='Markdown',
-                disable_web_page_preview=True
-            )
+            # Отчёты уступают публикациям по расписанию
+            with rate_limit_lane(PRIORITY_SERVICE):
+                await context.bot.send_message(
+                    chat_id=user_id,
+                    text=report_text,
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True
+                )
         except Exception as e:
             logger.error(f"Failed to send consolidated report to {user_id}: {e}")
\ No newline at end of file
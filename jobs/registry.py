@@ -0,0 +1,112 @@
+from collections import defaultdict
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set
+
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_REMOVED, JobEvent
+from telegram.ext import ContextTypes, Job, JobQueue
+
+from utils.logging import logger
+
+JobCallback = Callable[[ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, Any]]
+
+# Ключи индекса (кроме name), по которым можно искать и массово отменять jobs
+INDEX_KEYS = ('task_id', 'channel_id', 'user_id')
+
+
+class JobRegistry:
+    """
+    Индекс одноразовых JobQueue-задач (debounce отчётов, сборка media group).
+
+    JobQueue.get_jobs_by_name — линейный проход по всем jobs планировщика; здесь
+    jobs хранятся в словарях по name / task_id / channel_id / user_id, поэтому
+    поиск и отмена — O(1) на ключ (плюс число найденных jobs).
+    Job удаляется из индекса, когда APScheduler убирает его из планировщика
+    (отработал, пропущен после misfire_grace_time, отменён), — через listener.
+    """
+
+    def __init__(self):
+        self._by_name: Dict[str, Set[Job]] = defaultdict(set)
+        self._by_key: Dict[str, Dict[Any, Set[Job]]] = {key: defaultdict(set) for key in INDEX_KEYS}
+        self._keys: Dict[Job, Dict[str, Any]] = {}
+        # id job'а APScheduler -> Job, для событий планировщика
+        self._by_aps_id: Dict[str, Job] = {}
+        self._listening: Set[int] = set()
+
+    def run_once(self, job_queue: JobQueue, callback: JobCallback, when, *, name: str,
+                 data: Any = None, task_id: Optional[int] = None, channel_id: Optional[int] = None,
+                 user_id: Optional[int] = None, chat_id: Optional[int] = None) -> Job:
+        """JobQueue.run_once + регистрация в индексе. user_id/chat_id передаются и в сам Job."""
+        async def run(context: ContextTypes.DEFAULT_TYPE):
+            try:
+                await callback(context)
+            finally:
+                self._discard(context.job)
+
+        self._listen(job_queue)
+        job = job_queue.run_once(run, when=when, data=data, name=name, user_id=user_id, chat_id=chat_id)
+        keys = {'name': name, 'task_id': task_id, 'channel_id': channel_id, 'user_id': user_id}
+        self._keys[job] = keys
+        self._by_aps_id[job.job.id] = job
+        self._by_name[name].add(job)
+        for key in INDEX_KEYS:
+            if keys[key] is not None:
+                self._by_key[key][keys[key]].add(job)
+        return job
+
+    def get_by_name(self, name: str) -> List[Job]:
+        return list(self._by_name.get(name, ()))
+
+    def get_by(self, key: str, value: Any) -> List[Job]:
+        """key — один из INDEX_KEYS"""
+        return list(self._by_key[key].get(value, ()))
+
+    def cancel_by_name(self, name: str) -> int:
+        return self._cancel(self.get_by_name(name))
+
+    def cancel_by(self, key: str, value: Any) -> int:
+        """Отменяет все jobs с key == value (например, cancel_by('task_id', 42)). Returns: сколько отменено."""
+        return self._cancel(self.get_by(key, value))
+
+    def stats(self) -> dict:
+        """Размер индекса (для /debug_jobs)."""
+        return {'jobs': len(self._keys), 'names': len(self._by_name)}
+
+    def _cancel(self, jobs: List[Job]) -> int:
+        for job in jobs:
+            job.schedule_removal()
+            self._discard(job)
+        if jobs:
+            logger.debug(f"Cancelled {len(jobs)} registered jobs")
+        return len(jobs)
+
+    def _listen(self, job_queue: JobQueue):
+        scheduler = job_queue.scheduler
+        if id(scheduler) in self._listening:
+            return
+        scheduler.add_listener(self._on_job_event, EVENT_JOB_MISSED | EVENT_JOB_REMOVED)
+        self._listening.add(id(scheduler))
+
+    def _on_job_event(self, event: JobEvent):
+        """Пропущенный (misfire) или удалённый из планировщика job больше не запустится."""
+        self._discard(self._by_aps_id.get(event.job_id))
+
+    def _discard(self, job: Optional[Job]):
+        keys = self._keys.pop(job, None)
+        if keys is None:
+            return
+        self._by_aps_id.pop(job.job.id, None)
+        self._remove(self._by_name, keys['name'], job)
+        for key in INDEX_KEYS:
+            if keys[key] is not None:
+                self._remove(self._by_key[key], keys[key], job)
+
+    @staticmethod
+    def _remove(index: Dict[Any, Set[Job]], value: Any, job: Job):
+        jobs = index.get(value)
+        if jobs is None:
+            return
+        jobs.discard(job)
+        if not jobs:
+            del index[value]
+
+
+job_registry = JobRegistry()
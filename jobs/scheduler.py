@@ -1,47 +1,42 @@
 from datetime import datetime, timedelta
+from typing import List, Dict
 from zoneinfo import ZoneInfo
 
-from telegram.ext import Application
-
-from database.connection import db_query
-from database.queries.schedules import get_task_schedules
-from database.queries.task_channels import get_task_channels
-from database.queries.tasks import get_task_details
-from jobs.publication import create_single_publication_job
+from config.settings import SCHEDULE_HORIZON_HOURS
+from database.queries.publications import cancel_stale_task_jobs, update_scheduled_jobs_snapshot
+from database.queries.schedules import get_task_schedule, get_schedules_for_tasks
+from database.queries.task_channels import get_task_channels, get_channels_for_tasks
+from database.queries.tasks import get_task_details, get_user_active_tasks
+from jobs.publication import create_publication_jobs
+from models.schedule import TaskSchedule
 from utils.logging import logger
 
 
-def create_publication_jobs_for_task(task_id: int, user_tz: str, application: Application) -> int:
+def compute_schedule_slots(schedule: TaskSchedule, user_tz: str, now_utc: datetime = None,
+                           until_utc: datetime = None) -> List[datetime]:
     """
-    Creates the FIRST upcoming publication_job for the task.
-    FIXED: Allows multiple time slots per day for Weekdays.
+    Считает UTC-время публикаций по расписанию задачи в окне [now, until_utc] (без обращений к БД).
+    - конкретная дата+время -> этот момент (если не в прошлом и попадает в окно);
+    - день недели+время -> каждое такое время в окне (несколько слотов в день допустимы).
+    По умолчанию окно — rolling horizon SCHEDULE_HORIZON_HOURS; более дальние
+    публикации остаются «виртуальными» в task_schedule_sets.
     """
-    task = get_task_details(task_id)
-    schedules = get_task_schedules(task_id)
-    channels = get_task_channels(task_id)
-
-    if not schedules or not channels:
-        return 0
-
     try:
         tz = ZoneInfo(user_tz)
     except:
         tz = ZoneInfo('UTC')
 
-    job_count = 0
-    now_utc = datetime.now(ZoneInfo('UTC'))
+    if now_utc is None:
+        now_utc = datetime.now(ZoneInfo('UTC'))
+    if until_utc is None:
+        until_utc = now_utc + timedelta(hours=SCHEDULE_HORIZON_HOURS)
     now_local = now_utc.astimezone(tz)
 
     # Allow jobs that are up to 60 seconds in the past (processing lag) to run immediately
     buffer_time = now_utc - timedelta(seconds=60)
 
-    for schedule in schedules:
-        if not schedule['schedule_time']: continue
-
-        schedule_time = schedule['schedule_time']
-        schedule_date = schedule.get('schedule_date')
-        schedule_weekday = schedule.get('schedule_weekday')
-
+    slots = set()
+    for schedule_date, schedule_weekday, schedule_time in schedule.expand():
         # --- Case 1: Specific Date ---
         if schedule_date:
             try:
@@ -49,25 +44,13 @@ def create_publication_jobs_for_task(task_id: int, user_tz: str, application: Ap
                 local_dt = naive_dt.replace(tzinfo=tz)
                 utc_dt = local_dt.astimezone(ZoneInfo('UTC'))
 
-                if utc_dt < buffer_time: continue
-
-                for channel_id in channels:
-                    exists = db_query("""
-                        SELECT 1 FROM publication_jobs 
-                        WHERE task_id=%s AND channel_id=%s AND scheduled_time_utc=%s AND status='scheduled'
-                    """, (task['id'], channel_id, utc_dt), fetchone=True)
-
-                    if not exists:
-                        if create_single_publication_job(task, channel_id, utc_dt, application):
-                            job_count += 1
+                if utc_dt < buffer_time or utc_dt > until_utc: continue
+                slots.add(utc_dt)
             except Exception as e:
                 logger.error(f"Error scheduling specific date: {e}")
 
         # --- Case 2: Weekday (e.g., "Friday") ---
         elif schedule_weekday is not None:
-            # --- REMOVED THE GENERIC 'future_jobs' CHECK HERE ---
-            # We must calculate the specific target time first to allow multiple slots per day.
-
             # Calculate the next weekday
             current_wd = now_local.weekday()
             days_ahead = (schedule_weekday - current_wd) % 7
@@ -84,37 +67,105 @@ def create_publication_jobs_for_task(task_id: int, user_tz: str, application: Ap
                 if today_target < (now_local - timedelta(seconds=60)):
                     days_ahead = 7
 
-            # Calculate target local time
-            target_local_date = now_local.date() + timedelta(days=days_ahead)
-            target_local_dt = datetime(
-                target_local_date.year,
-                target_local_date.month,
-                target_local_date.day,
-                schedule_time.hour,
-                schedule_time.minute,
-                schedule_time.second,
-                tzinfo=tz
-            )
-
-            # Convert to UTC
-            target_utc_dt = target_local_dt.astimezone(ZoneInfo("UTC"))
-
-            # Double check against buffer just in case calculations were weird
-            if target_utc_dt < buffer_time:
-                target_utc_dt += timedelta(days=7)
-
-            # Create the job (Check for SPECIFIC duplicates)
-            for channel_id in channels:
-                # Check if THIS specific time slot is already booked
-                exists = db_query("""
-                    SELECT 1 FROM publication_jobs 
-                    WHERE task_id=%s AND channel_id=%s AND scheduled_time_utc=%s AND status='scheduled'
-                """, (task['id'], channel_id, target_utc_dt), fetchone=True)
+            # Каждая неделя считается в локальной дате, чтобы переход на летнее время не сдвигал слот
+            while True:
+                target_local_date = now_local.date() + timedelta(days=days_ahead)
+                target_local_dt = datetime(
+                    target_local_date.year,
+                    target_local_date.month,
+                    target_local_date.day,
+                    schedule_time.hour,
+                    schedule_time.minute,
+                    schedule_time.second,
+                    tzinfo=tz
+                )
+
+                # Convert to UTC
+                target_utc_dt = target_local_dt.astimezone(ZoneInfo("UTC"))
+                days_ahead += 7
 
-                if not exists:
-                    if create_single_publication_job(task, channel_id, target_utc_dt, application):
-                        job_count += 1
+                # Double check against buffer just in case calculations were weird
+                if target_utc_dt < buffer_time:
+                    continue
+                if target_utc_dt > until_utc:
+                    break
+                slots.add(target_utc_dt)
 
-    return job_count
+    return sorted(slots)
 
 
+async def create_publication_jobs_for_task(task_id: int, user_tz: str) -> int:
+    """
+    Creates the upcoming publication_jobs for the task (в пределах rolling horizon).
+    Все пары (канал, время) считаются в памяти и вставляются одним bulk INSERT;
+    уже созданные слоты пропускаются. Дальше горизонт продлевает jobs/materializer.py.
+    """
+    task = await get_task_details(task_id)
+    schedule = await get_task_schedule(task_id)
+    channels = await get_task_channels(task_id)
+
+    if not task or schedule.is_empty() or not channels:
+        return 0
+
+    slot_times = compute_schedule_slots(schedule, user_tz)
+    slots = [(channel_id, utc_dt) for utc_dt in slot_times for channel_id in channels]
+
+    job_ids = await create_publication_jobs(task, slots)
+    return len(job_ids)
+
+
+async def reschedule_task_jobs(task: dict, user_tz: str) -> Dict[str, int]:
+    """
+    Инкрементальный hot reload активной задачи (вместо «отменить всё и создать заново»).
+    Сравнивает нужные слоты (канал, время) в пределах горизонта с уже запланированными:
+    отменяются только исчезнувшие (будущие — наступившие строки остаются диспетчеру),
+    создаются только новые, остальные строки остаются на месте — в них лишь обновляются
+    поля-снимки задачи.
+    Returns: {'added', 'cancelled', 'snapshot_updated'}.
+    """
+    schedule = await get_task_schedule(task['id'])
+    channels = await get_task_channels(task['id'])
+
+    slot_times = compute_schedule_slots(schedule, user_tz) if channels else []
+    slots = [(channel_id, utc_dt) for utc_dt in slot_times for channel_id in channels]
+
+    cancelled = await cancel_stale_task_jobs(task['id'], slots)
+    snapshot_updated = await update_scheduled_jobs_snapshot(task)
+    # Уже существующие слоты insert_publication_jobs пропускает сам (NOT EXISTS)
+    added = await create_publication_jobs(task, slots)
+    return {'added': len(added), 'cancelled': cancelled, 'snapshot_updated': snapshot_updated}
+
+
+async def get_planned_publications(user_id: int, user_tz: str, until_utc: datetime) -> List[Dict]:
+    """
+    Все публикации активных задач пользователя до until_utc, включая ещё не
+    материализованные (за пределами rolling horizon) — считаются из task_schedule_sets.
+    Returns: [{'scheduled_time_utc', 'task_id', 'channel_id', 'pin_duration'}, ...] по времени.
+    """
+    tasks = await get_user_active_tasks(user_id)
+    if not tasks:
+        return []
+
+    task_ids = [task['id'] for task in tasks]
+    schedules_by_task = await get_schedules_for_tasks(task_ids)
+    channels_by_task = await get_channels_for_tasks(task_ids)
+    now_utc = datetime.now(ZoneInfo('UTC'))
+
+    planned = []
+    for task in tasks:
+        channels = channels_by_task.get(task['id'])
+        if not channels:
+            continue
+        for utc_dt in compute_schedule_slots(schedules_by_task.get(task['id'], TaskSchedule()), user_tz, now_utc, until_utc):
+            if utc_dt < now_utc:
+                continue
+            for channel_id in channels:
+                planned.append({
+                    'scheduled_time_utc': utc_dt,
+                    'task_id': task['id'],
+                    'channel_id': channel_id,
+                    'pin_duration': task['pin_duration'] or 0,
+                })
+
+    planned.sort(key=lambda item: item['scheduled_time_utc'])
+    return planned
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from telegram.ext import Application, ContextTypes
+
+from config.settings import USER_STATE_IDLE_TTL, USER_STATE_MAX_RESIDENT
+from database.persistence import PostgresPersistence, TRANSIENT_USER_KEYS
+from utils.logging import logger
+
+# У Application нет публичного API «выгрузить user_data без удаления из persistence»
+# (drop_user_data удаляет и строку в БД), поэтому вытеснение использует эти приватные
+# атрибуты PTB (версия закреплена в requirements.txt); check_user_state_support проверяет их при старте
+_PTB_USER_DATA_ATTRS = ('_user_data', '_user_ids_to_be_updated_in_persistence')
+
+# Пользователи, для которых сейчас выполняется update (или фоновый обработчик с их user_data)
+_in_flight: Counter = Counter()
+
+
+@contextmanager
+def user_in_flight(user_id):
+    """Пока блок выполняется, user_data пользователя не вытесняется."""
+    if user_id is None:
+        yield
+        return
+    _in_flight[user_id] += 1
+    try:
+        yield
+    finally:
+        _in_flight[user_id] -= 1
+        if _in_flight[user_id] <= 0:
+            del _in_flight[user_id]
+
+
+def check_user_state_support(application: Application):
+    """Падает при старте, если в установленной версии PTB нет нужных приватных атрибутов."""
+    missing = [name for name in _PTB_USER_DATA_ATTRS if not hasattr(application, name)]
+    if missing:
+        raise RuntimeError(f"User state eviction: Application has no {', '.join(missing)} "
+                           f"(python-telegram-bot changed?), check jobs/user_state.py")
+
+
+async def evict_idle_user_state(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодический job: вытесняет user_data из памяти, чтобы резидентная память
+    росла с числом активных пользователей, а не со всеми, кто когда-либо писал боту.
+
+    - простаивающие дольше USER_STATE_IDLE_TTL: transient-ключи удаляются (компакция),
+      данные дописываются в БД и выгружаются;
+    - сверх USER_STATE_MAX_RESIDENT: вытесняются самые давние (LRU) без компакции.
+    Пользователи с update'ом в обработке (user_in_flight) не вытесняются никогда:
+    его handler продолжил бы писать в уже выгруженный dict.
+    Следующее обращение пользователя снова загрузит строку (PostgresPersistence.refresh_user_data).
+    """
+    application = context.application
+    persistence = application.persistence
+    if not isinstance(persistence, PostgresPersistence):
+        return
+    check_user_state_support(application)
+
+    candidates = persistence.eviction_candidates(USER_STATE_IDLE_TTL, USER_STATE_MAX_RESIDENT)
+    if not candidates:
+        return
+
+    seen = {user_id: persistence.last_seen(user_id) for user_id in candidates}
+    now = time.monotonic()
+    evict = []
+    for user_id in candidates:
+        if user_id in _in_flight:
+            continue
+        user_data = application.user_data.get(user_id)
+        if user_data is None:
+            persistence.forget_user(user_id)
+            continue
+        if now - seen[user_id] >= USER_STATE_IDLE_TTL:
+            for key in TRANSIENT_USER_KEYS:
+                user_data.pop(key, None)
+        evict.append((user_id, user_data))
+
+    # Последняя версия — в БД (неизменившиеся строки не пишутся)
+    await asyncio.gather(*(persistence.update_user_data(user_id, user_data) for user_id, user_data in evict))
+
+    evicted = 0
+    for user_id, _ in evict:
+        if persistence.last_seen(user_id) != seen[user_id] or user_id in _in_flight:
+            continue  # пользователь вернулся, пока шла запись
+        application._user_data.pop(user_id, None)
+        application._user_ids_to_be_updated_in_persistence.discard(user_id)
+        persistence.forget_user(user_id)
+        evicted += 1
+
+    if evicted:
+        logger.info(f"User state: выгружено {evicted} пользователей, в памяти {persistence.stats()['resident_users']}")
@@ -7,13 +7,13 @@ from localization.loader import get_text
 from utils.text_utils import generate_smart_name
 
 
-def channels_selection_keyboard(context: ContextTypes.DEFAULT_TYPE, selected_channels: List[int] = None):
+async def channels_selection_keyboard(context: ContextTypes.DEFAULT_TYPE, selected_channels: List[int] = None):
     """Клавиатура выбора каналов с галочками"""
     if selected_channels is None:
         selected_channels = []
 
     user_id = context.user_data.get('user_id')
-    channels = get_user_channels(user_id)
+    channels = await get_user_channels(user_id)
 
     keyboard = []
     for ch in channels:
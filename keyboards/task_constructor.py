@@ -1,16 +1,16 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database.connection import db_query
+from database.connection import db_query_async
 from database.queries.task_channels import get_task_channels
 from database.queries.tasks import get_task_details
 from localization.loader import get_text
 from utils.time_utils import format_hours_to_dhms
 
 
-def task_constructor_keyboard(context: ContextTypes.DEFAULT_TYPE):
+async def task_constructor_keyboard(context: ContextTypes.DEFAULT_TYPE):
     """Клавиатура конструктора (Dynamic Labels with Localization)"""
     task_id = context.user_data.get('current_task_id')
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
 
     # --- Defaults ---
     pin_val = 0
@@ -30,7 +30,7 @@ def task_constructor_keyboard(context: ContextTypes.DEFAULT_TYPE):
         post_type = task.get('post_type', 'repost')
         if task.get('status') == 'active':
             # Check if there are actually scheduled jobs
-            future_jobs = db_query("""
+            future_jobs = await db_query_async("""
                         SELECT COUNT(*) as count FROM publication_jobs 
                         WHERE task_id = %s AND status = 'scheduled'
                     """, (task_id,), fetchone=True)
@@ -38,7 +38,7 @@ def task_constructor_keyboard(context: ContextTypes.DEFAULT_TYPE):
         else:
             is_active = False
         has_message = bool(task.get('content_message_id'))
-        channels = get_task_channels(task_id)
+        channels = await get_task_channels(task_id)
         has_channels = bool(channels)
 
     # Buttons
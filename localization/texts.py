@@ -162,11 +162,12 @@ TEXTS = {
         'boss_mailing_send_btn': "✅ Отправить",
         'boss_mailing_cancel_btn': "❌ Отменить",
         'boss_mailing_started': "Рассылка начата...",
-        'boss_mailing_sending': "📤 Отправка рассылки...\n{sent} отправлено, {failed} ошибок",
-        'boss_mailing_sending_initial': "📤 Отправка рассылки...\n0 / ?",
+        'boss_mailing_sending': "📤 Рассылка #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Рассылка #{campaign_id} запущена в фоне.\nПрогресс — в отдельном сообщении, можно продолжать работу.",
         'boss_mailing_completed_title': "✅ **Рассылка завершена!**",
         'boss_mailing_sent_count': "📨 Отправлено: {sent}",
         'boss_mailing_failed_count': "❌ Ошибок: {failed}",
+        'boss_mailing_blocked_count': "🚫 Заблокировали бота: {blocked}",
         'boss_back_to_boss': "⬅️ Назад в Boss",
         'boss_signature_title': "🌵 **Подпись для FREE тарифа**",
         'boss_signature_info': 'ℹ️ Эта подпись будет добавлена ко всем постам от пользователей с тарифом FREE.\n\n'
@@ -569,11 +570,12 @@ Let's get started! Please select your language:""",
         'boss_mailing_send_btn': "✅ Send",
         'boss_mailing_cancel_btn': "❌ Cancel",
         'boss_mailing_started': "Mailing started...",
-        'boss_mailing_sending': "📤 Sending mailing...\n{sent} sent, {failed} errors",
-        'boss_mailing_sending_initial': "📤 Sending mailing...\n0 / ?",
+        'boss_mailing_sending': "📤 Mailing #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Mailing #{campaign_id} started in the background.\nProgress is shown in a separate message, you can keep working.",
         'boss_mailing_completed_title': "✅ **Mailing completed!**",
         'boss_mailing_sent_count': "📨 Sent: {sent}",
         'boss_mailing_failed_count': "❌ Errors: {failed}",
+        'boss_mailing_blocked_count': "🚫 Blocked the bot: {blocked}",
         'boss_back_to_boss': "⬅️ Back to Boss",
         'boss_signature_title': "🌵 **Signature for FREE plan**",
         'boss_signature_info': 'ℹ️ This signature will be added to all posts from FREE users.\n\n'
@@ -974,11 +976,12 @@ Mi objetivo es hacer que tu colaboración con los anunciantes sea lo más eficie
         'boss_mailing_send_btn': "✅ Enviar",
         'boss_mailing_cancel_btn': "❌ Cancelar",
         'boss_mailing_started': "Envío masivo iniciado...",
-        'boss_mailing_sending': "📤 Enviando masivo...\n{sent} enviados, {failed} errores",
-        'boss_mailing_sending_initial': "📤 Enviando masivo...\n0 / ?",
+        'boss_mailing_sending': "📤 Envío masivo #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Envío masivo #{campaign_id} iniciado en segundo plano.\nEl progreso se muestra en un mensaje aparte, puedes seguir trabajando.",
         'boss_mailing_completed_title': "✅ **Envío Masivo completado!**",
         'boss_mailing_sent_count': "📨 Enviados: {sent}",
         'boss_mailing_failed_count': "❌ Errores: {failed}",
+        'boss_mailing_blocked_count': "🚫 Bloquearon el bot: {blocked}",
         'boss_back_to_boss': "⬅️ Volver al Panel Boss",
         'boss_signature_title': "🌵 **Firma para Tarifa FREE**",
         'boss_signature_info': "Esta firma se añadirá a las publicaciones de los usuarios con tarifa FREE.",
@@ -1373,11 +1376,12 @@ Commençons! Veuillez sélectionner votre langue:""",
         'boss_mailing_send_btn': "✅ Envoyer",
         'boss_mailing_cancel_btn': "❌ Annuler",
         'boss_mailing_started': "Envoi commencé...",
-        'boss_mailing_sending': "📤 Envoi en cours...\n{sent} envoyés, {failed} erreurs",
-        'boss_mailing_sending_initial': "📤 Envoi en cours...\n0 / ?",
+        'boss_mailing_sending': "📤 Envoi #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Envoi #{campaign_id} lancé en arrière-plan.\nLa progression s'affiche dans un message séparé, vous pouvez continuer.",
         'boss_mailing_completed_title': "✅ **Envoi terminé!**",
         'boss_mailing_sent_count': "📨 Envoyés: {sent}",
         'boss_mailing_failed_count': "❌ Erreurs: {failed}",
+        'boss_mailing_blocked_count': "🚫 Ont bloqué le bot: {blocked}",
         'boss_back_to_boss': "⬅️ Retour au Boss",
         'boss_signature_title': "🌵 **Signature pour Abonnement FREE**",
         'boss_signature_info': "Cette signature sera ajoutée aux publications des utilisateurs en abonnement FREE.",
@@ -1772,11 +1776,12 @@ Confirmer ?
         'boss_mailing_send_btn': "✅ Надіслати",
         'boss_mailing_cancel_btn': "❌ Скасувати",
         'boss_mailing_started': "Розсилка розпочата...",
-        'boss_mailing_sending': "📤 Надсилання розсилки...\n{sent} надіслано, {failed} помилок",
-        'boss_mailing_sending_initial': "📤 Надсилання розсилки...\n0 / ?",
+        'boss_mailing_sending': "📤 Розсилка #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Розсилку #{campaign_id} запущено у фоні.\nПрогрес — в окремому повідомленні, можна продовжувати роботу.",
         'boss_mailing_completed_title': "✅ **Розсилка завершена!**",
         'boss_mailing_sent_count': "📨 Надіслано: {sent}",
         'boss_mailing_failed_count': "❌ Помилок: {failed}",
+        'boss_mailing_blocked_count': "🚫 Заблокували бота: {blocked}",
         'boss_back_to_boss': "⬅️ Назад в Boss",
         'boss_signature_title': "🌵 **Підпис для FREE тарифу**",
         'boss_signature_info': "Цей підпис буде додаватися до постів користувачів з тарифом FREE.",
@@ -2171,11 +2176,12 @@ Lassen Sie uns beginnen! Bitte wählen Sie Ihre Sprache:""",
         'boss_mailing_send_btn': "✅ Senden",
         'boss_mailing_cancel_btn': "❌ Abbrechen",
         'boss_mailing_started': "Mailing gestartet...",
-        'boss_mailing_sending': "📤 Mailing wird gesendet...\n{sent} gesendet, {failed} Fehler",
-        'boss_mailing_sending_initial': "📤 Mailing wird gesendet...\n0 / ?",
+        'boss_mailing_sending': "📤 Mailing #{campaign_id}...\n{processed} / {total}\n📨 {sent} · ❌ {failed} · 🚫 {blocked}",
+        'boss_mailing_background': "📤 Mailing #{campaign_id} läuft im Hintergrund.\nDer Fortschritt steht in einer separaten Nachricht, Sie können weiterarbeiten.",
         'boss_mailing_completed_title': "✅ **Mailing abgeschlossen!**",
         'boss_mailing_sent_count': "📨 Gesendet: {sent}",
         'boss_mailing_failed_count': "❌ Fehler: {failed}",
+        'boss_mailing_blocked_count': "🚫 Haben den Bot blockiert: {blocked}",
         'boss_back_to_boss': "⬅️ Zurück zum Boss",
         'boss_signature_title': "🌵 **Signatur für FREE-Tarif**",
         'boss_signature_info': "Diese Signatur wird zu Beiträgen von Benutzern mit dem FREE-Tarif hinzugefügt.",
@@ -1,4 +1,3 @@
-import os
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -7,17 +6,18 @@ from telegram.ext import (
     MessageHandler,
     filters,
     ChatMemberHandler,
-    ConversationHandler, PreCheckoutQueryHandler, TypeHandler, PicklePersistence,
+    ConversationHandler, PreCheckoutQueryHandler, TypeHandler,
 )
 
-from config.settings import BOT_TOKEN, OWNER_ID
+from config.settings import BOT_TOKEN, OWNER_ID, MATERIALIZER_INTERVAL, POST_ACTION_POLL_INTERVAL, \
+    USER_STATE_SWEEP_INTERVAL
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from database.connection import db_pool
+from database.persistence import PostgresPersistence
 from database.schema import init_db
-from database.rate_limit import init_rate_limit_table
 
 from handlers.admin.ban import boss_ban_start, boss_ban_receive_user, boss_ban_confirm_yes, boss_unban_confirm_yes
 from handlers.admin.grant import boss_grant_start, boss_grant_receive_input, boss_grant_confirm_yes
@@ -48,11 +48,20 @@ from handlers.tasks.options import task_set_delete, delete_receive_custom, delet
     task_set_pin, pin_receive_custom, pin_custom, pin_duration_select, task_receive_advertiser, task_set_post_type, \
     task_set_advertiser, task_set_report, task_set_pin_notify
 from handlers.tasks.time import time_clear, time_custom, time_slot_select, task_select_time, time_receive_custom
-from jobs.cleanup import cleanup_past_schedules, cleanup_inactive_tasks, cleanup_rate_limit_records
-from jobs.restoration import restore_active_tasks
+from jobs.cleanup import cleanup_past_schedules, cleanup_inactive_tasks, cleanup_rate_limit_records, \
+    cleanup_finished_post_actions
+from jobs.dispatcher import publication_dispatcher
+from jobs.mailing import mailing_engine
+from jobs.materializer import materialize_horizon_job
+from jobs.post_actions import execute_due_post_actions
+from jobs.publication import execute_publication_batch
+from jobs.restoration import start_restoration, stop_restoration
+from jobs.user_state import evict_idle_user_state, check_user_state_support
+from middleware.request_scope import RequestScopeUpdateProcessor
 from middleware.user_loader import global_user_loader
 from states.conversation import MAIN_MENU, MY_TASKS, MY_CHANNELS, FREE_DATES, TARIFF, REPORTS, BOSS_PANEL, START_SELECT_LANG, START_SELECT_TZ, TASK_CONSTRUCTOR, TASK_SET_NAME, TASK_SELECT_CHANNELS, TASK_SET_MESSAGE, TASK_SELECT_CALENDAR, TASK_SELECT_TIME, TASK_SET_PIN, TASK_SET_PIN_NOTIFY, TASK_SET_DELETE, TASK_SET_REPORT, TASK_SET_ADVERTISER, TASK_SET_POST_TYPE, TASK_SET_CUSTOM_TIME, CALENDAR_VIEW, TIME_SELECTION, BOSS_MAILING, BOSS_STATS, BOSS_USERS, BOSS_LIMITS, BOSS_TARIFFS, BOSS_BAN, BOSS_MONEY, BOSS_LOGS, BOSS_MAILING_CREATE, BOSS_MAILING_MESSAGE, BOSS_MAILING_EXCLUDE, BOSS_MAILING_CONFIRM, BOSS_SIGNATURE_EDIT, BOSS_USERS_LIST, BOSS_STATS_VIEW, BOSS_LIMITS_SELECT_USER, BOSS_LIMITS_SET_VALUE, BOSS_TARIFFS_EDIT, BOSS_BAN_SELECT_USER, BOSS_BAN_CONFIRM, BOSS_MONEY_VIEW, BOSS_LOGS_VIEW, BOSS_GRANT_TARIFF, BOSS_GRANT_CONFIRM, TASK_SET_PIN_CUSTOM, TASK_SET_DELETE_CUSTOM, TASK_DELETE_CONFIRM
 from utils.logging import logger
+from utils.rate_limiter import rate_limiter
 
 
 scheduler = AsyncIOScheduler(timezone='UTC')
@@ -67,28 +76,56 @@ def main():
         logger.critical("Бот не может запуститься без соединения с БД!")
         return
 
+    # Схема БД и таблица rate limit — через версионные миграции
     init_db()
 
-    # Initialize rate limiting table
-    init_rate_limit_table()
-
     async def post_init(app: Application):
-        await restore_active_tasks(app)
-
-    # Используем абсолютный путь для persistence (FILE, не директория)
-    PERSISTENCE_DIR = "/app/persistence"
-    os.makedirs(PERSISTENCE_DIR, exist_ok=True)
-
-    persistence_file = os.path.join(PERSISTENCE_DIR, "state.pkl")
-
-    persistence = PicklePersistence(filepath=persistence_file)
-    logger.info(f"Bot persistence file: {persistence_file}")
+        # Публикации забирает из БД диспетчер (вместо таймера JobQueue на каждый пост);
+        # уже запланированные строки начинают выходить сразу, не дожидаясь восстановления
+        publication_dispatcher.start(app, execute_publication_batch)
+        # Восстановление идёт в фоне параллельно с polling (прогресс — в /debug_jobs)
+        start_restoration(app)
+        # Rolling horizon: восстановление продлевает его при старте, дальше — по таймеру
+        app.job_queue.run_repeating(materialize_horizon_job, interval=MATERIALIZER_INTERVAL,
+                                    first=MATERIALIZER_INTERVAL, name="materialize_horizon")
+        # Unpin / auto-delete из очереди scheduled_tasks (переживает рестарт)
+        app.job_queue.run_repeating(execute_due_post_actions, interval=POST_ACTION_POLL_INTERVAL,
+                                    first=1, name="post_actions")
+        # Выгрузка простаивающих user_data из памяти (загружаются лениво, при обращении);
+        # использует приватные атрибуты Application — без них не стартуем
+        check_user_state_support(app)
+        app.job_queue.run_repeating(evict_idle_user_state, interval=USER_STATE_SWEEP_INTERVAL,
+                                    first=USER_STATE_SWEEP_INTERVAL, name="user_state_eviction")
+        # Рассылки, прерванные рестартом, продолжаются с сохранённого курсора
+        await mailing_engine.start(app)
+
+    async def post_stop(app: Application):
+        # До Application.shutdown(): после него бот уже закрыт, и каждая отправка
+        # диспетчера / рассылки падала бы и записывалась в failed
+        await stop_restoration()
+        await publication_dispatcher.stop()
+        await mailing_engine.stop()
+
+    async def post_shutdown(app: Application):
+        # persistence уже сброшена в БД в Application.shutdown()
+        if db_pool:
+            db_pool.closeall()
+
+    # Состояние бота (user_data, разговоры) — в таблицах persistence_* (строка на пользователя);
+    # старый state.pkl переносится одноразово: scripts/import_pickle_persistence.py
+    persistence = PostgresPersistence()
 
     application = (
         Application.builder()
         .token(BOT_TOKEN)
         .persistence(persistence)
+        # Общий лимитер исходящих запросов: глобальный + per-chat, приоритетные полосы, RetryAfter
+        .rate_limiter(rate_limiter)
+        # Update'ы по одному, как по умолчанию; у каждого своя identity map задач / расписаний / каналов
+        .concurrent_updates(RequestScopeUpdateProcessor(1))
         .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
@@ -124,6 +161,7 @@ def main():
         # --- Экраны меню ---
         MY_TASKS: [
             CallbackQueryHandler(nav_main_menu, pattern="^nav_main_menu$"),
+            CallbackQueryHandler(nav_my_tasks, pattern="^nav_my_tasks(_after_\\d+(_\\d+)?)?$"),
             CallbackQueryHandler(task_constructor_entrypoint, pattern="^nav_new_task$"),
             CallbackQueryHandler(nav_my_channels, pattern="^nav_channels$"),
             CallbackQueryHandler(task_edit_entrypoint, pattern="^task_edit_"),
@@ -371,6 +409,14 @@ def main():
         replace_existing=True
     )
 
+    scheduler.add_job(
+        cleanup_finished_post_actions,
+        CronTrigger(hour=1, minute=10, timezone='UTC'),
+        id='cleanup_post_actions',
+        name='Daily cleanup of finished post actions older than 30 days',
+        replace_existing=True
+    )
+
     scheduler.start()
 
     logger.info("✅ Scheduled daily cleanup jobs")
@@ -0,0 +1,73 @@
+import re
+from typing import Any, Awaitable, Dict, List, Tuple
+
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+from database.queries.identity_map import request_scope, RequestScope
+from jobs.user_state import user_in_flight
+from utils.logging import logger
+
+# Хвост callback_data с аргументами (id, дата, время): 'task_edit_42' -> 'task_edit'
+_CALLBACK_ARGS = re.compile(r'[_\d:.\-]+$')
+# Ограничение числа типов в статистике (callback_data приходит от клиента)
+MAX_UPDATE_TYPES = 200
+
+
+def update_type(update: object) -> str:
+    """Тип update'а для статистики: callback без аргументов, /команда или вид update'а."""
+    if not isinstance(update, Update):
+        return type(update).__name__
+    if update.callback_query:
+        data = update.callback_query.data or ''
+        return 'cb:' + (_CALLBACK_ARGS.sub('', data) or data)
+    message = update.message
+    if message and message.text and message.text.startswith('/'):
+        return message.text.split()[0].split('@')[0]
+    if message:
+        return 'message'
+    for kind in ('edited_message', 'my_chat_member', 'pre_checkout_query', 'chat_member'):
+        if getattr(update, kind, None):
+            return kind
+    return 'other'
+
+
+class UpdateQueryStats:
+    """Запросы к БД по типам update'ов (для /debug_jobs)."""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, kind: str, scope: RequestScope):
+        if kind not in self._stats and len(self._stats) >= MAX_UPDATE_TYPES:
+            kind = 'other'
+        entry = self._stats.setdefault(kind, {'updates': 0, 'queries': 0, 'hits': 0})
+        entry['updates'] += 1
+        entry['queries'] += scope.queries
+        entry['hits'] += scope.hits
+
+    def top(self, limit: int = 10) -> List[Tuple[str, Dict[str, int]]]:
+        """Типы с наибольшим числом запросов на update"""
+        return sorted(self._stats.items(), key=lambda item: item[1]['queries'] / item[1]['updates'],
+                      reverse=True)[:limit]
+
+
+update_query_stats = UpdateQueryStats()
+
+
+class RequestScopeUpdateProcessor(SimpleUpdateProcessor):
+    """
+    Обработка update'ов с request scope: каждый update идёт со своей identity map
+    (database.queries.identity_map), чтения задачи / расписания / каналов кэшируются
+    до конца update'а. Параллельность — как у SimpleUpdateProcessor.
+    Пока update обрабатывается, user_data его пользователя не вытесняется (jobs/user_state.py).
+    """
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = update.effective_user if isinstance(update, Update) else None
+        with user_in_flight(user.id if user else None), request_scope() as scope:
+            await coroutine
+
+        kind = update_type(update)
+        update_query_stats.record(kind, scope)
+        logger.debug(f"Update {kind}: {scope.queries} DB queries, {scope.hits} identity map hits")
@@ -1 +1,60 @@
-# schedule.py
\ No newline at end of file
+from dataclasses import dataclass, field
+from datetime import date, time
+from typing import Iterator, List, Optional, Set, Tuple
+
+
+@dataclass
+class TaskSchedule:
+    """
+    Компактное расписание задачи — одна строка task_schedule_sets на задачу:
+    набор дат ИЛИ дней недели (в БД — битовая маска) и набор времён.
+    Публикации — произведение (даты | дни недели) × времена; оно разворачивается
+    только при расчёте слотов (expand() -> jobs/scheduler.compute_schedule_slots).
+    """
+    dates: Set[date] = field(default_factory=set)
+    weekdays: Set[int] = field(default_factory=set)  # 0 = понедельник ... 6 = воскресенье
+    times: Set[time] = field(default_factory=set)
+
+    @classmethod
+    def from_row(cls, row: Optional[dict]) -> 'TaskSchedule':
+        """Строка task_schedule_sets (или None — расписания нет)"""
+        if not row:
+            return cls()
+        return cls(
+            dates=set(row.get('dates') or []),
+            weekdays=cls.weekdays_from_mask(row.get('weekday_mask') or 0),
+            times=set(row.get('times') or []),
+        )
+
+    @property
+    def weekday_mask(self) -> int:
+        mask = 0
+        for weekday in self.weekdays:
+            mask |= 1 << weekday
+        return mask
+
+    @staticmethod
+    def weekdays_from_mask(mask: int) -> Set[int]:
+        return {weekday for weekday in range(7) if mask & (1 << weekday)}
+
+    def is_empty(self) -> bool:
+        return not (self.dates or self.weekdays or self.times)
+
+    def date_strings(self) -> List[str]:
+        """Отсортированные даты 'YYYY-MM-DD' (формат callback'ов календаря)"""
+        return [d.strftime('%Y-%m-%d') for d in sorted(self.dates)]
+
+    def time_strings(self) -> List[str]:
+        """Отсортированные времена 'HH:MM'"""
+        return [t.strftime('%H:%M') for t in sorted(self.times)]
+
+    def expand(self) -> Iterator[Tuple[Optional[date], Optional[int], time]]:
+        """
+        Разворачивает расписание в пары (дата, день недели, время):
+        (date, None, time) для конкретных дат, (None, weekday, time) для повторов.
+        """
+        for schedule_time in sorted(self.times):
+            for schedule_date in sorted(self.dates):
+                yield schedule_date, None, schedule_time
+            for schedule_weekday in sorted(self.weekdays):
+                yield None, schedule_weekday, schedule_time
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Activation benchmark: per-slot scheduling vs bulk publication-job materialization.
+
+For every (channels, slots) combination it materializes channels × slots
+publication_jobs for a throwaway task twice:
+  legacy — SELECT 1 duplicate check + INSERT + UPDATE aps_job_id per pair
+           (the pre-bulk create_publication_jobs_for_task loop);
+  bulk   — jobs.publication.create_publication_jobs (one INSERT ... ON CONFLICT).
+Only DB cost is measured (the dispatcher is not running, wake() is a no-op).
+All fixture rows are removed at the end.
+
+Usage (needs a reachable, migrated DATABASE_URL):
+    python scripts/bench_activation.py --channels 1 10 50 --slots 10 100 310
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import db_query_async  # noqa: E402
+from jobs.publication import create_publication_jobs  # noqa: E402
+
+BENCH_USER_ID = -424242
+
+
+async def setup_fixture(channels: int) -> dict:
+    await db_query_async(
+        "INSERT INTO users (user_id, username) VALUES (%s, 'bench') ON CONFLICT DO NOTHING",
+        (BENCH_USER_ID,), commit=True
+    )
+    task = await db_query_async(
+        "INSERT INTO tasks (user_id, status) VALUES (%s, 'inactive') RETURNING *",
+        (BENCH_USER_ID,), commit=True
+    )
+    channel_ids = [BENCH_USER_ID * 1000 - i for i in range(channels)]
+    return {'task': task, 'channel_ids': channel_ids}
+
+
+async def cleanup_fixture():
+    await db_query_async("DELETE FROM publication_jobs WHERE user_id = %s", (BENCH_USER_ID,), commit=True)
+    await db_query_async("DELETE FROM tasks WHERE user_id = %s", (BENCH_USER_ID,), commit=True)
+    await db_query_async("DELETE FROM users WHERE user_id = %s", (BENCH_USER_ID,), commit=True)
+
+
+async def legacy_materialize(task: dict, slots):
+    for channel_id, utc_dt in slots:
+        exists = await db_query_async("""
+            SELECT 1 FROM publication_jobs
+            WHERE task_id=%s AND channel_id=%s AND scheduled_time_utc=%s AND status='scheduled'
+        """, (task['id'], channel_id, utc_dt), fetchone=True)
+        if exists:
+            continue
+        row = await db_query_async("""
+            INSERT INTO publication_jobs (task_id, user_id, channel_id, scheduled_time_utc, status)
+            VALUES (%s, %s, %s, %s, 'scheduled') RETURNING id
+        """, (task['id'], task['user_id'], channel_id, utc_dt), commit=True)
+        await db_query_async("UPDATE publication_jobs SET aps_job_id = %s WHERE id = %s",
+                             (f"pub_{row['id']}", row['id']), commit=True)
+
+
+async def run_case(channels: int, slot_count: int):
+    fixture = await setup_fixture(channels)
+    task = fixture['task']
+    start = datetime.now(ZoneInfo('UTC')) + timedelta(days=1)
+    times = [start + timedelta(minutes=15 * i) for i in range(slot_count)]
+    slots = [(channel_id, t) for t in times for channel_id in fixture['channel_ids']]
+
+    started = time.perf_counter()
+    await legacy_materialize(task, slots)
+    legacy = time.perf_counter() - started
+    await db_query_async("DELETE FROM publication_jobs WHERE task_id = %s", (task['id'],), commit=True)
+
+    started = time.perf_counter()
+    await create_publication_jobs(task, slots)
+    bulk = time.perf_counter() - started
+
+    await cleanup_fixture()
+    print(f"channels={channels:>4} slots={slot_count:>4} jobs={len(slots):>6}  "
+          f"legacy={legacy:8.3f}s  bulk={bulk:8.3f}s  speedup={legacy / bulk if bulk else 0:6.1f}x")
+
+
+async def main_async(args):
+    try:
+        for channels in args.channels:
+            for slot_count in args.slots:
+                await run_case(channels, slot_count)
+    finally:
+        await cleanup_fixture()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--slots", type=int, nargs="+", default=[10, 100, 310])
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not set", file=sys.stderr)
+        sys.exit(1)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Event-loop stall benchmark: sync db_query vs db_query_async.
+
+Simulates N concurrent Telegram updates, each doing a few DB round trips
+(pg_sleep emulates a slow query), while a probe coroutine measures how late
+the event loop wakes up. With the sync helper every query blocks the loop;
+with the async layer the loop stays responsive.
+
+Usage (needs a reachable DATABASE_URL):
+    python scripts/bench_event_loop_stall.py --updates 50 --queries 3 --delay 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import db_query, db_query_async  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """Measures how late the loop wakes up compared to the requested sleep."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def update_sync(queries: int, delay: float):
+    for _ in range(queries):
+        db_query("SELECT pg_sleep(%s)", (delay,), fetchone=True)
+        await asyncio.sleep(0)
+
+
+async def update_async(queries: int, delay: float):
+    for _ in range(queries):
+        await db_query_async("SELECT pg_sleep(%s)", (delay,), fetchone=True)
+
+
+async def run(mode: str, updates: int, queries: int, delay: float):
+    worker = update_sync if mode == "sync" else update_async
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(queries, delay) for _ in range(updates)))
+    wall = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p95 = lags_ms[int(len(lags_ms) * 0.95) - 1] if len(lags_ms) > 1 else lags_ms[0]
+    print(f"{mode:>5}: wall={wall:7.3f}s  "
+          f"stall max={lags_ms[-1]:8.2f}ms  p95={p95:8.2f}ms  "
+          f"mean={statistics.mean(lags_ms):7.2f}ms  samples={len(lags_ms)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=50, help="concurrent simulated updates")
+    parser.add_argument("--queries", type=int, default=3, help="DB round trips per update")
+    parser.add_argument("--delay", type=float, default=0.02, help="server-side pg_sleep per query, seconds")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not set", file=sys.stderr)
+        sys.exit(1)
+
+    for mode in ("sync", "async"):
+        asyncio.run(run(mode, args.updates, args.queries, args.delay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Persistence benchmark: PicklePersistence (one state.pkl) vs PostgresPersistence.
+
+For every user count it fills both backends with typical user_data and measures:
+  startup — what Application.initialize loads (Postgres: nothing, user_data is lazy);
+  load    — Postgres only: first access of --touched users (one row each);
+  flush   — one persistence cycle after --touched users changed their data
+            (PicklePersistence rewrites the whole file, Postgres upserts the
+            changed rows only);
+  idle    — one persistence cycle where the touched users' data did not change.
+
+Fixture users get ids from BENCH_USER_BASE down; their rows are removed at the
+end. Run it against a scratch database: the reported size includes any real rows.
+
+Usage (needs a reachable, migrated DATABASE_URL):
+    python scripts/bench_persistence.py --users 10000 100000 1000000 --touched 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import PicklePersistence  # noqa: E402
+
+from database.connection import db_query_async  # noqa: E402
+from database.persistence import PostgresPersistence  # noqa: E402
+
+BENCH_USER_BASE = -1_000_000_000
+FILL_CHUNK = 20_000
+
+
+def user_data(i: int, version: int = 0) -> dict:
+    """Примерно то, что лежит в user_data после пары экранов"""
+    return {
+        'user_id': i, 'language_code': 'ru', 'timezone': 'Europe/Moscow', 'tariff': 'free',
+        'current_task_id': 1000 + i % 97, 'temp_message_ids': [i % 1000, i % 1000 + 1],
+        'last_bot_message_id': i % 5000 + version, 'calendar_year': 2026, 'calendar_month': 5,
+    }
+
+
+async def cleanup_fixture():
+    await db_query_async("DELETE FROM persistence_user_data WHERE user_id <= %s", (BENCH_USER_BASE,), commit=True)
+
+
+async def bench_pickle(users: list, touched: list) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.pkl")
+        persistence = PicklePersistence(filepath=path, on_flush=True)
+        await persistence.get_user_data()
+        for user_id in users:
+            await persistence.update_user_data(user_id, user_data(user_id))
+        await persistence.flush()
+
+        started = time.perf_counter()
+        await PicklePersistence(filepath=path).get_user_data()
+        startup = time.perf_counter() - started
+
+        # on_flush=False (как было в main.py): каждый update_* переписывает файл целиком,
+        # поэтому один цикл = одна полная запись на каждого затронутого пользователя;
+        # здесь меряем нижнюю границу — одну запись файла на цикл
+        for user_id in touched:
+            await persistence.update_user_data(user_id, user_data(user_id, 1))
+        started = time.perf_counter()
+        await persistence.flush()
+        flush = time.perf_counter() - started
+        size = os.path.getsize(path)
+    return {'startup': startup, 'load': 0.0, 'flush': flush, 'idle': flush, 'size': size}
+
+
+async def bench_postgres(users: list, touched: list) -> dict:
+    persistence = PostgresPersistence()
+    for start in range(0, len(users), FILL_CHUNK):
+        chunk = users[start:start + FILL_CHUNK]
+        await asyncio.gather(*(persistence.store_user_data(user_id, user_data(user_id)) for user_id in chunk))
+
+    fresh = PostgresPersistence()
+    started = time.perf_counter()
+    await fresh.get_user_data()
+    startup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fresh.refresh_user_data(user_id, {}) for user_id in touched))
+    load = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fresh.update_user_data(user_id, user_data(user_id, 1)) for user_id in touched))
+    flush = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fresh.update_user_data(user_id, user_data(user_id, 1)) for user_id in touched))
+    idle = time.perf_counter() - started
+
+    size = await db_query_async("SELECT pg_total_relation_size('persistence_user_data') AS size", fetchone=True)
+    return {'startup': startup, 'load': load, 'flush': flush, 'idle': idle, 'size': size['size'] if size else 0}
+
+
+async def main_async(args):
+    try:
+        for count in args.users:
+            users = [BENCH_USER_BASE - i for i in range(count)]
+            touched = users[:args.touched]
+            results = {'pickle': await bench_pickle(users, touched)}
+            await cleanup_fixture()
+            results['postgres'] = await bench_postgres(users, touched)
+            await cleanup_fixture()
+            for name, r in results.items():
+                print(f"users={count:>8} {name:>8}  startup={r['startup']:8.3f}s  load={r['load']:8.3f}s  "
+                      f"flush={r['flush']:8.3f}s  idle={r['idle']:8.3f}s  size={r['size'] / 1024 / 1024:8.1f} MiB")
+    finally:
+        await cleanup_fixture()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--touched", type=int, default=500, help="users changed per persistence cycle")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not set", file=sys.stderr)
+        sys.exit(1)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Peak Python memory of reading a large result set: db_query(fetchall=True) vs db_stream.
+
+The query is generate_series, so no fixture tables are needed. db_query holds the
+whole result as a list of dicts; db_stream keeps one batch (DB_STREAM_BATCH_SIZE).
+
+Usage (needs a reachable DATABASE_URL):
+    python scripts/bench_stream.py --rows 100000 1000000 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import db_query, db_stream  # noqa: E402
+
+SQL = "SELECT g AS id, md5(g::text) AS payload FROM generate_series(1, %s) AS g"
+
+
+def measure(func) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not set", file=sys.stderr)
+        sys.exit(1)
+
+    for count in args.rows:
+        fetchall = measure(lambda: len(db_query(SQL, (count,), fetchall=True) or []))
+        stream = measure(lambda: sum(len(rows) for rows in db_stream(SQL, (count,))))
+        for name, (rows, elapsed, peak) in (('fetchall', fetchall), ('db_stream', stream)):
+            print(f"rows={count:>9} {name:>9}  read={rows:>9}  time={elapsed:7.2f}s  peak={peak / 1024 / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+One-off migration of the old PicklePersistence file into the persistence_* tables.
+
+Reads user_data, chat_data, bot_data and every conversation stored in the
+pickle file and writes them through database.persistence.PostgresPersistence.
+Refuses to run when persistence_user_data already has rows (use --force).
+
+Usage (needs a reachable, migrated DATABASE_URL):
+    python scripts/import_pickle_persistence.py --file /app/persistence/state.pkl
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import db_query_async  # noqa: E402
+from database.persistence import PostgresPersistence  # noqa: E402
+
+
+async def main_async(args):
+    existing = await db_query_async("SELECT COUNT(*) AS count FROM persistence_user_data", fetchone=True)
+    if existing and existing['count'] and not args.force:
+        print(f"persistence_user_data already has {existing['count']} rows, use --force to overwrite",
+              file=sys.stderr)
+        sys.exit(1)
+
+    # Формат PicklePersistence (single_file=True): один dict со всеми разделами.
+    # Placeholder'ы бота восстанавливаются как None — в user_data их нет, кроме media_group_buffer
+    # (он больше не используется и удаляется ниже).
+    class Unpickler(pickle.Unpickler):
+        def persistent_load(self, pid):
+            return None
+
+    with open(args.file, 'rb') as f:
+        data = Unpickler(f).load()
+
+    persistence = PostgresPersistence()
+    user_data = data.get('user_data') or {}
+    chat_data = data.get('chat_data') or {}
+    conversations = data.get('conversations') or {}
+    for value in user_data.values():
+        value.pop('media_group_buffer', None)
+
+    await asyncio.gather(*(persistence.store_user_data(user_id, value) for user_id, value in user_data.items()))
+    await asyncio.gather(*(persistence.update_chat_data(chat_id, value) for chat_id, value in chat_data.items()))
+    if data.get('bot_data'):
+        await persistence.update_bot_data(data['bot_data'])
+    for name, states in conversations.items():
+        await asyncio.gather(*(persistence.update_conversation(name, key, state) for key, state in states.items()))
+
+    print(f"Imported users={len(user_data)} chats={len(chat_data)} "
+          f"conversations={sum(len(states) for states in conversations.values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="/app/persistence/state.pkl")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not set", file=sys.stderr)
+        sys.exit(1)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
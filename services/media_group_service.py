@@ -1 +1,166 @@
-# media_group_service.py
\ No newline at end of file
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Message
+from telegram.ext import ContextTypes
+
+from config.settings import MEDIA_GROUP_QUIET_MIN, MEDIA_GROUP_QUIET_MAX, MEDIA_GROUP_MAX_WAIT, MEDIA_GROUP_MAX_OPEN
+from jobs.user_state import user_in_flight
+from utils.logging import logger
+
+# Больше частей в альбоме Telegram не бывает: 10-я часть завершает сборку сразу
+MAX_ALBUM_PARTS = 10
+# Тишина после последней части = QUIET_FACTOR × наибольший интервал между частями
+QUIET_FACTOR = 3
+
+
+@dataclass
+class AlbumPart:
+    """Одна часть альбома — только то, что нужно process_media_group (без Message)"""
+    message_id: int
+    type: Optional[str]
+    file_id: Optional[str]
+    caption: Optional[str]
+    caption_html: Optional[str]  # caption вместе с entities
+    has_spoiler: bool
+
+    @classmethod
+    def from_message(cls, message: Message) -> 'AlbumPart':
+        file_type, file_id = None, None
+        if message.photo:
+            file_type, file_id = 'photo', message.photo[-1].file_id  # Best quality
+        elif message.video:
+            file_type, file_id = 'video', message.video.file_id
+        elif message.document:
+            file_type, file_id = 'document', message.document.file_id
+        elif message.audio:
+            file_type, file_id = 'audio', message.audio.file_id
+        return cls(
+            message_id=message.message_id,
+            type=file_type,
+            file_id=file_id,
+            caption=message.caption,
+            caption_html=message.caption_html if message.caption else None,
+            has_spoiler=bool(getattr(message, 'has_media_spoiler', False)),
+        )
+
+
+AlbumCallback = Callable[[ContextTypes.DEFAULT_TYPE, 'Album'], Awaitable[None]]
+
+
+@dataclass
+class Album:
+    chat_id: int
+    media_group_id: str
+    user_id: int
+    is_forward: bool
+    context: ContextTypes.DEFAULT_TYPE
+    on_complete: AlbumCallback
+    parts: Dict[int, AlbumPart] = field(default_factory=dict)
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    max_gap: float = 0.0
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def sorted_parts(self) -> List[AlbumPart]:
+        return [self.parts[message_id] for message_id in sorted(self.parts)]
+
+
+class MediaGroupAggregator:
+    """
+    Сборка альбомов (media group) в памяти процесса, ключ — (chat_id, media_group_id).
+
+    Части альбома приходят отдельными update'ами; здесь хранятся только поля AlbumPart,
+    не Message, и ничего не попадает в user_data / persistence. На альбом — одна
+    фоновая задача (Application.create_task), она ждёт тишины после последней части:
+    QUIET_FACTOR × наибольший интервал между частями в пределах
+    [MEDIA_GROUP_QUIET_MIN, MEDIA_GROUP_QUIET_MAX]. Альбом завершается не позже
+    MEDIA_GROUP_MAX_WAIT после первой части и сразу — на MAX_ALBUM_PARTS частях.
+    Открытых альбомов не больше MEDIA_GROUP_MAX_OPEN: при переполнении самый
+    старый недособранный альбом отбрасывается.
+    """
+
+    def __init__(self, quiet_min: float, quiet_max: float, max_wait: float, max_open: int):
+        self.quiet_min = quiet_min
+        self.quiet_max = quiet_max
+        self.max_wait = max_wait
+        self.max_open = max_open
+        self._albums: Dict[Tuple[int, str], Album] = {}
+        self.completed = 0
+        self.dropped = 0
+
+    def add(self, message: Message, context: ContextTypes.DEFAULT_TYPE, on_complete: AlbumCallback):
+        """Добавляет часть альбома; on_complete(context, album) вызывается один раз после сборки"""
+        key = (message.chat_id, message.media_group_id)
+        now = time.monotonic()
+        album = self._albums.get(key)
+
+        if album is None:
+            if len(self._albums) >= self.max_open:
+                self._drop_oldest()
+            album = Album(
+                chat_id=message.chat_id,
+                media_group_id=message.media_group_id,
+                user_id=message.from_user.id,
+                is_forward=message.forward_origin is not None,
+                context=context,
+                on_complete=on_complete,
+                first_seen=now,
+                last_seen=now,
+            )
+            self._albums[key] = album
+            context.application.create_task(self._finalize_when_quiet(key, album),
+                                            name=f"media_group_{message.media_group_id}")
+        else:
+            album.max_gap = max(album.max_gap, now - album.last_seen)
+            album.last_seen = now
+
+        album.parts[message.message_id] = AlbumPart.from_message(message)
+        album.changed.set()
+
+    def _quiet_period(self, album: Album) -> float:
+        if len(album.parts) >= MAX_ALBUM_PARTS:
+            return 0.0
+        if len(album.parts) < 2:
+            return self.quiet_max
+        return min(self.quiet_max, max(self.quiet_min, QUIET_FACTOR * album.max_gap))
+
+    async def _finalize_when_quiet(self, key: Tuple[int, str], album: Album):
+        while True:
+            album.changed.clear()
+            now = time.monotonic()
+            deadline = min(album.last_seen + self._quiet_period(album), album.first_seen + self.max_wait)
+            if now >= deadline:
+                break
+            try:
+                await asyncio.wait_for(album.changed.wait(), timeout=deadline - now)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._albums.get(key) is not album:
+            return  # отброшен при переполнении
+        del self._albums[key]
+        self.completed += 1
+        try:
+            # Обработчик пишет в user_data вне update'а — не даём её вытеснить
+            with user_in_flight(album.user_id):
+                await album.on_complete(album.context, album)
+        except Exception as e:
+            logger.error(f"Media group {album.media_group_id} processing failed: {e}", exc_info=True)
+
+    def _drop_oldest(self):
+        key, album = min(self._albums.items(), key=lambda item: item[1].first_seen)
+        del self._albums[key]
+        album.changed.set()
+        self.dropped += 1
+        logger.warning(f"Media group {album.media_group_id} dropped: more than {self.max_open} open albums")
+
+    def stats(self) -> dict:
+        """Для /debug_jobs"""
+        return {'open': len(self._albums), 'completed': self.completed, 'dropped': self.dropped}
+
+
+media_group_aggregator = MediaGroupAggregator(MEDIA_GROUP_QUIET_MIN, MEDIA_GROUP_QUIET_MAX,
+                                              MEDIA_GROUP_MAX_WAIT, MEDIA_GROUP_MAX_OPEN)
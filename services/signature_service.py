@@ -1 +1,104 @@
-# signature_service.py
\ No newline at end of file
+import html
+from typing import Optional
+
+from telegram import Message
+from telegram.constants import ParseMode
+
+from utils.logging import logger
+
+MAX_TEXT_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+
+# Одиночные медиа, которые отправляются одним send_* с уже добавленной подписью
+MEDIA_SENDERS = {
+    'photo': 'send_photo',
+    'video': 'send_video',
+    'animation': 'send_animation',
+    'document': 'send_document',
+    'audio': 'send_audio',
+    'voice': 'send_voice',
+}
+# Тип, который одним запросом с подписью не отправить (стикер, опрос и т.п.) — публикуется copy_message
+PAYLOAD_COPY = 'copy'
+# Типы, для которых Bot API принимает has_spoiler / show_caption_above_media
+_SPOILER_TYPES = ('photo', 'video', 'animation')
+
+
+def snapshot_message(message: Message) -> dict:
+    """
+    Снимок содержимого одиночного сообщения при сохранении в задачу (tasks.message_payload):
+    текст/подпись (plain — для проверки лимитов, html — вместе с entities) и file_id медиа.
+    Неподдерживаемые типы получают {'type': PAYLOAD_COPY}.
+    """
+    if message.text is not None:
+        return {'type': 'text', 'text': message.text, 'html': message.text_html}
+
+    # animation проверяется раньше document: у GIF заполнены оба поля
+    if message.photo:
+        file_type, file_id = 'photo', message.photo[-1].file_id
+    elif message.video:
+        file_type, file_id = 'video', message.video.file_id
+    elif message.animation:
+        file_type, file_id = 'animation', message.animation.file_id
+    elif message.document:
+        file_type, file_id = 'document', message.document.file_id
+    elif message.audio:
+        file_type, file_id = 'audio', message.audio.file_id
+    elif message.voice:
+        file_type, file_id = 'voice', message.voice.file_id
+    else:
+        return {'type': PAYLOAD_COPY}
+
+    return {
+        'type': file_type,
+        'media': file_id,
+        'text': message.caption or '',
+        'html': message.caption_html if message.caption else '',
+        'has_spoiler': bool(message.has_media_spoiler),
+        'show_caption_above_media': bool(message.show_caption_above_media),
+    }
+
+
+def sign_html(plain: str, html_text: Optional[str], signature: Optional[str], limit: int) -> str:
+    """
+    Добавляет подпись (HTML) к тексту/подписи поста.
+    plain — текст без разметки (лимиты Telegram считаются по нему), html_text — тот же текст в HTML;
+    если html_text нет (старые данные), plain экранируется.
+    Подпись не влезает в лимит — пост уходит без неё.
+    """
+    if html_text is None:
+        html_text = html.escape(plain or '')
+    if not signature:
+        return html_text
+    if not plain:
+        return signature.strip()
+    if len(plain) + len(signature) + 1 > limit:
+        logger.info(f"⏭️ Signature skipped: text too long ({len(plain)}/{limit - len(signature) - 1})")
+        return html_text
+    return html_text + signature
+
+
+async def send_signed_payload(bot, chat_id: int, payload: dict, signature: Optional[str],
+                              disable_notification: bool) -> Message:
+    """Публикует снимок сообщения одним запросом с уже добавленной подписью."""
+    if payload['type'] == 'text':
+        return await bot.send_message(
+            chat_id=chat_id,
+            text=sign_html(payload['text'], payload.get('html'), signature, MAX_TEXT_LENGTH),
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
+            disable_notification=disable_notification
+        )
+
+    file_type = payload['type']
+    kwargs = {
+        file_type: payload['media'],
+        'caption': sign_html(payload['text'], payload.get('html'), signature, MAX_CAPTION_LENGTH) or None,
+        'parse_mode': ParseMode.HTML,
+    }
+    if file_type in _SPOILER_TYPES:
+        kwargs['has_spoiler'] = payload.get('has_spoiler', False)
+        kwargs['show_caption_above_media'] = payload.get('show_caption_above_media', False)
+
+    sender = getattr(bot, MEDIA_SENDERS[file_type])
+    return await sender(chat_id=chat_id, disable_notification=disable_notification, **kwargs)
@@ -3,18 +3,17 @@ from typing import Optional, Any
 from zoneinfo import ZoneInfo
 
 from telegram.ext import ContextTypes
-from database.connection import db_query
-from database.queries.publications import cancel_task_jobs
-from database.queries.schedules import get_task_schedules
+from database.queries.publications import cancel_task_jobs, update_scheduled_jobs_snapshot
+from database.queries.schedules import get_task_schedule
 from database.queries.settings import get_user_settings
 from database.queries.task_channels import get_task_channels
-from database.queries.tasks import get_task_details, create_task
-from jobs.scheduler import create_publication_jobs_for_task
+from database.queries.tasks import get_task_details, create_task, update_task_column, set_task_status
+from jobs.scheduler import reschedule_task_jobs
 from localization.loader import get_text
 from utils.logging import logger
 
 
-def get_or_create_task_id(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+async def get_or_create_task_id(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
     """
     Получает ID текущей задачи из context.user_data или создает новую задачу,
     если она не задана, и сохраняет ID в context.user_data.
@@ -25,19 +24,19 @@ def get_or_create_task_id(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> O
 
     # Задача еще не существует, создаем ее.
     # Предполагается, что create_task(user_id) возвращает ID созданной задачи
-    new_task_id = create_task(user_id)
+    new_task_id = await create_task(user_id)
     if new_task_id:
         context.user_data['current_task_id'] = new_task_id
     return new_task_id
 
 
 # --- Helper Function ---
-def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[bool, str]:
+async def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[bool, str]:
     """
     Validates if a task is ready for activation.
     Returns: (is_valid, error_message)
     """
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task:
         return False, get_text('task_not_found', context)
 
@@ -46,18 +45,18 @@ def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[boo
         return False, get_text('task_error_no_message', context)
 
     # 2. Channels Check
-    channels = get_task_channels(task_id)
+    channels = await get_task_channels(task_id)
     if not channels:
         return False, get_text('task_error_no_channels', context)
 
     # 3. Schedule Check
-    schedules = get_task_schedules(task_id)
-    if not schedules:
+    schedule = await get_task_schedule(task_id)
+    if schedule.is_empty():
         return False, get_text('task_error_no_schedule', context)
 
-    has_date = any(s.get('schedule_date') is not None for s in schedules)
-    has_weekday = any(s.get('schedule_weekday') is not None for s in schedules)
-    has_time = any(s.get('schedule_time') is not None for s in schedules)
+    has_date = bool(schedule.dates)
+    has_weekday = bool(schedule.weekdays)
+    has_time = bool(schedule.times)
 
     # Logic: Must have Time AND (Date OR Weekday)
     if not has_date and not has_weekday:
@@ -68,7 +67,7 @@ def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[boo
 
     # 4. Past Date Check
     # Ensure we use ZoneInfo for proper timezone aware comparison
-    settings = get_user_settings(context.user_data.get('user_id'))
+    settings = await get_user_settings(context.user_data.get('user_id'))
 
     user_tz_str = settings.get('timezone', 'Europe/Moscow')
     try:
@@ -80,12 +79,9 @@ def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[boo
 
     now_user = datetime.now(tz_info)
 
-    for s in schedules:
-        sd = s.get('schedule_date')  # date object
-        st = s.get('schedule_time')  # time object
-
+    for sd, _, st in schedule.expand():
         # Only check specific dates (weekdays repeat, so they might be valid next week)
-        if sd is not None and st is not None:
+        if sd is not None:
             # Combine date and time, attaching the user's timezone
             scheduled_dt = datetime(
                 sd.year, sd.month, sd.day,
@@ -99,40 +95,54 @@ def validate_task(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[boo
     return True, ""
 
 
-async def refresh_task_jobs(task_id: int, context: ContextTypes.DEFAULT_TYPE):
+# Поля, которые не копируются в publication_jobs и не влияют на расписание и валидность
+# ('status' планируют сами вызывающие: активация / деактивация / ensure_task_and_refresh)
+NO_RESCHEDULE_FIELDS = {'task_name', 'report_enabled', 'post_type', 'status'}
+# Поля-снимки в publication_jobs: обновляются на месте, слоты не пересчитываются
+SNAPSHOT_FIELDS = {'content_message_id', 'content_chat_id', 'pin_duration', 'pin_notify',
+                   'auto_delete_hours', 'advertiser_user_id'}
+
+
+async def refresh_task_jobs(task_id: int, context: ContextTypes.DEFAULT_TYPE, field: Optional[str] = None):
     """
     HOT RELOAD LOGIC:
     1. Checks if task is ACTIVE. If Inactive (creation mode) -> Do nothing.
-    2. If Active (edit mode) -> Cancel ALL previous jobs immediately.
-    3. Validate and Reschedule with NEW parameters.
+    2. Validate the NEW state; invalid -> cancel jobs and deactivate.
+    3. Apply only the difference:
+       - field из NO_RESCHEDULE_FIELDS -> ничего не делаем;
+       - field из SNAPSHOT_FIELDS -> поля-снимки обновляются в уже запланированных строках;
+       - расписание / каналы (field=None) -> reschedule_task_jobs: добавляются и отменяются
+         только затронутые слоты (канал, время).
     """
+    if field in NO_RESCHEDULE_FIELDS:
+        return
+
     # 1. Check Status
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task or task.get('status') != 'active':
         # Constraint: Do not auto-activate drafts or non-existent tasks
         return
 
-    logger.info(f"🔄 Hot-reloading active task {task_id} due to parameter change...")
-
-    # 2. Cancel OLD jobs
-    # Constraint: Previous schedule must be wiped before creating new ones
-    await cancel_task_jobs(task_id, context)
-
-    # 3. Validate New State
+    # 2. Validate New State
     # We pass context so validation can check User Timezone vs Current Time
-    is_valid, error = validate_task(task_id, context)
+    is_valid, error = await validate_task(task_id, context)
 
     if is_valid:
-        # 4. Create NEW jobs
+        # 3. Apply the diff
         # Constraint: The updated parameters are applied immediately
-        # We fetch settings explicitly to ensure we have the DB timezone,
-        # though context.user_data is usually fine if called from an interaction.
-        user_settings = get_user_settings(task['user_id'])
-        user_tz = user_settings.get('timezone', 'Europe/Moscow')
-
         try:
-            count = create_publication_jobs_for_task(task_id, user_tz, context.application)
-            logger.info(f"✅ Task {task_id} hot-reloaded. Scheduled {count} jobs.")
+            if field in SNAPSHOT_FIELDS:
+                updated = await update_scheduled_jobs_snapshot(task)
+                logger.info(f"✅ Task {task_id}: {field} updated in {updated} scheduled jobs")
+            else:
+                # We fetch settings explicitly to ensure we have the DB timezone,
+                # though context.user_data is usually fine if called from an interaction.
+                user_settings = await get_user_settings(task['user_id'])
+                user_tz = user_settings.get('timezone', 'Europe/Moscow')
+
+                diff = await reschedule_task_jobs(task, user_tz)
+                logger.info(f"✅ Task {task_id} rescheduled: +{diff['added']} / -{diff['cancelled']} jobs, "
+                            f"{diff['snapshot_updated']} updated in place")
         except Exception as e:
             logger.error(f"❌ Scheduler failed for task {task_id}: {e}")
             # Fallback to invalid handling if scheduling crashes
@@ -143,10 +153,12 @@ async def refresh_task_jobs(task_id: int, context: ContextTypes.DEFAULT_TYPE):
     if not is_valid:
         logger.warning(f"⚠️ Task {task_id} invalid after edit. Deactivating. Reason: {error}")
 
+        await cancel_task_jobs(task_id, context)
+
         # A. Force Deactivate in DB
-        # We use direct SQL to prevent infinite recursion loop:
+        # We bypass update_task_field to prevent infinite recursion loop:
         # update_task_field -> trigger_refresh -> fail -> update_task_field...
-        db_query("UPDATE tasks SET status = 'inactive' WHERE id = %s", (task_id,), commit=True)
+        await set_task_status(task_id, 'inactive')
 
 
 async def update_task_field(task_id: int, field: str, value: Any, context: ContextTypes.DEFAULT_TYPE):
@@ -164,19 +176,18 @@ async def update_task_field(task_id: int, field: str, value: Any, context: Conte
         return
 
     # 1. Update DB
-    sql = f"UPDATE tasks SET {field} = %s WHERE id = %s"
-    db_query(sql, (value, task_id), commit=True)
+    await update_task_column(task_id, field, value)
 
     # 2. Trigger Hot Reload (Auto-activate if already active)
-    await refresh_task_jobs(task_id, context)
+    await refresh_task_jobs(task_id, context, field)
 
 
-def can_modify_task_parameter(task_id: int) -> tuple[bool, str]:
+async def can_modify_task_parameter(task_id: int) -> tuple[bool, str]:
     """
     Task 3: Validates if name OR message is set before allowing other parameter modifications.
     Returns: (can_modify: bool, error_message: str)
     """
-    task = get_task_details(task_id)
+    task = await get_task_details(task_id)
     if not task:
         return False, "Task not found"
 
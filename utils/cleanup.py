@@ -1,35 +1,63 @@
+from typing import Iterable, List
+
 from telegram.ext import ContextTypes
 
 from utils.logging import logger
 
+# Лимит Bot API deleteMessages: id за один запрос
+DELETE_MESSAGES_BATCH = 100
 
-async def cleanup_temp_messages(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Clean up all temporary messages from user_data with better error handling"""
-    if not chat_id:
-        return
 
-    temp_message_ids = context.user_data.get('temp_message_ids', [])
+async def delete_messages_bulk(bot, chat_id: int, message_ids: Iterable[int]) -> List[int]:
+    """
+    Удаляет сообщения одного чата пачками deleteMessages (до DELETE_MESSAGES_BATCH id за запрос).
+    Если пачка целиком не удалилась — её id удаляются по одному.
+    Returns: id, которые удалить не удалось.
+    """
+    ids = list(dict.fromkeys(message_ids))
+    failed_ids = []
 
-    # Delete all tracked temporary messages (newest first to avoid gaps)
-    for message_id in sorted(temp_message_ids, reverse=True):
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-            logger.debug(f"✅ Deleted temp message {message_id}")
-        except Exception as e:
-            # Message might already be deleted, ignore
-            logger.debug(f"Message {message_id} already deleted or not found: {e}")
+    for start in range(0, len(ids), DELETE_MESSAGES_BATCH):
+        chunk = ids[start:start + DELETE_MESSAGES_BATCH]
+        if len(chunk) > 1:
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=chunk)
+                continue
+            except Exception as e:
+                logger.debug(f"delete_messages failed in chat {chat_id} ({len(chunk)} ids), falling back to single deletes: {e}")
+
+        for message_id in chunk:
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            except Exception as e:
+                logger.debug(f"Message {message_id} in chat {chat_id} not deleted: {e}")
+                failed_ids.append(message_id)
+
+    return failed_ids
 
-    # Clear the stored message IDs
-    context.user_data.pop('temp_message_ids', None)
+
+async def cleanup_temp_messages(context: ContextTypes.DEFAULT_TYPE, chat_id: int, extra_message_ids: Iterable[int] = ()):
+    """
+    Clean up all temporary messages from user_data with better error handling.
+    Всё удаляется одним deleteMessages (extra_message_ids — например, само меню, из которого
+    пришёл callback), по одному — только то, что в пачке не удалилось.
+    """
+    if not chat_id:
+        return
+
+    message_ids = list(context.user_data.get('temp_message_ids', []))
+    message_ids.extend(extra_message_ids)
 
     # Also cleanup old individual message IDs for backward compatibility
     old_keys = ['temp_task_message_id', 'temp_prompt_message_id', 'last_bot_message_id']
     for key in old_keys:
-        message_id = context.user_data.get(key)
+        message_id = context.user_data.pop(key, None)
         if message_id:
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-                logger.debug(f"✅ Deleted old temp message {message_id} from key {key}")
-            except Exception as e:
-                logger.debug(f"Old message {message_id} already deleted: {e}")
-            context.user_data.pop(key, None)
\ No newline at end of file
+            message_ids.append(message_id)
+
+    # Clear the stored message IDs
+    context.user_data.pop('temp_message_ids', None)
+
+    if message_ids:
+        failed_ids = await delete_messages_bulk(context.bot, chat_id, message_ids)
+        logger.debug(f"✅ Deleted {len(set(message_ids)) - len(failed_ids)} temp messages in chat {chat_id}")
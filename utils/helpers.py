@@ -1,18 +1,14 @@
-from datetime import datetime
-from zoneinfo import ZoneInfo
-
 from telegram import Update, InlineKeyboardMarkup
 from telegram.error import BadRequest, TelegramError
 from telegram.ext import ContextTypes
 
-from database.connection import db_query
 from database.queries.settings import get_user_settings
 from utils.logging import logger
 
 
 async def load_user_settings(user_id: int, context: ContextTypes.DEFAULT_TYPE):
     """Загружает настройки пользователя в user_data"""
-    settings = get_user_settings(user_id)
+    settings = await get_user_settings(user_id)
     context.user_data['user_id'] = user_id
     context.user_data['language_code'] = settings.get('language_code', 'en')
     context.user_data['timezone'] = settings.get('timezone', 'Europe/Moscow')
@@ -94,44 +90,3 @@ async def send_or_edit_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
     if query:
         await query.answer()
-
-
-
-def determine_task_status_color(task_id: int, context: ContextTypes.DEFAULT_TYPE) -> str:
-    """
-    UPDATED Logic:
-    🟢 Green: Has future scheduled posts
-    🟡 Yellow: No future posts, but has posts waiting for auto-deletion
-    🔴 Red: All posts are done (published and either deleted or no auto-delete)
-    """
-    user_tz_db = context.user_data.get("timezone", "UTC")
-    now_utc = datetime.now(ZoneInfo(user_tz_db))
-
-    # 1. Check for FUTURE schedules
-    future_scheduled = db_query("""
-        SELECT COUNT(*) as count 
-        FROM publication_jobs 
-        WHERE task_id = %s 
-        AND status = 'scheduled'
-    """, (task_id,), fetchone=True)
-
-    if future_scheduled and future_scheduled['count'] > 0:
-        return '🟢'  # Active: Has future posts
-
-    # 2. Check for posts WAITING for auto-deletion
-    # Condition: Status is published AND Auto-delete is ON (>0) AND Time hasn't passed yet
-    pending_delete = db_query("""
-        SELECT COUNT(*) as count 
-        FROM publication_jobs 
-        WHERE task_id = %s 
-        AND status = 'published'
-        AND auto_delete_hours > 0
-        AND published_at + (auto_delete_hours || ' hours')::INTERVAL > %s
-    """, (task_id, now_utc), fetchone=True)
-
-    if pending_delete and pending_delete['count'] > 0:
-        return '🟡'  # Finishing: Waiting for auto-deletion
-
-    # 3. Default: Finished (Red)
-    # This covers: No jobs, jobs finished and deleted, jobs finished with no auto-delete
-    return '🔴'
\ No newline at end of file
@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config.settings import (
+    RATE_LIMIT_GLOBAL_PER_SEC, RATE_LIMIT_GROUP_PER_MIN, RATE_LIMIT_PRIVATE_PER_SEC, RATE_LIMIT_PRIVATE_BURST,
+    RATE_LIMIT_MAX_RETRIES
+)
+from utils.logging import logger
+
+# Приоритетные полосы: меньше — важнее. Публикации по расписанию всегда впереди
+PRIORITY_PUBLICATION = 0
+PRIORITY_INTERACTIVE = 1  # ответы пользователям (по умолчанию)
+PRIORITY_SERVICE = 2  # отчёты, unpin / auto-delete
+PRIORITY_BULK = 3  # рассылка
+
+LANE_NAMES = {
+    PRIORITY_PUBLICATION: 'publication',
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_SERVICE: 'service',
+    PRIORITY_BULK: 'bulk',
+}
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar('rate_limit_priority',
+                                                                        default=PRIORITY_INTERACTIVE)
+
+# Per-chat лимиты Telegram касаются новых сообщений в чате; edit / delete / pin /
+# sendChatAction идут только через глобальный bucket
+_PER_CHAT_ENDPOINTS = frozenset({'copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages'})
+# Запросы, отправляющие несколько сообщений: поле со списком, каждый элемент — отдельное сообщение
+_MULTI_MESSAGE_FIELDS = {'sendMediaGroup': 'media', 'copyMessages': 'message_ids', 'forwardMessages': 'message_ids'}
+
+# Свыше этого числа per-chat bucket'ов полные (простаивающие) выбрасываются
+MAX_CHAT_BUCKETS = 10_000
+
+
+@contextmanager
+def rate_limit_lane(priority: int):
+    """Все запросы к Bot API внутри блока (и в созданных из него задачах) идут в полосе priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class _TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, count: int = 1) -> float:
+        """Забирает count токенов «в долг». Returns: сколько секунд подождать до их появления."""
+        self._refill(time.monotonic())
+        self.tokens -= count
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def time_until_token(self) -> float:
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class TelegramRateLimiter(BaseRateLimiter[Dict[str, Any]]):
+    """
+    Общий лимитер исходящих запросов к Bot API (подключается через ApplicationBuilder.rate_limiter).
+
+    - глобальный token bucket (RATE_LIMIT_GLOBAL_PER_SEC) с приоритетными полосами:
+      ожидающие запросы получают токены в порядке (приоритет, очередь);
+    - per-chat bucket'ы, только для отправки новых сообщений (send* кроме sendChatAction,
+      copy / forward): каналы/группы — RATE_LIMIT_GROUP_PER_MIN в минуту, личные чаты —
+      RATE_LIMIT_PRIVATE_PER_SEC в секунду с запасом RATE_LIMIT_PRIVATE_BURST;
+      альбом (sendMediaGroup) и copyMessages / forwardMessages стоят по токену на сообщение;
+    - RetryAfter: весь исходящий трафик ставится на паузу на указанное время,
+      запрос повторяется (до RATE_LIMIT_MAX_RETRIES раз).
+
+    Полоса берётся из rate_limit_args={'priority': ...} или из rate_limit_lane().
+    Лимитируются только запросы с chat_id (getUpdates и т.п. проходят без очереди).
+    """
+
+    def __init__(self, global_per_sec: float = RATE_LIMIT_GLOBAL_PER_SEC,
+                 group_per_min: float = RATE_LIMIT_GROUP_PER_MIN,
+                 private_per_sec: float = RATE_LIMIT_PRIVATE_PER_SEC,
+                 private_burst: float = RATE_LIMIT_PRIVATE_BURST,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.global_per_sec = global_per_sec
+        self.group_per_min = group_per_min
+        self.private_per_sec = private_per_sec
+        self.private_burst = private_burst
+        self.max_retries = max_retries
+
+        self._global = _TokenBucket(global_per_sec, global_per_sec)
+        self._chats: Dict[Union[int, str], _TokenBucket] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # heap (priority, seq, future)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+
+        # Метрики
+        self._immediate = 0
+        self._queued = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._retry_after = 0
+        self._per_lane = {lane: 0 for lane in LANE_NAMES}
+
+    async def initialize(self) -> None:
+        self._ensure_pump()
+
+    async def shutdown(self) -> None:
+        if self._pump_task:
+            self._pump_task.cancel()
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+            self._pump_task = None
+        for _, _, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get('priority', _current_priority.get())
+        self._per_lane[priority] = self._per_lane.get(priority, 0) + 1
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority, self._per_chat_cost(endpoint, data))
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_after_seconds(e.retry_after)
+                self._retry_after += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"⏳ Flood limit on {endpoint} (chat {chat_id}): pausing outbound traffic for {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    # --- Acquisition ---
+
+    async def _acquire(self, chat_id, priority: int, chat_cost: int = 1):
+        """
+        chat_cost — сколько токенов per-chat bucket'а стоит запрос (число отправляемых сообщений);
+        chat_id=None или chat_cost=0 — запрос не расходует per-chat bucket (edit / delete / pin и т.п.).
+        """
+        started = time.monotonic()
+        waited = False
+
+        pause = self._paused_until - started
+        if pause > 0:
+            waited = True
+            await asyncio.sleep(pause)
+
+        chat_delay = self._chat_bucket(chat_id).reserve(chat_cost) if chat_id is not None and chat_cost else 0.0
+        if chat_delay > 0:
+            waited = True
+            await asyncio.sleep(chat_delay)
+
+        # Быстрый путь: очереди нет и глобальный токен есть
+        if not self._waiters and time.monotonic() >= self._paused_until and self._global.try_take():
+            pass
+        else:
+            waited = True
+            self._ensure_pump()
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            self._wakeup.set()
+            await future
+
+        if waited:
+            elapsed = time.monotonic() - started
+            self._queued += 1
+            self._wait_time_total += elapsed
+            self._wait_time_max = max(self._wait_time_max, elapsed)
+        else:
+            self._immediate += 1
+
+    def _ensure_pump(self):
+        if self._pump_task is None or self._pump_task.done():
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.create_task(self._pump(), name="telegram-rate-limiter")
+
+    async def _pump(self):
+        """Раздаёт глобальные токены ожидающим строго по приоритету."""
+        while True:
+            while not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            delay = max(self._paused_until - time.monotonic(), self._global.time_until_token())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидающий запрос отменён — токен не тратим
+                continue
+            self._global.try_take()
+            future.set_result(None)
+
+    def _chat_bucket(self, chat_id) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: b for key, b in self._chats.items() if not b.is_full()}
+            if self._is_private(chat_id):
+                bucket = _TokenBucket(self.private_per_sec, self.private_burst)
+            else:
+                # Небольшой запас, чтобы одиночные посты в канал не ждали
+                bucket = _TokenBucket(self.group_per_min / 60, 3)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    def _per_chat_cost(endpoint: str, data: Dict[str, Any]) -> int:
+        """Сколько сообщений в чате создаёт запрос (0 — не расходует per-chat bucket)."""
+        if not ((endpoint.startswith('send') and endpoint != 'sendChatAction') or endpoint in _PER_CHAT_ENDPOINTS):
+            return 0
+        field = _MULTI_MESSAGE_FIELDS.get(endpoint)
+        if field is None:
+            return 1
+        try:
+            return max(1, len(data.get(field) or ()))
+        except TypeError:
+            return 1
+
+    @staticmethod
+    def _is_private(chat_id) -> bool:
+        # Каналы и группы — отрицательные id или @username
+        try:
+            return int(chat_id) > 0
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _retry_after_seconds(retry_after) -> float:
+        if isinstance(retry_after, timedelta):
+            return retry_after.total_seconds()
+        return float(retry_after)
+
+    # --- Metrics ---
+
+    def stats(self) -> dict:
+        """Снимок метрик лимитера (для /debug_jobs)."""
+        queued = self._queued
+        return {
+            'immediate': self._immediate,
+            'queued': queued,
+            'waiting': len(self._waiters),
+            'wait_avg_ms': (self._wait_time_total / queued * 1000) if queued else 0.0,
+            'wait_max_ms': self._wait_time_max * 1000,
+            'retry_after': self._retry_after,
+            'per_lane': {LANE_NAMES.get(lane, str(lane)): count for lane, count in self._per_lane.items()},
+            'chats_tracked': len(self._chats),
+        }
+
+
+rate_limiter = TelegramRateLimiter()